@@ -0,0 +1,164 @@
+import sys
+import time
+import threading
+from fractions import Fraction
+
+import pytest
+
+from xschr.agents import Agent, AgentHub, AgentLost
+from xschr.daemon import _JobProcesses
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.05)
+
+@pytest.fixture
+def hub():
+    hub = AgentHub(("127.0.0.1", 0), token="secret")
+    hub.log = lambda message: None
+    hub.start()
+    yield hub
+    hub.close()
+
+def connect(hub, **kwargs):
+    kwargs.setdefault('gpu_devices', [])
+    agent = Agent(hub.address, name="worker", slots=2, token="secret", **kwargs)
+    agent._log = lambda message: None
+    thread = threading.Thread(target=agent.serve, daemon=True)
+    thread.start()
+    return agent, thread
+
+def test_run_on_an_agent_writes_the_log_here(hub, tmp_path):
+    agent, thread = connect(hub)
+    try:
+        wait_for(lambda: hub.max_free() == 2)
+        link, lease = hub.place(None)
+        assert lease is None and hub.max_free() == 1
+        usage = {}
+        log = tmp_path / "a_1.log"
+        cmd = [sys.executable, "-c", "print('hello from the agent'); raise SystemExit(3)"]
+        assert hub.execute(link, lease, 1, cmd, str(log), usage=usage) == 3
+        text = log.read_text()
+        assert "Host: worker" in text and "hello from the agent" in text and "Exit Code: 3" in text
+        assert usage['wall_s'] > 0
+        assert hub.max_free() == 2
+    finally:
+        agent.stop(drain=0)
+        thread.join(timeout=10)
+
+def test_the_agent_enforces_timeouts(hub, tmp_path):
+    agent, thread = connect(hub)
+    try:
+        wait_for(lambda: hub.max_free() == 2)
+        link, lease = hub.place(None)
+        usage = {}
+        log = tmp_path / "a_5.log"
+        cmd = [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(60)"]
+        assert hub.execute(link, lease, 5, cmd, str(log), usage=usage, idle_timeout=1) != 0
+        assert usage['timeout'] == "no output for 1s (idle_timeout)"
+        assert "Killed: no output for 1s (idle_timeout)" in log.read_text()
+    finally:
+        agent.stop(drain=0)
+        thread.join(timeout=10)
+
+def test_cancel_reaches_the_agent(hub, tmp_path):
+    agent, thread = connect(hub)
+    try:
+        wait_for(lambda: hub.max_free() == 2)
+        link, lease = hub.place(None)
+        handle = _JobProcesses()
+        result = {}
+        cmd = [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(60)"]
+        runner = threading.Thread(target=lambda: result.update(
+            code=hub.execute(link, lease, 2, cmd, str(tmp_path / "a_2.log"), pool=handle)))
+        runner.start()
+        wait_for(lambda: (tmp_path / "a_2.log").exists() and "started" in (tmp_path / "a_2.log").read_text())
+        handle.cancel()
+        runner.join(timeout=15)
+        assert not runner.is_alive() and result['code'] != 0
+    finally:
+        agent.stop(drain=0)
+        thread.join(timeout=10)
+
+def test_cancel_right_after_dispatch(hub, tmp_path):
+    agent, thread = connect(hub)
+    try:
+        wait_for(lambda: hub.max_free() == 2)
+        link, lease = hub.place(None)
+        handle = _JobProcesses()
+        result = {}
+        cmd = [sys.executable, "-c", "import time; time.sleep(60)"]
+        runner = threading.Thread(target=lambda: result.update(
+            code=hub.execute(link, lease, 4, cmd, str(tmp_path / "a_4.log"), pool=handle)))
+        runner.start()
+        # The cancel may reach the agent before it has started the process
+        wait_for(lambda: handle._procs)
+        handle.cancel()
+        runner.join(timeout=15)
+        assert not runner.is_alive() and result['code'] != 0
+    finally:
+        agent.stop(drain=0)
+        thread.join(timeout=10)
+
+def test_a_wrong_token_is_refused(hub):
+    agent = Agent(hub.address, name="stranger", token="guess", gpu_devices=[])
+    agent._log = lambda message: None
+    agent.serve()   # returns once refused
+    assert agent.stopping.is_set() and hub.max_free() == 0
+
+def test_gpu_mem_placement_follows_the_agents_memory_reports(hub):
+    gpus = [{'id': 0, 'name': 'card', 'total_mb': 16000}]
+    free = {'mb': 3000}
+    agent, thread = connect(hub, gpu_devices=gpus,
+                            memory_probe=lambda: [{'id': 0, 'total_mb': 16000, 'free_mb': free['mb']}])
+    try:
+        wait_for(lambda: hub._memory.get("worker"))
+        # Another process holds most of the card
+        assert hub.place(Fraction(1, 2), mem_mb=4000) is None
+        link, lease = hub.place(Fraction(1, 2), mem_mb=2000)
+        assert lease.device_ids == (0,)
+        link.gpu_pool.release(lease)
+        link.busy -= 1
+    finally:
+        agent.stop(drain=0)
+        thread.join(timeout=10)
+
+def test_stopping_an_agent_stops_its_runs_child_processes(hub, tmp_path):
+    import os
+    agent, thread = connect(hub)
+    pid_file = tmp_path / "pid"
+    script = tmp_path / "spawn.py"
+    script.write_text(f"""
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+open({str(pid_file)!r}, "w").write(str(child.pid))
+time.sleep(60)
+""")
+    wait_for(lambda: hub.max_free() == 2)
+    link, lease = hub.place(None)
+    lost = []
+    def run():
+        try:
+            hub.execute(link, lease, 3, [sys.executable, str(script)], str(tmp_path / "a_3.log"))
+        except AgentLost as e:
+            lost.append(e)
+    runner = threading.Thread(target=run, daemon=True)
+    runner.start()
+    wait_for(lambda: pid_file.exists() and pid_file.read_text())
+    agent.stop(drain=5)
+    thread.join(timeout=10)
+    # A run killed by its agent's shutdown is handed back to be requeued
+    runner.join(timeout=10)
+    assert lost
+
+    grandchild = int(pid_file.read_text())
+    def gone():
+        try:
+            os.kill(grandchild, 0)
+        except ProcessLookupError:
+            return True
+        return False
+    wait_for(gone)
@@ -0,0 +1,88 @@
+import io
+import os
+import sys
+import time
+
+from xschr.cache import RunCache, fingerprint
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.logstore import LogWriter, read_chunks
+
+def test_fingerprint_covers_script_args_python_and_env():
+    base = fingerprint("abc", ["--lr", 0.1], "python")
+    assert base == fingerprint("abc", ["--lr", "0.1"], "python")
+    assert base != fingerprint("abd", ["--lr", "0.1"], "python")
+    assert base != fingerprint("abc", ["--lr", "0.2"], "python")
+    assert base != fingerprint("abc", ["--lr", "0.1"], "python3")
+    with_env = fingerprint("abc", [], "python", env_keys=["SEED"], environ={'SEED': "1"})
+    assert with_env != fingerprint("abc", [], "python", env_keys=["SEED"], environ={'SEED': "2"})
+    # Only the selected variables count
+    assert with_env == fingerprint("abc", [], "python", env_keys=["SEED"], environ={'SEED': "1", 'HOME': "/x"})
+
+def test_key_follows_the_script_contents(tmp_path):
+    script = tmp_path / "train.py"
+    script.write_text("print(1)")
+    key = RunCache(str(tmp_path / "cache")).key_for(str(script), [], "python")
+    script.write_text("print(2)")
+    # A new session hashes the script again
+    assert RunCache(str(tmp_path / "cache")).key_for(str(script), [], "python") != key
+
+def record(cache, tmp_path, key, text=b"hello\n", codec=None):
+    log = str(tmp_path / f"{key}_run.log") + (".gz" if codec else "")
+    with LogWriter(log, codec=codec) as f:
+        f.write(text)
+    cache.record(key, ["python", "train.py"], log, duration=1.5)
+    return log
+
+def test_record_lookup_and_restore(tmp_path):
+    cache = RunCache(str(tmp_path / "cache"))
+    assert cache.lookup("k1") is None
+    record(cache, tmp_path, "k1", codec='gzip')
+    entry = cache.lookup("k1")
+    assert entry['suffix'] == ".log.gz" and entry['duration'] == 1.5
+
+    # Restored under the run's name, with the codec it was cached with
+    (tmp_path / "run").mkdir()
+    restored = cache.restore_log("k1", str(tmp_path / "run" / "a_1.log"), entry['suffix'])
+    assert restored == str(tmp_path / "run" / "a_1.log.gz")
+    assert b"".join(read_chunks(restored)) == b"hello\n"
+
+    # An entry whose log went missing is a miss
+    os.remove(tmp_path / "cache" / "k1.log.gz")
+    assert cache.lookup("k1") is None
+
+def test_evict_by_age_then_least_recently_used(tmp_path):
+    cache = RunCache(str(tmp_path / "cache"))
+    for key in ("old", "a", "b", "c"):
+        record(cache, tmp_path, key, text=b"x" * 400_000)
+    now = time.time()
+    for age, key in ((30 * 86400, "old"), (300, "a"), (200, "b"), (100, "c")):
+        os.utime(tmp_path / "cache" / f"{key}.json", (now - age, now - age))
+    # A hit makes "a" the most recently used
+    cache.lookup("a")
+
+    assert cache.evict(max_age_days=7, max_size_mb=1) == 2
+    assert [key for key in ("old", "a", "b", "c") if cache.lookup(key, touch=False)] == ["a", "c"]
+    assert cache.evict() == 0
+
+def test_a_second_session_skips_cached_runs(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+    (tmp_path / "train.py").write_text("import sys; print('trained', sys.argv[1:])")
+    (tmp_path / "c.yaml").write_text("experiments:\n  - name: train\n    script: train.py\n"
+                                     "    runs: [['--lr', '0.1'], ['--lr', '0.2']]\n")
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    cache = RunCache(str(tmp_path / "cache"))
+
+    def session(log_root, mode='use'):
+        monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+        settings = SessionSettings(cpu_affinity=False, order='file', output=OutputSettings(echo=False),
+                                   cache=cache, cache_mode=mode)
+        return run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / log_root), settings)
+
+    assert session("first")['success'] == 2
+    stats = session("second")
+    assert stats['cached'] == 2 and stats['success'] == 0
+    (run_dir,) = (tmp_path / "second").glob("run_*")
+    assert "trained ['--lr', '0.2']" in (run_dir / "train_2.log").read_text()
+    # refresh runs everything again
+    assert session("third", mode='refresh')['success'] == 2
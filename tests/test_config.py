@@ -0,0 +1,85 @@
+import os
+import sys
+import types
+
+import pytest
+
+from xschr import config
+from xschr.config import load_and_validate
+
+CONFIG = "config:\n  log_compress: zstd\nexperiments:\n  - name: a\n    script: train.py\n    runs: [{args: --lr 0.1}]\n"
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+
+@pytest.fixture
+def zstandard(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'zstandard', types.ModuleType('zstandard'))
+
+def load(path):
+    timings = {}
+    data, _ = load_and_validate(str(path), timings=timings)
+    return data, timings['source']
+
+def test_unchanged_config_comes_from_the_cache(tmp_path, zstandard):
+    path = tmp_path / "c.yaml"
+    path.write_text(CONFIG)
+    first, source = load(path)
+    assert source == 'parse'
+    again, source = load(path)
+    assert source == 'cache' and again == first
+
+    # Touched without changing a byte (e.g. a checkout): still a hit
+    os.utime(path, ns=(0, 0))
+    assert load(path)[1] == 'cache'
+
+    path.write_text(CONFIG.replace("0.1", "0.2"))
+    data, source = load(path)
+    assert source == 'parse' and data['experiments'][0]['runs'] == [{'args': "--lr 0.2"}]
+
+def test_changed_validation_invalidates_the_cache(tmp_path, monkeypatch, zstandard):
+    path = tmp_path / "c.yaml"
+    path.write_text(CONFIG)
+    load(path)
+    monkeypatch.setattr(config, '_validator_hash', "edited-validators")
+    assert load(path)[1] == 'parse'
+
+def test_environment_is_checked_on_cache_hits(tmp_path, monkeypatch, zstandard):
+    path = tmp_path / "c.yaml"
+    path.write_text(CONFIG)
+    load(path)
+    # zstandard went away since the config was cached
+    monkeypatch.setitem(sys.modules, 'zstandard', None)
+    with pytest.raises(ValueError, match="zstandard"):
+        load(path)
+
+@pytest.mark.parametrize("body, message", [
+    ("config: {max_parallel: 0}\n", "config.max_parallel"),
+    ("config: {order: random}\n", "config.order"),
+    ("config: {cache: yes please}\n", "config.cache"),
+    ("config: {log_compress: lz4}\n", "config.log_compress"),
+    ("config: {max_log_mb: -1}\n", "config.max_log_mb"),
+    ("config: {metrics: ['(']}\n", "config.metrics"),
+    ("config: {retry: {tries: 2}}\n", "config.retry"),
+    ("config: {cpu_affinity: sometimes}\n", "config.cpu_affinity"),
+    ("config: {timeout: soon}\n", "config.timeout"),
+])
+def test_bad_settings_are_reported_by_section(tmp_path, body, message):
+    path = tmp_path / "c.yaml"
+    path.write_text(body + "experiments:\n  - {script: train.py, runs: [{}]}\n")
+    with pytest.raises(ValueError, match=message.replace(".", r"\.")):
+        load_and_validate(str(path))
+
+@pytest.mark.parametrize("experiment, message", [
+    ("{runs: [{}]}", "must be a mapping with a 'script'"),
+    ("{script: t.py}", "needs 'runs' or a 'sweep' block"),
+    ("{name: a, script: t.py, runs: [{}], gpu_mem: 8GB}", "'gpu_mem' needs 'gpus'"),
+    ("{name: a, script: t.py, runs: [{}], idle_timeout: 0}", "experiment 'a' idle_timeout"),
+    ("{name: a, script: t.py, runs: [{}], scheduler: {kind: hyperband}}", "experiment 'a' scheduler"),
+])
+def test_bad_experiments_are_reported(tmp_path, experiment, message):
+    path = tmp_path / "c.yaml"
+    path.write_text(f"experiments:\n  - {experiment}\n")
+    with pytest.raises(ValueError, match=message):
+        load_and_validate(str(path))
@@ -0,0 +1,20 @@
+from xschr.cpu_slots import CpuSlotPool, format_cpulist
+
+def test_leases_stay_on_one_node_when_they_fit():
+    pool = CpuSlotPool([[0, 1, 2, 3], [4, 5, 6, 7]])
+    first = pool.try_lease(2)
+    second = pool.try_lease(2)
+    # Best fit: the second lease fills the node the first one started
+    assert set(first.cores) | set(second.cores) in ({0, 1, 2, 3}, {4, 5, 6, 7})
+    assert not set(first.cores) & set(second.cores)
+
+def test_large_leases_spread_and_release():
+    pool = CpuSlotPool([[0, 1, 2, 3], [4, 5, 6, 7]])
+    big = pool.try_lease(6)
+    assert len(set(big.cores)) == 6
+    assert pool.try_lease(3) is None
+    pool.release(big)
+    assert pool.try_lease(8) is not None
+
+def test_format_cpulist():
+    assert format_cpulist([0, 1, 2, 3, 8, 10, 11]) == "0-3,8,10-11"
@@ -0,0 +1,136 @@
+import os
+import json
+import sys
+import time
+import threading
+
+import pytest
+
+from xschr.daemon import Daemon, RunQueue
+from xschr.journal import replay
+
+def wait_for(condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.05)
+
+@pytest.fixture
+def daemon(tmp_path):
+    queue = RunQueue(str(tmp_path / "daemon.sqlite"))
+    daemon = Daemon(queue, slots=2, socket_path=str(tmp_path / "sock"), gpu_devices=[])
+    daemon._log = lambda message: None
+    dispatcher = threading.Thread(target=daemon._dispatch_loop, daemon=True)
+    dispatcher.start()
+    yield daemon
+    daemon.stopping.set()
+    daemon.wake()
+    for handle in daemon._handles.values():
+        handle.cancel()
+    dispatcher.join(timeout=10)
+    for t in daemon._threads:
+        t.join(timeout=10)
+    queue.close()
+
+def write_config(tmp_path, script, runs="[{}]", extra=""):
+    (tmp_path / "train.py").write_text(script)
+    (tmp_path / "c.yaml").write_text(f"experiments:\n  - name: train\n    script: train.py\n    runs: {runs}\n{extra}")
+
+def submit(daemon, tmp_path, uid=None):
+    return daemon.handle({'op': 'submit', 'config': "c.yaml", 'cwd': str(tmp_path), 'python': sys.executable}, uid)
+
+def job_status(daemon, job):
+    return daemon.queue.summary(job)[0]['status']
+
+def test_submitted_runs_execute_and_are_journaled(daemon, tmp_path):
+    write_config(tmp_path, "import sys; print('lr', sys.argv[1:])", runs="[['--lr', '0.1'], ['--lr', '0.2']]")
+    reply = submit(daemon, tmp_path, uid=os.geteuid())
+    assert reply['runs'] == 2
+
+    wait_for(lambda: job_status(daemon, reply['job']) == 'done')
+    assert daemon.queue.summary(reply['job'])[0]['runs'] == {'success': 2}
+    state = replay(reply['run_dir'])
+    assert [run['status'] for run in state['runs'].values()] == ['success', 'success']
+    assert "lr ['--lr', '0.2']" in open(os.path.join(reply['run_dir'], "train_2.log")).read()
+
+def test_cancel_stops_a_running_job(daemon, tmp_path):
+    write_config(tmp_path, "import time; print('started', flush=True); time.sleep(60)", runs="[{}, {}, {}]")
+    reply = submit(daemon, tmp_path)
+    log = os.path.join(reply['run_dir'], "train_1.log")
+    wait_for(lambda: os.path.exists(log) and "started" in open(log).read())
+
+    assert daemon.handle({'op': 'cancel', 'job': reply['job']}) == {'job': reply['job']}
+    wait_for(lambda: 'running' not in daemon.queue.summary(reply['job'])[0]['runs'])
+    assert job_status(daemon, reply['job']) == 'cancelled'
+    with pytest.raises(ValueError, match="not queued or running"):
+        daemon.handle({'op': 'cancel', 'job': reply['job']})
+
+def test_only_the_owner_may_cancel(daemon, tmp_path):
+    write_config(tmp_path, "import time; time.sleep(60)")
+    reply = submit(daemon, tmp_path)
+    with pytest.raises(PermissionError, match="belongs to"):
+        daemon.cancel(reply['job'], uid=os.geteuid() + 4242)
+    assert daemon.cancel(reply['job'], uid=os.geteuid())
+
+def test_other_users_cannot_submit(daemon, tmp_path):
+    write_config(tmp_path, "print('hi')")
+    # Not even to a daemon running as root
+    with pytest.raises(PermissionError, match="only accepts jobs from that user"):
+        submit(daemon, tmp_path, uid=os.geteuid() + 4242)
+    assert daemon.queue.summary() == []
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="needs to hand a directory to another user")
+def test_directories_of_another_user_are_refused(daemon, tmp_path):
+    write_config(tmp_path, "print('hi')")
+    os.chown(tmp_path, 4242, 4242)
+    with pytest.raises(PermissionError, match="does not belong to"):
+        submit(daemon, tmp_path)
+    os.chown(tmp_path, 0, 0)
+
+    # An absolute log_dir elsewhere is checked on its own
+    foreign = tmp_path / "foreign"
+    foreign.mkdir()
+    os.chown(foreign, 4242, 4242)
+    write_config(tmp_path, "print('hi')", extra=f"config:\n  log_dir: {foreign / 'logs'}\n")
+    with pytest.raises(PermissionError, match="does not belong to"):
+        submit(daemon, tmp_path)
+
+    # A sticky directory such as /tmp may hold it
+    os.chmod(foreign, 0o1777)
+    assert submit(daemon, tmp_path)['run_dir'].startswith(str(foreign / "logs"))
+
+def test_timeouts_apply_to_daemon_runs(daemon, tmp_path):
+    write_config(tmp_path, "import time; print('started', flush=True); time.sleep(60)",
+                 extra="    timeout: 1\n")
+    reply = submit(daemon, tmp_path)
+    wait_for(lambda: job_status(daemon, reply['job']) == 'failed', timeout=30)
+    assert daemon.queue.summary(reply['job'])[0]['runs'] == {'timeout': 1}
+    assert "Killed: exceeded timeout of 1s" in open(os.path.join(reply['run_dir'], "train_1.log")).read()
+
+def test_gpu_mem_is_checked_against_the_devices(tmp_path):
+    queue = RunQueue(str(tmp_path / "daemon.sqlite"))
+    daemon = Daemon(queue, slots=1, socket_path=str(tmp_path / "sock"), gpu_devices=[{'id': 0, 'total_mb': 8000}])
+    daemon._log = lambda message: None
+    write_config(tmp_path, "print('hi')", extra="    gpus: 1\n    gpu_mem: 16GB\n")
+    reply = submit(daemon, tmp_path)
+    (run,) = queue.heads()
+    assert json.loads(run['limits']) == {'gpu_mem': 16384}
+    # The run can never fit: the dispatcher fails it instead of waiting forever
+    threading.Thread(target=daemon._dispatch_loop, daemon=True).start()
+    wait_for(lambda: job_status(daemon, reply['job']) == 'failed')
+    daemon.stopping.set()
+    daemon.wake()
+    queue.close()
+
+@pytest.mark.parametrize("extra, where", [
+    ("config:\n  retry: 2\n", "config.retry"),
+    ("    cpus: 2\n", "experiment 'train' cpus"),
+    ("    warm_start: true\n", "experiment 'train' warm_start"),
+    ("    metrics: true\n", "experiment 'train' metrics"),
+])
+def test_session_only_settings_are_refused(daemon, tmp_path, extra, where):
+    write_config(tmp_path, "print('hi')", extra=extra)
+    with pytest.raises(ValueError, match=f"'{where}' is not supported by the daemon"):
+        submit(daemon, tmp_path)
+    assert daemon.queue.summary() == []
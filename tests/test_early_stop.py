@@ -0,0 +1,76 @@
+import io
+import sys
+
+import pytest
+
+from xschr.config import load_and_validate
+from xschr.early_stop import EarlyStopper, parse_scheduler
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.journal import replay
+
+def test_parse_scheduler():
+    opts = parse_scheduler("asha")
+    assert opts['type'] == 'asha' and opts['metric'] == 'loss' and opts['reduction'] == 3
+    assert parse_scheduler({'type': 'median', 'mode': 'max', 'progress': 'epoch'})['progress'] == 'epoch'
+    for bad in ("hyperband", {'type': 'asha', 'patience': 2}, {'type': 'asha', 'reduction': 1},
+                {'type': 'median', 'mode': 'lowest'}, 3):
+        with pytest.raises(ValueError):
+            parse_scheduler(bad)
+
+def report(trial, *losses):
+    """Feed one loss per epoch; returns the epoch the run was stopped at, or None."""
+    for epoch, loss in enumerate(losses, 1):
+        if trial.report({'epoch': epoch, 'loss': loss}):
+            return epoch
+    return None
+
+def test_asha_keeps_the_best_third_at_each_rung():
+    stopper = EarlyStopper(**parse_scheduler({'type': 'asha', 'progress': 'epoch'}))
+    assert report(stopper.trial("a"), 1.0, 0.9, 0.8) is None
+    # Rung 0 is epoch 1: behind the first run's 1.0
+    b = stopper.trial("b")
+    assert report(b, 2.0) == 1 and "best 1/3 at epoch 1" in b.reason
+    # Ahead at epoch 1, behind at epoch 3
+    assert report(stopper.trial("c"), 0.5, 0.95, 1.2) == 3
+    # A stopped run stays stopped
+    assert b.report({'epoch': 2, 'loss': 0.1})
+
+def test_asha_with_mode_max():
+    stopper = EarlyStopper(**parse_scheduler({'type': 'asha', 'metric': 'acc', 'mode': 'max'}))
+    assert not stopper.trial("a").report({'acc': 0.9})
+    assert stopper.trial("b").report({'acc': 0.5})
+    # NaN is never compared
+    assert not stopper.trial("c").report({'acc': float('nan')})
+
+def test_median_stopping_waits_for_enough_peers():
+    stopper = EarlyStopper(**parse_scheduler({'type': 'median', 'min_runs': 2, 'grace': 2}))
+    assert report(stopper.trial("a"), 1.0, 0.8, 0.6) is None
+    # One peer is not enough to compare against
+    assert report(stopper.trial("b"), 3.0, 3.0, 3.0) is None
+    c = stopper.trial("c")
+    # Before the grace period nothing is stopped; at report 2 it is worse than the median of a and b
+    assert report(c, 5.0, 2.0) == 2 and "median of 2 run(s)" in c.reason
+    assert report(stopper.trial("d"), 5.0, 0.7, 0.5) is None
+
+TRAIN = """
+import sys, time
+loss = float(sys.argv[2])
+for epoch in range(1, 10):
+    print(f"XSCHR_METRIC epoch={epoch} loss={loss / epoch}", flush=True)
+    time.sleep(0.05)
+"""
+
+def test_a_session_stops_runs_that_fall_behind(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    (tmp_path / "train.py").write_text(TRAIN)
+    (tmp_path / "c.yaml").write_text("experiments:\n  - name: train\n    script: train.py\n"
+                                     "    runs: [['--loss', '1'], ['--loss', '5'], ['--loss', '0.5']]\n")
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    settings = SessionSettings(cpu_affinity=False, order='file', output=OutputSettings(echo=False), metrics=True,
+                               scheduler={'type': 'asha', 'progress': 'epoch'})
+    stats = run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+    assert stats['success'] == 2 and stats['stopped'] == 1
+    (run_dir,) = (tmp_path / "logs").glob("run_*")
+    assert replay(str(run_dir))['runs']['train_2']['status'] == 'stopped'
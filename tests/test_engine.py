@@ -0,0 +1,67 @@
+import io
+import sys
+import time
+
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+
+# Records when it ran, then exits with the code it was given
+WORK = """
+import os, sys, time
+start = time.time()
+time.sleep(float(sys.argv[2]))
+with open(os.path.join(os.path.dirname(__file__), "spans.txt"), "a") as f:
+    f.write(f"{sys.argv[1]} {start} {time.time()}\\n")
+sys.exit(int(sys.argv[3]))
+"""
+
+def run(tmp_path, monkeypatch, runs, **kwargs):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    (tmp_path / "work.py").write_text(WORK)
+    (tmp_path / "c.yaml").write_text("experiments:\n  - name: work\n    script: work.py\n"
+                                     f"    runs: {runs}\n")
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    settings = SessionSettings(cpu_affinity=False, order='file', output=OutputSettings(echo=False), **kwargs)
+    return run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+def spans(tmp_path):
+    lines = (tmp_path / "spans.txt").read_text().splitlines()
+    return {name: (float(start), float(end)) for name, start, end in (line.split() for line in lines)}
+
+def most_at_once(intervals):
+    edges = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    running = peak = 0
+    for _, step in edges:
+        running += step
+        peak = max(peak, running)
+    return peak
+
+def test_parallel_runs_overlap_up_to_the_job_count(tmp_path, monkeypatch):
+    runs = [[f"r{i}", "0.5", "0"] for i in range(5)]
+    began = time.monotonic()
+    stats = run(tmp_path, monkeypatch, runs, jobs=2)
+    elapsed = time.monotonic() - began
+
+    assert stats['success'] == 5 and stats['failed'] == 0
+    done = spans(tmp_path)
+    assert sorted(done) == [f"r{i}" for i in range(5)]
+    assert most_at_once(done.values()) == 2
+    # Three waves of two, not five runs one after the other
+    assert elapsed < 5 * 0.5
+
+def test_a_single_job_runs_one_at_a_time(tmp_path, monkeypatch):
+    stats = run(tmp_path, monkeypatch, [["a", "0.2", "0"], ["b", "0.2", "1"], ["c", "0.2", "0"]])
+    assert stats['success'] == 2 and stats['failed'] == 1
+    assert most_at_once(spans(tmp_path).values()) == 1
+
+def test_fail_fast_stops_the_queue_and_the_runs_in_flight(tmp_path, monkeypatch):
+    runs = [["bad", "0.2", "1"], ["slow", "30", "0"], ["queued1", "0", "0"], ["queued2", "0", "0"]]
+    began = time.monotonic()
+    stats = run(tmp_path, monkeypatch, runs, jobs=2, fail_fast=True)
+
+    assert time.monotonic() - began < 15
+    assert stats['failed'] == 1 and stats['success'] == 0 and stats['cancelled'] == 1
+    # Only the failing run got to the end; nothing queued after it was started
+    assert list(spans(tmp_path)) == ["bad"]
+    assert {r['run']: r['status'] for r in stats['runs']} == {'work_1': 'failed', 'work_2': 'cancelled'}
@@ -0,0 +1,119 @@
+from fractions import Fraction
+
+import pytest
+
+from xschr import cuda_devices
+from xschr.gpu_slots import GpuSlotPool, cuda_visible_devices, parse_gpu_mem, parse_gpu_request
+
+MB = 1024 * 1024
+
+class FakeNvml:
+    """Stands in for libnvidia-ml: free memory per PCI bus id, in MB."""
+    def __init__(self, free_mb, total_mb):
+        self.free_mb = free_mb
+        self.total_mb = total_mb
+        self.inits = 0
+
+    def nvmlInit_v2(self):
+        self.inits += 1
+        return cuda_devices.NVML_SUCCESS
+
+    def nvmlShutdown(self):
+        return cuda_devices.NVML_SUCCESS
+
+    def nvmlDeviceGetHandleByPciBusId_v2(self, bus_id, handle):
+        # The handle is the device's position in free_mb
+        handle.contents.value = list(self.free_mb).index(bus_id.decode()) + 1
+        return cuda_devices.NVML_SUCCESS
+
+    def nvmlDeviceGetMemoryInfo(self, handle, memory):
+        bus_id = list(self.free_mb)[handle.value - 1]
+        memory.contents.total = self.total_mb * MB
+        memory.contents.free = self.free_mb[bus_id] * MB
+        memory.contents.used = (self.total_mb - self.free_mb[bus_id]) * MB
+        return cuda_devices.NVML_SUCCESS
+
+def devices(*total_mb):
+    return [{'id': i, 'total_mb': mb, 'pci_bus_id': f"0000:0{i}:00.0"} for i, mb in enumerate(total_mb)]
+
+# --- Parsing ---
+
+def test_parse_gpu_request():
+    assert parse_gpu_request(0.5) == Fraction(1, 2)
+    assert parse_gpu_request("0.25") == Fraction(1, 4)
+    assert parse_gpu_request(2) == 2
+    for bad in (0, -1, 1.5, True, "many"):
+        with pytest.raises(ValueError):
+            parse_gpu_request(bad)
+
+def test_parse_gpu_mem():
+    assert parse_gpu_mem(512) == 512
+    assert parse_gpu_mem("8GB") == 8192
+    assert parse_gpu_mem("1.5 gib") == 1536
+    for bad in ("8TB", 0, "", True):
+        with pytest.raises(ValueError):
+            parse_gpu_mem(bad)
+
+# --- Slot allocation ---
+
+def test_fractional_leases_pack_onto_one_card():
+    pool = GpuSlotPool(devices(8000, 8000))
+    first = pool.try_lease(Fraction(1, 2))
+    second = pool.try_lease(Fraction(1, 2))
+    assert first.device_ids == second.device_ids
+    # The shared card is full: the next share goes to the other one
+    third = pool.try_lease(Fraction(1, 2))
+    assert third.device_ids != first.device_ids
+
+def test_whole_devices_skip_shared_cards():
+    pool = GpuSlotPool(devices(8000, 8000, 8000))
+    share = pool.try_lease(Fraction(1, 4))
+    pair = pool.try_lease(2)
+    assert pair is not None and share.device_ids[0] not in pair.device_ids
+    assert pool.try_lease(1) is None
+    pool.release(share)
+    assert pool.try_lease(1).device_ids == share.device_ids
+
+def test_lease_rejects_what_can_never_fit():
+    pool = GpuSlotPool(devices(8000))
+    with pytest.raises(ValueError, match="only 1 detected"):
+        pool.lease(2)
+    with pytest.raises(ValueError, match="GPU memory"):
+        pool.lease(1, mem_mb=16000)
+
+def test_cuda_visible_devices_maps_through_the_inherited_list():
+    assert cuda_visible_devices((0, 1), inherited="") == "0,1"
+    assert cuda_visible_devices((0, 1), inherited="3,5") == "3,5"
+    assert cuda_visible_devices((1,), inherited="GPU-aaa, GPU-bbb") == "GPU-bbb"
+
+# --- gpu_mem admission ---
+
+def test_declared_memory_limits_sharing():
+    pool = GpuSlotPool(devices(16000))
+    assert pool.try_lease(Fraction(1, 4), mem_mb=10000) is not None
+    # A quarter of the card is free, but not the memory
+    assert pool.try_lease(Fraction(1, 4), mem_mb=8000) is None
+    assert pool.try_lease(Fraction(1, 4), mem_mb=6000) is not None
+
+def test_live_memory_from_nvml_steers_admission():
+    gpus = devices(24000, 24000)
+    nvml = FakeNvml({"0000:00:00.0": 2000, "0000:01:00.0": 20000}, total_mb=24000)
+    pool = GpuSlotPool(gpus, memory_probe=lambda: cuda_devices.device_status(gpus, nvml_dll=nvml),
+                       probe_interval=0)
+
+    # Another user holds most of device 0
+    lease = pool.try_lease(Fraction(1, 2), mem_mb=8000)
+    assert lease.device_ids == (1,)
+    # Device 1 has room for what it did not promise to the first lease, device 0 has none
+    assert pool.try_lease(Fraction(1, 2), mem_mb=17000) is None
+
+    nvml.free_mb["0000:00:00.0"] = 24000
+    assert pool.try_lease(Fraction(1, 2), mem_mb=17000).device_ids == (0,)
+
+def test_device_status_initializes_nvml_once():
+    gpus = devices(8000)
+    nvml = FakeNvml({"0000:00:00.0": 6000}, total_mb=8000)
+    for _ in range(3):
+        status = cuda_devices.device_status(gpus, nvml_dll=nvml)
+    assert status[0]['free_mb'] == 6000 and status[0]['used_mb'] == 2000
+    assert nvml.inits == 1
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from xschr import history as history_module
+from xschr.engine import SessionSettings, _experiment_context, _plan_queue
+from xschr.history import KEEP_PER_RUN, DurationHistory, format_duration, predict_makespan
+
+def test_estimates_from_runs_then_experiments(tmp_path):
+    history = DurationHistory(str(tmp_path))
+    history.record("exp", "/s/train.py", ["--lr", "0.1"], 10.0)
+    history.record("exp", "/s/train.py", ["--lr", "0.1"], 20.0)
+    history.record("exp", "/s/train.py", ["--lr", "0.2"], 40.0)
+
+    # A fresh session reads what the last one recorded
+    history = DurationHistory(str(tmp_path))
+    assert history.estimate("exp", "/s/train.py", ["--lr", "0.1"]) == (15.0, 'run')
+    assert history.estimate("exp", "/s/train.py", ["--lr", "0.3"]) == (27.5, 'experiment')
+    assert history.estimate("other", "/s/eval.py", []) == (None, None)
+
+def test_history_file_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_module, '_COMPACT_LINES', 100)
+    history = DurationHistory(str(tmp_path))
+    for i in range(150):
+        history.record("exp", "/s/train.py", [str(i % 3)], float(i))
+    before = history.estimate("exp", "/s/train.py", ["2"])
+
+    # Loading a file this far past what it keeps rewrites it
+    lines = (tmp_path / ".history.jsonl").read_text().splitlines()
+    assert len(lines) == 3 * KEEP_PER_RUN
+    kept = [json.loads(line)['wall'] for line in lines]
+    assert 149.0 in kept and 0.0 not in kept
+    # and changes no estimate
+    assert DurationHistory(str(tmp_path)).estimate("exp", "/s/train.py", ["2"]) == before
+
+def test_predict_makespan():
+    assert predict_makespan([4, 3, 3, 2, 2, 2], 2) == 8
+    assert predict_makespan(iter([5, 1, 1]), 4) == 5
+    assert predict_makespan([], 3) == 0
+
+def test_format_duration():
+    assert format_duration(12.34) == "12.3s"
+    assert format_duration(125) == "2m 05s"
+    assert format_duration(7260) == "2h 01m"
+
+# --- Planning the queue ---
+
+def contexts(tmp_path, *experiments):
+    config_path = str(tmp_path / "c.yaml")
+    return [_experiment_context(i, exp, config_path, SessionSettings()) for i, exp in enumerate(experiments)]
+
+@pytest.fixture
+def history(tmp_path):
+    history = DurationHistory(str(tmp_path))
+    for lr, wall in (("0.1", 10.0), ("0.2", 30.0), ("0.3", 20.0)):
+        history.record("a", str(tmp_path / "a.py"), ["--lr", lr], wall)
+    return history
+
+def sweep(name, priority=0):
+    return {'name': name, 'script': f"{name}.py", 'priority': priority,
+            'runs': [{'args': f"--lr {lr}"} for lr in ("0.1", "0.2", "0.3", "0.4")]}
+
+def test_lpt_order_puts_priority_then_longest_first(tmp_path, history):
+    queue, summary = _plan_queue(contexts(tmp_path, sweep("a"), sweep("b", priority=1)), history, True, 2)
+    order = [(ctx['name'], args[-1]) for ctx, _, args in queue]
+    assert order[:4] == [("b", "0.1"), ("b", "0.2"), ("b", "0.3"), ("b", "0.4")]
+    # Unknown runs of "a" count as its average (20s)
+    assert order[4:] == [("a", "0.2"), ("a", "0.3"), ("a", "0.4"), ("a", "0.1")]
+    assert summary['sources'] == {'run': 3, 'experiment': 1, None: 4}
+
+def test_file_order_streams_without_materializing(tmp_path, history):
+    queue, summary = _plan_queue(contexts(tmp_path, sweep("a")), history, False, 2)
+    assert queue is None
+    # 10 + 20 on one worker, 30 + 20 on the other
+    assert summary['makespan'] == 50
+
+def test_done_and_cached_runs_are_left_out_of_the_estimate(tmp_path, history):
+    pending = lambda ctx, i, args: args[-1] in ("0.2", "0.3")
+    queue, summary = _plan_queue(contexts(tmp_path, sweep("a")), history, True, 1, pending)
+    assert summary['makespan'] == 50 and summary['skipped'] == 2
+    assert [args[-1] for _, _, args in queue] == ["0.2", "0.3", "0.1", "0.4"]
@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import json
+
+import pytest
+
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.journal import RunJournal, replay
+
+def test_replay_rebuilds_run_states(tmp_path):
+    journal = RunJournal(str(tmp_path))
+    journal.append('session', config="/exp/c.yaml")
+    journal.append('queued', run='a_1', args=["--lr", "0.1"])
+    journal.append('started', run='a_1')
+    journal.append('finished', run='a_1', status='success', exit_code=0)
+    journal.append('queued', run='a_2', args=["--lr", "0.2"])
+    journal.append('started', run='a_2')
+    journal.append('queued', run='a_3', args=[])
+    journal.append('finished', run='a_3', status='failed', exit_code=1)
+    # A crash mid-write leaves a torn last line
+    with open(journal.path, 'a') as f:
+        f.write('{"event": "finished", "run": "a_2", "sta')
+
+    state = replay(str(tmp_path))
+    assert state['config'] == "/exp/c.yaml"
+    runs = state['runs']
+    assert runs['a_1'] == {'status': 'success', 'args': ["--lr", "0.1"], 'exit_code': 0, 'attempt': 2}
+    assert runs['a_2']['status'] == 'interrupted' and runs['a_2']['attempt'] == 1
+    # A rerun of a finished run gets a log of its own
+    assert runs['a_3']['status'] == 'failed' and runs['a_3']['attempt'] == 2
+
+def test_replay_needs_a_journal(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        replay(str(tmp_path))
+
+# --- --resume ---
+
+# Fails until the marker file exists
+FLAKY = """
+import os, sys
+if sys.argv[1] == "bad" and not os.path.exists(os.path.join(os.path.dirname(__file__), "fixed")):
+    sys.exit(1)
+print("ran", sys.argv[1])
+"""
+
+CONFIG = "experiments:\n  - name: exp\n    script: flaky.py\n    runs:\n      - args: good\n      - args: bad\n"
+
+def run(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    settings = SessionSettings(cpu_affinity=False, order='file', output=OutputSettings(echo=False), **kwargs)
+    return run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+@pytest.fixture
+def first_session(tmp_path, monkeypatch):
+    (tmp_path / "flaky.py").write_text(FLAKY)
+    (tmp_path / "c.yaml").write_text(CONFIG)
+    stats = run(tmp_path, monkeypatch)
+    assert stats['success'] == 1 and stats['failed'] == 1
+    (name,) = [n for n in os.listdir(tmp_path / "logs") if n.startswith("run_")]
+    return tmp_path / "logs" / name
+
+def test_resume_skips_finished_runs(tmp_path, monkeypatch, first_session):
+    (tmp_path / "fixed").write_text("")
+    stats = run(tmp_path, monkeypatch, resume_dir=str(first_session))
+    # Failed runs count as done unless asked for
+    assert stats['success'] == 1 and stats['failed'] == 1
+    assert not (first_session / "exp_2_attempt2.log").exists()
+
+def test_resume_retry_failed_reruns_in_a_new_log(tmp_path, monkeypatch, first_session):
+    (tmp_path / "fixed").write_text("")
+    stats = run(tmp_path, monkeypatch, resume_dir=str(first_session), retry_failed=True)
+    assert stats['success'] == 2 and stats['failed'] == 0
+    assert "Exit Code: 1" in (first_session / "exp_2.log").read_text()
+    assert "ran bad" in (first_session / "exp_2_attempt2.log").read_text()
+    assert replay(str(first_session))['runs']['exp_2']['status'] == 'success'
+
+def test_resume_reruns_interrupted_runs(tmp_path, monkeypatch, first_session):
+    # As if the session had died while the first run was going
+    journal = first_session / "journal.jsonl"
+    events = [e for e in map(json.loads, journal.read_text().splitlines())
+              if not (e['event'] == 'finished' and e['run'] == 'exp_1')]
+    journal.write_text("".join(json.dumps(e) + "\n" for e in events))
+    (first_session / "exp_1.log").unlink()
+    stats = run(tmp_path, monkeypatch, resume_dir=str(first_session))
+    assert stats['success'] == 1 and stats['failed'] == 1
+    assert "ran good" in (first_session / "exp_1.log").read_text()
+    with open(first_session / "journal.jsonl") as f:
+        sessions = [e for e in map(json.loads, f) if e['event'] == 'session']
+    assert [s['resumed'] for s in sessions] == [False, True]
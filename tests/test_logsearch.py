@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+from xschr.logsearch import _scan, parse_since, search_log
+from xschr.logstore import LogWriter
+
+TEXT = (b"Cmd: python train.py --lr 0.1\n"
+        b"epoch 1 loss 2.0\n"
+        b"\n"
+        b"epoch 2 loss nan\n"
+        b"warning: loss nan again nan\n"
+        b"done")
+
+def grep_n(data, pattern):
+    """What `grep -n` reports."""
+    regex = re.compile(pattern)
+    return [(n, line) for n, line in enumerate(data.split(b"\n"), 1) if regex.search(line)]
+
+@pytest.mark.parametrize("pattern", [rb"nan", rb"epoch", rb"^$", rb"done", rb"^Cmd", rb"missing"])
+def test_scan_numbers_lines_like_grep(pattern):
+    matches = []
+    _scan(TEXT, re.compile(pattern, re.MULTILINE), 100, matches)
+    assert matches == grep_n(TEXT, pattern)
+
+def test_scan_continues_numbering_across_chunks():
+    regex = re.compile(rb"nan")
+    cut = TEXT.index(b"epoch 2")
+    matches = []
+    lineno = _scan(TEXT, regex, 100, matches, 0, 0, cut)
+    assert lineno == 3
+    _scan(TEXT, regex, 100, matches, lineno, cut)
+    assert matches == grep_n(TEXT, rb"nan")
+
+def test_scan_stops_at_limit():
+    matches = []
+    _scan(TEXT, re.compile(rb"loss"), 2, matches)
+    assert [n for n, _ in matches] == [2, 4]
+
+@pytest.mark.parametrize("codec", [None, 'gzip'])
+def test_search_log(tmp_path, codec):
+    data = TEXT + b"\n" + b"".join(f"step {i} loss nan\n".encode() if i % 500 == 7 else f"step {i}\n".encode()
+                                   for i in range(5000))
+    path = str(tmp_path / ("run.log" + (".gz" if codec else "")))
+    with LogWriter(path, codec=codec, frame_bytes=4096) as f:
+        f.write(data)
+
+    found, cmd, matches = search_log(path, rb"loss nan", re.MULTILINE)
+    assert found == path
+    assert cmd == "python train.py --lr 0.1"
+    assert matches == grep_n(data, rb"loss nan")
+
+def test_parse_since():
+    assert parse_since("2h", now=10_000) == 10_000 - 7200
+    assert parse_since("1.5d", now=200_000) == 200_000 - 1.5 * 86400
+    with pytest.raises(ValueError):
+        parse_since("yesterday")
@@ -0,0 +1,53 @@
+from xschr.logstore import LogWriter, count_lines, iter_lines, open_log, read_index, tail_lines
+
+def lines(n, start=0):
+    return [f"line {i:05d} {'x' * 40}\n".encode() for i in range(start, start + n)]
+
+def write(path, data, **kwargs):
+    with LogWriter(str(path), **kwargs) as f:
+        for line in data:
+            f.write(line)
+    return str(path)
+
+def test_frame_index_round_trip(tmp_path):
+    data = lines(2000)
+    # Small frames so ranges start mid-file (and frames split lines)
+    path = write(tmp_path / "run.log.gz", data, codec='gzip', frame_bytes=4096)
+
+    frames = read_index(path)
+    assert len(frames) > 10
+    assert sum(newlines for _, _, _, newlines in frames) == len(data)
+    assert count_lines(path) == len(data)
+    assert list(iter_lines(path)) == data
+    for start in (0, 1, 99, 100, 1234, 1999):
+        assert list(iter_lines(path, start, start + 3)) == data[start:start + 3]
+    assert tail_lines(path, 5) == data[-5:]
+
+def test_index_missing_falls_back_to_streaming(tmp_path):
+    data = lines(300)
+    path = write(tmp_path / "run.log.gz", data, codec='gzip', frame_bytes=1024)
+    (tmp_path / "run.log.gz.idx").unlink()
+    assert list(iter_lines(path, 150, 152)) == data[150:152]
+    assert tail_lines(path, 2) == data[-2:]
+
+def test_size_cap_keeps_head_and_tail(tmp_path):
+    data = lines(1000)
+    size = sum(len(line) for line in data)
+    cap = 20_000
+    path = write(tmp_path / "run.log.gz", data, codec='gzip', max_bytes=cap, frame_bytes=2048)
+
+    kept = b"".join(iter_lines(path))
+    head = b"".join(data)[:cap - cap // 2]
+    tail = b"".join(data)[-(cap // 2):]
+    marker = f"\n[xschr: {size - cap} bytes truncated]\n".encode()
+    assert kept == head + marker + tail
+    assert tail_lines(path, 3) == data[-3:]
+    # The cap bounds what is written, not just what is kept in memory
+    assert count_lines(path) < len(data)
+
+def test_plain_log_is_an_ordinary_file(tmp_path):
+    path = str(tmp_path / "run.log")
+    with open_log(path) as f:
+        assert hasattr(f, 'fileno')
+        f.write(b"".join(lines(10)))
+    assert tail_lines(path, 2) == lines(10)[-2:]
@@ -0,0 +1,63 @@
+import io
+import os
+import sys
+import struct
+
+import pytest
+
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.metrics import MetricExtractor, compile_patterns, load_results, load_series, rank, series_dir
+
+PATTERNS = compile_patterns([r"Epoch (?P<epoch>\d+) - Loss: (?P<loss>\S+)"])
+
+def read_f64(path):
+    data = path.read_bytes()
+    return list(struct.unpack(f"<{len(data) // 8}d", data))
+
+def test_lines_split_across_chunks_are_matched_once(tmp_path):
+    extractor = MetricExtractor(PATTERNS, str(tmp_path))
+    text = b"Epoch 1 - Loss: 2.5\nnoise\nEpoch 2 - Loss: 1.5\nXSCHR_METRIC acc=0.5 bad=x lr=1e-3\nEpoch 3 - Loss: nan"
+    for i in range(0, len(text), 7):
+        extractor.feed(text[i:i + 7])
+    summary = extractor.close()
+
+    assert read_f64(tmp_path / "epoch.f64") == [1.0, 2.0, 3.0]
+    assert read_f64(tmp_path / "acc.f64") == [0.5] and read_f64(tmp_path / "lr.f64") == [1e-3]
+    assert not (tmp_path / "bad.f64").exists()
+    assert summary['loss']['n'] == 3 and summary['loss']['final'] != summary['loss']['final']
+    assert summary['epoch'] == {'n': 3, 'final': 3.0, 'min': 1.0, 'max': 3.0, 'mean': 2.0}
+
+def test_long_series_are_flushed_in_blocks_and_memory_mapped(tmp_path):
+    extractor = MetricExtractor([], str(tmp_path))
+    extractor.feed(b"".join(f"XSCHR_METRIC step={i}\n".encode() for i in range(10_000)))
+    # Full blocks are on disk before the run ends
+    assert (tmp_path / "step.f64").stat().st_size >= 8 * 4096
+    extractor.close()
+    values = load_series(str(tmp_path / "step.f64"))
+    assert len(values) == 10_000 and values[0] == 0.0 and values[-1] == 9999.0
+
+def test_rank_puts_missing_and_nan_last():
+    records = [{'run': name, 'metrics': {'loss': {'final': value}} if value is not None else {}}
+               for name, value in (("a", 0.5), ("b", float('nan')), ("c", None), ("d", 0.1))]
+    assert [r['run'] for r in rank(records, 'loss')][:2] == ["d", "a"]
+    assert [r['run'] for r in rank(records, 'loss', maximize=True)][:2] == ["a", "d"]
+
+def test_a_session_records_metrics_per_run(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    (tmp_path / "train.py").write_text(
+        "import sys\nlr = float(sys.argv[2])\n"
+        "for epoch in range(1, 4):\n    print(f'Epoch {epoch} - Loss: {lr * 10 / epoch}')\n")
+    (tmp_path / "c.yaml").write_text("experiments:\n  - name: train\n    script: train.py\n"
+                                     "    runs: [['--lr', '0.1'], ['--lr', '0.02']]\n")
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    settings = SessionSettings(cpu_affinity=False, order='file', output=OutputSettings(echo=False),
+                               metrics=[r"Epoch (?P<epoch>\d+) - Loss: (?P<loss>\S+)"])
+    run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+    (run_dir,) = (tmp_path / "logs").glob("run_*")
+    best = rank(load_results([str(run_dir)]), 'loss')
+    assert [r['run'] for r in best] == ["train_2", "train_1"]
+    assert best[0]['metrics']['loss']['final'] == pytest.approx(0.02 * 10 / 3)
+    assert list(load_series(os.path.join(series_dir(str(run_dir), "train_1"), "epoch.f64"))) == [1.0, 2.0, 3.0]
@@ -0,0 +1,110 @@
+import io
+import os
+import sys
+import json
+from fractions import Fraction
+
+import pytest
+
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.journal import replay
+from xschr.retry import RetryPolicy, parse_retry
+
+# --- Policy ---
+
+def test_parse_retry():
+    assert parse_retry(2)['attempts'] == 2
+    opts = parse_retry({'attempts': 4, 'backoff': '1m', 'exit_codes': [75]})
+    assert opts['backoff'] == 60 and opts['exit_codes'] == [75] and opts['oom']
+    for bad in ({'attempts': 0}, {'tries': 2}, {'patterns': ["("]}, "3", {'oom': 'yes'}):
+        with pytest.raises(ValueError):
+            parse_retry(bad)
+
+def test_classify(tmp_path):
+    log = tmp_path / "run.log"
+    log.write_text("step 1\nRuntimeError: CUDA out of memory. Tried to allocate 2 GiB\n")
+    policy = RetryPolicy(**parse_retry({'exit_codes': [75], 'patterns': ["NCCL error"]}))
+    assert policy.classify('failed', 1, str(log))[0] == 'oom'
+    assert policy.classify('failed', 75, str(log))[0] == 'exit_code'
+    assert policy.classify('timeout', None, str(log)) is None
+
+    log.write_text("NCCL error: unhandled system error\n")
+    assert policy.classify('failed', 1, str(log))[0] == 'pattern'
+    log.write_text("ValueError: bad input\n")
+    assert policy.classify('failed', 1, str(log)) is None
+
+def test_classify_survives_a_corrupt_compressed_log(tmp_path):
+    log = tmp_path / "run.log.gz"
+    log.write_bytes(b"\x1f\x8b not really gzip")
+    assert RetryPolicy().classify('failed', 1, str(log)) is None
+
+def test_backoff_and_oom_placement():
+    policy = RetryPolicy(backoff=10, factor=3, oom_growth=1.5)
+    assert [policy.delay(a) for a in (2, 3, 4)] == [10, 30, 90]
+    assert policy.oom_placement(Fraction(1, 2), 8000) == (1, 12000)
+    assert policy.oom_placement(Fraction(1, 2), 8000, largest_mb=10000) == (1, 10000)
+    assert policy.oom_placement(2, None) == (2, None)
+
+# --- Re-placement through the scheduler ---
+
+OOM_ON_SMALL_CARD = """
+import os, sys
+device = os.environ.get("CUDA_VISIBLE_DEVICES")
+print("device", device, flush=True)
+if device == "0":
+    print("torch.cuda.OutOfMemoryError: CUDA out of memory")
+    sys.exit(1)
+"""
+
+def run(tmp_path, monkeypatch, config, gpu_devices, **kwargs):
+    monkeypatch.delenv('CUDA_VISIBLE_DEVICES', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    path = tmp_path / "c.yaml"
+    path.write_text(config)
+    data, config_abs = load_and_validate(str(path))
+    conf = data.get('config') or {}
+    settings = SessionSettings(gpu_devices=gpu_devices, cpu_affinity=False, order='file',
+                               output=OutputSettings(echo=False), retry=conf.get('retry'), **kwargs)
+    return run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+def run_dir(tmp_path):
+    (name,) = [n for n in os.listdir(tmp_path / "logs") if n.startswith("run_")]
+    return tmp_path / "logs" / name
+
+def test_oom_retry_moves_to_a_bigger_card(tmp_path, monkeypatch):
+    (tmp_path / "train.py").write_text(OOM_ON_SMALL_CARD)
+    config = ("config:\n  retry: {attempts: 2, backoff: 0}\n"
+              "experiments:\n  - name: train\n    script: train.py\n    gpus: 0.5\n    gpu_mem: 6GB\n"
+              "    runs: [{}]\n")
+    # Best fit puts the first attempt on the smaller card
+    stats = run(tmp_path, monkeypatch, config, [{'id': 0, 'total_mb': 8192}, {'id': 1, 'total_mb': 16384}])
+
+    assert stats['success'] == 1 and stats['retried'] == 1
+    logs = run_dir(tmp_path)
+    assert "device 0" in (logs / "train_1.log").read_text()
+    assert "device 1" in (logs / "train_1_attempt2.log").read_text()
+
+def test_failed_attempts_stop_at_the_limit(tmp_path, monkeypatch):
+    (tmp_path / "train.py").write_text(OOM_ON_SMALL_CARD)
+    config = ("config:\n  retry: {attempts: 3, backoff: 0}\n"
+              "experiments:\n  - name: train\n    script: train.py\n    gpus: 1\n    runs: [{}]\n")
+    stats = run(tmp_path, monkeypatch, config, [{'id': 0, 'total_mb': 8192}])
+
+    assert stats['failed'] == 1 and stats['retried'] == 2
+    logs = run_dir(tmp_path)
+    assert sorted(p.name for p in logs.glob("train_1*.log")) == \
+        ["train_1.log", "train_1_attempt2.log", "train_1_attempt3.log"]
+    assert replay(str(logs))['runs']['train_1']['attempt'] == 4
+
+def test_replay_resumes_at_the_pending_attempt(tmp_path):
+    events = [
+        {'event': 'queued', 'run': 'a_1', 'args': []},
+        {'event': 'started', 'run': 'a_1'},
+        {'event': 'retry', 'run': 'a_1', 'attempt': 2, 'reason': 'CUDA out of memory'},
+        {'event': 'started', 'run': 'a_1'},
+    ]
+    (tmp_path / "journal.jsonl").write_text("".join(json.dumps(e) + "\n" for e in events))
+    run = replay(str(tmp_path))['runs']['a_1']
+    assert run['status'] == 'interrupted' and run['attempt'] == 2
@@ -0,0 +1,105 @@
+import io
+import os
+import sys
+import shutil
+import subprocess
+import collections
+
+import pytest
+
+from xschr import staging
+from xschr.config import load_and_validate
+from xschr.engine import OutputSettings, SessionSettings, run_sequence
+from xschr.staging import StageArea, parse_stage, sweep_stale
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    """Stand-ins for /dev/shm and $TMPDIR."""
+    shm, scratch = tmp_path / "shm", tmp_path / "scratch"
+    shm.mkdir()
+    scratch.mkdir()
+    monkeypatch.setattr(staging, 'SHM_DIR', str(shm))
+    monkeypatch.setattr(staging.tempfile, 'tempdir', str(scratch))
+    return shm, scratch
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "train.npy").write_bytes(b"\x00" * 1000)
+    (tmp_path / "data" / "tokens").mkdir()
+    (tmp_path / "data" / "tokens" / "a.txt").write_text("hello")
+    return ["data/train.npy", "data/tokens/"]
+
+def test_parse_stage():
+    assert parse_stage("data/x.npy") == {'files': ["data/x.npy"], 'to': 'shm', 'env': "XSCHR_STAGE_DIR"}
+    assert parse_stage({'files': ["a"], 'to': "/scratch/me"})['to'] == "/scratch/me"
+    for bad in ([], {'files': ["a/x", "b/x"]}, {'files': ["a"], 'to': "relative"},
+                {'files': ["a"], 'env': "1BAD"}, {'files': ["a"], 'copies': 2}):
+        with pytest.raises(ValueError):
+            parse_stage(bad)
+
+def test_the_last_release_removes_the_copies(tmp_path, roots, inputs):
+    area = StageArea("train", inputs, base_dir=str(tmp_path))
+    path = area.acquire()
+    assert area.acquire() == path and os.path.dirname(path) == str(roots[0])
+    assert open(os.path.join(path, "tokens", "a.txt")).read() == "hello"
+    assert os.stat(os.path.join(path, "train.npy")).st_mode & 0o777 == 0o444
+
+    area.release()
+    assert os.path.isdir(path)
+    area.release()
+    assert not os.path.exists(path) and area.path is None
+    # Staged again on the next use
+    assert os.path.isdir(area.acquire())
+    area.close()
+    assert os.listdir(roots[0]) == []
+
+def test_a_full_shm_falls_back_to_scratch(tmp_path, roots, inputs, monkeypatch):
+    shm, scratch = roots
+    usage = collections.namedtuple('usage', 'total used free')
+    real = shutil.disk_usage
+    monkeypatch.setattr(staging.shutil, 'disk_usage',
+                        lambda path: usage(1 << 30, 1 << 30, 0) if path == str(shm) else real(path))
+    area = StageArea("train", inputs, base_dir=str(tmp_path))
+    assert os.path.dirname(area.acquire()) == str(scratch)
+    area.close()
+
+    monkeypatch.setattr(staging.shutil, 'disk_usage', lambda path: usage(1 << 30, 1 << 30, 0))
+    with pytest.raises(OSError, match="No room to stage"):
+        StageArea("train", inputs, base_dir=str(tmp_path)).acquire()
+
+def test_missing_inputs_are_reported(tmp_path, roots):
+    with pytest.raises(FileNotFoundError, match="missing.npy"):
+        StageArea("train", ["missing.npy"], base_dir=str(tmp_path)).acquire()
+
+def test_leftovers_of_dead_sessions_are_swept(tmp_path):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    (tmp_path / f"xschr-stage-{dead.pid}-train").mkdir()
+    (tmp_path / f"xschr-stage-{os.getpid()}-train").mkdir()
+    sweep_stale(str(tmp_path))
+    assert os.listdir(tmp_path) == [f"xschr-stage-{os.getpid()}-train"]
+
+READER = """
+import os, sys
+stage = os.environ["XSCHR_STAGE_DIR"]
+print("staged", stage, sorted(os.listdir(stage)), os.path.getsize(os.path.join(stage, "train.npy")))
+"""
+
+def test_runs_of_an_experiment_share_one_staged_copy(tmp_path, roots, inputs, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "xdg"))
+    monkeypatch.setattr(sys, 'stdin', io.StringIO("\n"))
+    (tmp_path / "read.py").write_text(READER)
+    (tmp_path / "c.yaml").write_text("experiments:\n  - name: train\n    script: read.py\n"
+                                     f"    stage: {inputs}\n    runs: [{{}}, {{}}, {{}}]\n")
+    data, config_abs = load_and_validate(str(tmp_path / "c.yaml"))
+    settings = SessionSettings(jobs=2, cpu_affinity=False, order='file', output=OutputSettings(echo=False))
+    stats = run_sequence(data['experiments'], config_abs, sys.executable, str(tmp_path / "logs"), settings)
+
+    assert stats['success'] == 3
+    (run_dir,) = (tmp_path / "logs").glob("run_*")
+    lines = {next(line for line in (run_dir / f"train_{i}.log").read_text().splitlines()
+                  if line.startswith("staged")) for i in (1, 2, 3)}
+    assert len(lines) == 1 and "['tokens', 'train.npy'] 1000" in lines.pop()
+    # Removed after the last run
+    assert os.listdir(roots[0]) == []
@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+from xschr import sweep
+from xschr.config import count_runs, iter_runs
+
+def test_grid_is_the_cartesian_product():
+    spec = {'params': {'lr': [0.1, 0.01], 'epochs': {'range': [5, 20, 5]}, 'amp': [True, False]}}
+    runs = list(sweep.iter_arg_lists(spec))
+    assert sweep.count(spec) == len(runs) == 12
+    assert runs[0] == ['--lr', '0.1', '--epochs', '5', '--amp']
+    assert runs[-1] == ['--lr', '0.01', '--epochs', '15']
+
+def test_zip_pairs_values_and_checks_lengths():
+    spec = {'method': 'zip', 'params': {'lr': {'logspace': [1e-4, 1e-2, 3]}, 'bs': [32, 64, 128]}}
+    assert list(sweep.iter_arg_lists(spec)) == [
+        ['--lr', '0.0001', '--bs', '32'], ['--lr', '0.001', '--bs', '64'], ['--lr', '0.01', '--bs', '128']]
+    with pytest.raises(ValueError, match="same length"):
+        sweep.validate({'method': 'zip', 'params': {'lr': [1, 2], 'bs': [1]}})
+
+def test_random_sweeps_repeat_with_their_seed():
+    spec = {'method': 'random', 'samples': 20, 'seed': 3,
+            'params': {'lr': {'log_uniform': [1e-4, 1e-1]}, 'layers': {'int': [2, 8]}, 'opt': ['adam', 'sgd']}}
+    runs = list(sweep.iter_arg_lists(spec))
+    assert runs == list(sweep.iter_arg_lists(spec)) and len(runs) == sweep.count(spec)
+    assert runs != list(sweep.iter_arg_lists({**spec, 'seed': 4}))
+    for args in runs:
+        values = dict(zip(args[::2], args[1::2]))
+        assert 1e-4 <= float(values['--lr']) <= 1e-1 and 2 <= int(values['--layers']) <= 8
+
+@pytest.mark.parametrize("spec", [
+    {'params': {}},
+    {'method': 'bayes', 'params': {'lr': [1]}},
+    {'method': 'random', 'params': {'lr': [1]}},
+    {'params': {'lr': {'range': [0, 1, 0]}}},
+    {'params': {'lr': {'logspace': [0, 1, 3]}}},
+    {'method': 'random', 'samples': 2, 'params': {'lr': {'uniform': [1, 0]}}},
+])
+def test_malformed_sweeps_are_rejected(spec):
+    with pytest.raises(ValueError):
+        sweep.validate(spec)
+
+def test_huge_sweeps_are_counted_and_streamed_without_expanding():
+    # 10^12 points: only the ones taken are ever generated
+    exp = {'args': "--data x", 'runs': [{'args': "--lr 1"}],
+           'sweep': {'params': {f"p{i}": {'range': [0, 10]} for i in range(12)}}}
+    assert count_runs(exp) == 1 + 10 ** 12
+    first = list(itertools.islice(iter_runs(exp), 3))
+    assert first[0] == ['--data', 'x', '--lr', '1']
+    assert first[1][:4] == ['--data', 'x', '--p0', '0'] and first[2][-2:] == ['--p11', '1']
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+
+import pytest
+
+from xschr.agents import _RemoteRun
+from xschr.daemon import _JobProcesses
+from xschr.engine import OutputSettings, RunOptions, SessionSettings, _WorkerPool, _execute_subprocess
+from xschr.watchdog import own_group, parse_duration, stop_group
+
+posix_only = pytest.mark.skipif(not hasattr(os, 'killpg'), reason="needs process groups")
+
+class FakeLink:
+    """The coordinator's side of an agent connection, recording what is sent to it."""
+    def __init__(self):
+        self.sent = []
+
+    def send(self, header, payload=b""):
+        self.sent.append(header)
+
+def test_parse_duration():
+    assert parse_duration(90) == 90
+    assert parse_duration("30m") == 1800
+    assert parse_duration("1.5h") == 5400
+    for bad in ("soon", 0, -5, True, "10d"):
+        with pytest.raises(ValueError):
+            parse_duration(bad)
+
+# --- Timeouts ---
+
+def script(tmp_path, body):
+    path = tmp_path / "run.py"
+    path.write_text(body)
+    return [sys.executable, str(path)]
+
+def execute(tmp_path, cmd, usage, **limits):
+    return _execute_subprocess(cmd, str(tmp_path / "run.log"), RunOptions(**limits), OutputSettings(echo=False),
+                               usage=usage)
+
+@posix_only
+def test_timeout_stops_the_run_with_its_children(tmp_path):
+    # The child starts a grandchild in the same group and records its pid
+    cmd = script(tmp_path, f"""
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+open({str(tmp_path / 'pid')!r}, "w").write(str(child.pid))
+time.sleep(60)
+""")
+    usage = {}
+    started = time.monotonic()
+    exit_code = execute(tmp_path, cmd, usage, timeout=1)
+    assert exit_code != 0 and time.monotonic() - started < 30
+    assert usage['timeout'] == "exceeded timeout of 1s"
+    assert "Killed: exceeded timeout of 1s" in (tmp_path / "run.log").read_text()
+
+    grandchild = int((tmp_path / "pid").read_text())
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            os.kill(grandchild, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("the run's child outlived the timeout")
+
+def test_idle_timeout_spares_a_chatty_run(tmp_path):
+    cmd = script(tmp_path, "import time\nfor i in range(6):\n    print(i, flush=True)\n    time.sleep(0.3)\n")
+    usage = {}
+    assert execute(tmp_path, cmd, usage, idle_timeout=1.5) == 0
+    assert 'timeout' not in usage
+
+def test_idle_timeout_stops_a_silent_run(tmp_path):
+    cmd = script(tmp_path, "import time\nprint('loading', flush=True)\ntime.sleep(60)\n")
+    usage = {}
+    assert execute(tmp_path, cmd, usage, idle_timeout=1) != 0
+    assert "idle_timeout" in usage['timeout']
+
+# --- Cancelling ---
+
+@posix_only
+def test_stop_group_reaches_an_exited_leaders_group(tmp_path):
+    import subprocess
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True)
+    pgid = own_group(process)
+    assert pgid == process.pid
+    stop_group(process, pgid, grace=1, wait=True)
+    assert process.poll() is not None
+
+def test_cancelling_a_job_reaches_its_remote_runs():
+    link = FakeLink()
+    remote = _RemoteRun(7, link)
+    assert own_group(remote) is None
+
+    handle = _JobProcesses()
+    assert handle.register(remote)
+    handle.cancel()
+    assert link.sent == [{'op': 'cancel', 'run': 7}]
+    assert not handle.register(_RemoteRun(8, link))
+
+def test_cancelling_the_worker_pool_reaches_its_remote_runs():
+    link = FakeLink()
+    pool = _WorkerPool(SessionSettings(jobs=2), stats={})
+    assert pool.register(_RemoteRun(3, link))
+    pool.cancel()
+    assert link.sent == [{'op': 'cancel', 'run': 3}]
@@ -5,16 +5,18 @@ the main entry point. invoke as `xschr' or `python -m xschr' from the terminal.
 """
 
 import sys
+import time
 
 def main():
     """
     Wrapper to handle strict exit codes and keyboard interrupts.
     """
+    started = time.perf_counter()
     try:
         # Lazy import: We don't load the heavy logic until we are sure
         # the user actually wants to run the program.
         from xschr.core import main as xschr_main
-        exit_status = xschr_main()
+        exit_status = xschr_main(started=started)
     except KeyboardInterrupt:
         # Standard Unix convention: 128 + SIGINT (2) = 130
         exit_status = 130
@@ -0,0 +1,207 @@
+"""
+xschr.accounting
+
+per-run resource accounting: wall time, CPU time, peak RSS and block I/O.
+
+Direct children are reaped with os.wait4 for exact rusage; on Linux a sampler thread
+also walks /proc for the whole process tree (multi-process dataloaders, warm-start
+runs that are not our children) to catch tree-wide RSS and I/O.
+"""
+
+import os
+import json
+import threading
+import subprocess
+
+RUNS_FILENAME = "runs.jsonl"
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_HAS_PROC = os.path.isdir('/proc/self')
+
+# Columns of the summary table: key -> (header, format)
+COLUMNS = {
+    'wall': ('Wall', '{:>8.1f}s'),
+    'cpu': ('CPU', '{:>8.1f}s'),
+    'rss': ('Peak RSS', '{:>7.0f}MB'),
+    'io': ('I/O', '{:>7.1f}MB'),
+}
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _children(pid):
+    """Direct children of pid via /proc/<pid>/task/*/children."""
+    kids = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return kids
+    for tid in tasks:
+        data = _read(f"/proc/{pid}/task/{tid}/children")
+        if data:
+            kids.extend(int(c) for c in data.split())
+    return kids
+
+class ProcessTreeSampler:
+    """Background thread that samples RSS, CPU and I/O of a process tree from /proc."""
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._cpu = {}  # pid -> (utime, stime) seconds, last seen
+        self._io = {}   # pid -> (read_bytes, write_bytes), last seen
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        if _HAS_PROC:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _loop(self):
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self):
+        """Take one sample of the whole tree rooted at self.pid."""
+        rss = 0
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            statm = _read(f"/proc/{pid}/statm")
+            if statm is None:
+                continue
+            rss += int(statm.split()[1]) * _PAGE_SIZE
+
+            stat = _read(f"/proc/{pid}/stat")
+            if stat:
+                # Fields after the ")" of the comm: utime and stime are the 12th and 13th
+                fields = stat[stat.rfind(b")") + 2:].split()
+                self._cpu[pid] = (int(fields[11]) / _CLK_TCK, int(fields[12]) / _CLK_TCK)
+
+            io = _read(f"/proc/{pid}/io")
+            if io:
+                values = dict(line.split(b": ") for line in io.splitlines() if b": " in line)
+                self._io[pid] = (int(values.get(b"read_bytes", 0)), int(values.get(b"write_bytes", 0)))
+
+            pending.extend(_children(pid))
+        self.peak_rss = max(self.peak_rss, rss)
+
+    @property
+    def cpu(self):
+        return (sum(u for u, _ in self._cpu.values()), sum(s for _, s in self._cpu.values()))
+
+    @property
+    def has_io(self):
+        return bool(self._io)
+
+    @property
+    def io(self):
+        return (sum(r for r, _ in self._io.values()), sum(w for _, w in self._io.values()))
+
+def wait_with_rusage(process):
+    """
+    Wait for `process` and return (exit_code, rusage or None).
+    rusage is only available for our own Popen children.
+    """
+    if isinstance(process, subprocess.Popen) and hasattr(os, 'wait4'):
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Already reaped (e.g. by Popen.poll during a cancel)
+            return process.wait(), None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, rusage
+    return process.wait(), None
+
+def summarize(wall, rusage=None, sampler=None):
+    """Merge rusage and sampler readings into one flat record (seconds / MB)."""
+    usage = {'wall_s': round(wall, 3)}
+    user = sys_ = peak_mb = read_mb = write_mb = None
+
+    if rusage is not None:
+        user, sys_ = rusage.ru_utime, rusage.ru_stime
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak_mb = rusage.ru_maxrss / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024)
+        read_mb = rusage.ru_inblock * 512 / 1e6
+        write_mb = rusage.ru_oublock * 512 / 1e6
+
+    if sampler is not None and sampler.peak_rss:
+        tree_user, tree_sys = sampler.cpu
+        if user is None:
+            user, sys_ = tree_user, tree_sys
+        peak_mb = max(peak_mb or 0, sampler.peak_rss / (1024 * 1024))
+        tree_read, tree_write = sampler.io
+        if sampler.has_io:
+            read_mb, write_mb = tree_read / 1e6, tree_write / 1e6
+
+    for key, value in (('user_s', user), ('sys_s', sys_), ('peak_rss_mb', peak_mb),
+                       ('read_mb', read_mb), ('write_mb', write_mb)):
+        usage[key] = round(value, 3) if value is not None else None
+    return usage
+
+class RunRecorder:
+    """Appends one JSON record per finished run to <run_dir>/runs.jsonl."""
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, RUNS_FILENAME)
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+
+def sort_key(column):
+    """Descending sort key for a summary column."""
+    def key(record):
+        if column == 'wall':
+            value = record.get('wall_s')
+        elif column == 'cpu':
+            value = (record.get('user_s') or 0) + (record.get('sys_s') or 0)
+        elif column == 'rss':
+            value = record.get('peak_rss_mb')
+        else:
+            value = (record.get('read_mb') or 0) + (record.get('write_mb') or 0)
+        return -(value or 0)
+    return key
+
+def print_usage_table(records, sort_by='wall', limit=20):
+    """Print a resource table of finished runs, heaviest first by `sort_by`."""
+    # Cached runs are recorded (for their metrics) but used no resources this session
+    rows = sorted((r for r in records if r['status'] != 'cached'), key=sort_key(sort_by))
+    if not rows:
+        return
+    width = max(len(r['run']) for r in rows[:limit])
+    width = max(width, 3)
+
+    print(f"\n[Resources] sorted by {sort_by}")
+    header = "  " + "Run".ljust(width) + "  " + "".join(f"{COLUMNS[c][0]:>11}" for c in COLUMNS) + "  Status"
+    print(header)
+    for r in rows[:limit]:
+        values = {
+            'wall': r.get('wall_s'),
+            'cpu': (r['user_s'] or 0) + (r['sys_s'] or 0) if r.get('user_s') is not None else None,
+            'rss': r.get('peak_rss_mb'),
+            'io': (r['read_mb'] or 0) + (r['write_mb'] or 0) if r.get('read_mb') is not None else None,
+        }
+        cells = "".join(
+            COLUMNS[c][1].format(values[c]).rjust(11) if values[c] is not None else "-".rjust(11)
+            for c in COLUMNS
+        )
+        print(f"  {r['run'].ljust(width)}  {cells}  {r['status']}")
+    if len(rows) > limit:
+        print(f"  ... {len(rows) - limit} more run(s) in {RUNS_FILENAME}")
@@ -0,0 +1,617 @@
+"""
+xschr.agents
+
+multi-host execution: `xschr agent` processes run work for a coordinating `xschr daemon`.
+
+    xschr daemon --listen 0.0.0.0:7621 --token SECRET      # coordinator (-j 0: agents only)
+    xschr agent --coordinator head:7621 --token SECRET     # on every worker host
+
+An agent connects out to the coordinator and advertises its slots (core count or
+--slots) and GPUs (detected through the CUDA driver). The coordinator sends it run
+specs; the agent streams the runs' output and exit codes back, and the coordinator
+writes the logs, so a run directory looks the same wherever its runs executed.
+Commands are sent as-is: scripts and python_cmd must exist at the same paths on
+every host (e.g. a shared filesystem).
+
+Agents with GPUs report their devices' free memory every few seconds, so the coordinator
+admits runs with `gpu_mem` onto them the way it does locally (see xschr.gpu_slots).
+
+If the connection drops, the agent keeps its runs going, buffers what they print and
+reconnects; the coordinator waits `grace` seconds for it before requeueing those runs.
+
+The token only keeps strangers from connecting: the link is plain TCP, so the token,
+commands, environments and run output can be read by anyone on the network path.
+A coordinator listening beyond loopback refuses to start without one; on untrusted
+networks, tunnel the port (e.g. ssh -L or a VPN) and listen on loopback.
+
+Wire format, both directions: one JSON header line per message; a header with
+"size" is followed by that many raw bytes (run output).
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+import collections
+
+DEFAULT_PORT = 7621
+TOKEN_ENV = "XSCHR_TOKEN"
+
+# Seconds the coordinator keeps a disconnected agent's runs before requeueing them
+AGENT_GRACE = 60
+
+# Output an agent holds while disconnected; beyond this, the oldest output is dropped
+_MAX_BUFFERED = 64 << 20
+
+_CHUNK_SIZE = 1 << 16
+
+# Seconds between an agent's GPU memory reports
+_MEMORY_INTERVAL = 5.0
+
+def parse_address(value, default_host="127.0.0.1"):
+    """'host:port', 'host' or ':port' -> (host, port)."""
+    host, sep, port = value.rpartition(":")
+    if not sep:
+        host, port = value, ""
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+def _send(sock, lock, header, payload=b""):
+    if payload:
+        header = {**header, 'size': len(payload)}
+    data = json.dumps(header).encode() + b"\n" + payload
+    with lock:
+        sock.sendall(data)
+
+def _read(rfile):
+    """Next (header, payload) from a connection, or (None, None) at EOF."""
+    line = rfile.readline()
+    if not line:
+        return None, None
+    header = json.loads(line)
+    size = header.get('size', 0)
+    payload = rfile.read(size) if size else b""
+    if len(payload) < size:
+        return None, None
+    return header, payload
+
+# --- Agent (worker host) ---
+
+class _Outbox:
+    """Messages waiting to reach the coordinator; survives reconnects."""
+    def __init__(self):
+        self._items = collections.deque()
+        self._bytes = 0
+        self._dropped = {}   # run id -> output bytes dropped
+        self._cond = threading.Condition()
+
+    def put(self, header, payload=b""):
+        with self._cond:
+            self._items.append((header, payload))
+            self._bytes += len(payload)
+            # Drop the oldest output (never exits) once the buffer is full
+            while self._bytes > _MAX_BUFFERED:
+                for i, (h, p) in enumerate(self._items):
+                    if h['op'] == 'output':
+                        del self._items[i]
+                        self._bytes -= len(p)
+                        self._dropped[h['run']] = self._dropped.get(h['run'], 0) + len(p)
+                        break
+                else:
+                    break
+            self._cond.notify()
+
+    def peek(self, timeout):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            header, payload = self._items[0]
+            dropped = self._dropped.pop(header.get('run'), 0)
+            if dropped and header['op'] == 'output':
+                payload = f"\n[xschr agent: {dropped} bytes dropped while disconnected]\n".encode() + payload
+                self._items[0] = (header, payload)
+            return header, payload
+
+    def pop(self):
+        with self._cond:
+            header, payload = self._items.popleft()
+            self._bytes -= len(payload)
+            return header
+
+class Agent:
+    """
+    Executes runs for a coordinator; reconnects with backoff until stopped.
+    `memory_probe` returns the GPUs' live memory as cuda_devices.device_status does (the default).
+    """
+    def __init__(self, address, name=None, slots=None, token=None, gpu_devices=None, memory_probe=None):
+        from .watchdog import Watchdog
+
+        self.address = address
+        self.name = name or socket.gethostname()
+        self.slots = slots or os.cpu_count() or 1
+        self.token = token
+        if gpu_devices is None:
+            from .system import get_hardware_inventory
+            gpu_devices = get_hardware_inventory(refresh=True)['gpus']
+        self.gpus = [{'id': g['id'], 'name': g.get('name', ''), 'total_mb': g.get('total_mb')} for g in gpu_devices]
+        if memory_probe is None and gpu_devices:
+            from .cuda_devices import device_status
+            memory_probe = lambda: device_status(gpu_devices)
+        self.memory_probe = memory_probe
+        self.stopping = threading.Event()
+        self._outbox = _Outbox()
+        self._procs = {}   # run id -> Popen
+        self._open = set()  # run ids whose exit has not reached the coordinator yet
+        self._cancelled = set()  # run ids cancelled before their process was started
+        self._watchdog = Watchdog()   # the coordinator's timeout / idle_timeout
+        self._lock = threading.Lock()
+        self._sock = None
+
+    def _log(self, message):
+        from datetime import datetime
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+    def serve(self):
+        delay = 1
+        while not self.stopping.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=10)
+            except OSError as e:
+                self._log(f"cannot reach coordinator {self.address[0]}:{self.address[1]} ({e}); retrying in {delay}s")
+                self.stopping.wait(delay)
+                delay = min(delay * 2, 30)
+                continue
+            delay = 1
+            self._sock = sock
+            try:
+                self._session(sock)
+            except (OSError, ValueError) as e:
+                if not self.stopping.is_set():
+                    self._log(f"connection lost ({e})")
+            finally:
+                sock.close()
+            if not self.stopping.is_set():
+                self.stopping.wait(1)
+
+    def _session(self, sock):
+        sock.settimeout(None)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        send_lock = threading.Lock()
+        with self._lock:
+            running = sorted(self._open)
+        _send(sock, send_lock, {'op': 'hello', 'name': self.name, 'slots': self.slots, 'gpus': self.gpus,
+                                'cpus': os.cpu_count() or 1, 'running': running, 'token': self.token})
+        rfile = sock.makefile('rb')
+        header, _ = _read(rfile)
+        if header is not None and header.get('op') == 'refused':
+            self._log(f"refused by the coordinator: {header.get('error')}")
+            self.stopping.set()
+            return
+        if header is None or header.get('op') != 'welcome':
+            raise ValueError("coordinator closed the connection")
+        # Runs the coordinator gave up on (e.g. it restarted and requeued them)
+        for run_id in header.get('orphans', []):
+            self._cancel(run_id)
+        self._log(f"connected to {self.address[0]}:{self.address[1]} as '{self.name}' "
+                  f"({self.slots} slot(s), {len(self.gpus)} GPU(s))")
+
+        closed = threading.Event()
+        sender = threading.Thread(target=self._send_loop, args=(sock, send_lock, closed), daemon=True)
+        sender.start()
+        try:
+            while True:
+                header, payload = _read(rfile)
+                if header is None:
+                    raise ConnectionError("coordinator closed the connection")
+                if header['op'] == 'run' and self.stopping.is_set():
+                    self._outbox.put({'op': 'exit', 'run': header['run'], 'exit_code': None, 'lost': True})
+                elif header['op'] == 'run':
+                    # Open before a cancel that follows can be read
+                    with self._lock:
+                        self._open.add(header['run'])
+                    threading.Thread(target=self._run, args=(header,), daemon=True).start()
+                elif header['op'] == 'cancel':
+                    self._cancel(header['run'])
+        finally:
+            closed.set()
+            sender.join()
+
+    def _send_loop(self, sock, lock, closed):
+        reported = None
+        while not closed.is_set():
+            if self.memory_probe is not None and (reported is None
+                                                  or time.monotonic() - reported >= _MEMORY_INTERVAL):
+                reported = time.monotonic()
+                if not self._report_memory(sock, lock):
+                    return
+            item = self._outbox.peek(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                _send(sock, lock, *item)
+            except OSError:
+                # Stays queued for the next connection
+                sock.close()
+                return
+            if self._outbox.pop()['op'] == 'exit':
+                with self._lock:
+                    self._open.discard(item[0]['run'])
+
+    def _report_memory(self, sock, lock):
+        """Send the GPUs' free memory to the coordinator. Returns False if the connection broke."""
+        try:
+            status = self.memory_probe()
+        except Exception:
+            return True
+        try:
+            _send(sock, lock, {'op': 'memory', 'gpus': [{'id': s['id'], 'total_mb': s.get('total_mb'),
+                                                         'free_mb': s.get('free_mb')} for s in status]})
+        except OSError:
+            sock.close()
+            return False
+        return True
+
+    def _cancel(self, run_id):
+        with self._lock:
+            process = self._procs.get(run_id)
+            if process is None and run_id in self._open:
+                # Not spawned yet: _run stops it as soon as it is
+                self._cancelled.add(run_id)
+        if process is not None:
+            # The run leads its own group: stop its workers too
+            from .watchdog import stop_group, own_group
+            stop_group(process, own_group(process))
+
+    def _run(self, spec):
+        import subprocess
+        from .accounting import ProcessTreeSampler, wait_with_rusage, summarize
+
+        run_id = spec['run']
+        env = os.environ.copy()
+        env['PYTHONUNBUFFERED'] = '1'
+        env_extra = dict(spec.get('env_extra') or {})
+        if env_extra.get('CUDA_VISIBLE_DEVICES'):
+            # The coordinator leases GPUs by the ordinals this agent advertised: map them to this host's devices
+            from .gpu_slots import cuda_visible_devices
+            ordinals = [int(d) for d in env_extra['CUDA_VISIBLE_DEVICES'].split(',')]
+            env_extra['CUDA_VISIBLE_DEVICES'] = cuda_visible_devices(ordinals)
+        env.update(env_extra)
+        exit_code, usage, watch = None, {}, None
+        try:
+            started = time.monotonic()
+            process = subprocess.Popen(spec['cmd'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       env=env, bufsize=0, start_new_session=hasattr(os, 'setsid'))
+        except OSError as e:
+            with self._lock:
+                self._cancelled.discard(run_id)
+            self._outbox.put({'op': 'output', 'run': run_id}, f"[xschr agent {self.name}] {e}\n".encode())
+            self._outbox.put({'op': 'exit', 'run': run_id, 'exit_code': None, 'usage': usage})
+            return
+
+        with self._lock:
+            self._procs[run_id] = process
+            cancelled = run_id in self._cancelled
+            self._cancelled.discard(run_id)
+        if cancelled:
+            self._cancel(run_id)
+        if spec.get('timeout') is not None or spec.get('idle_timeout') is not None:
+            watch = self._watchdog.watch(process, timeout=spec.get('timeout'), idle_timeout=spec.get('idle_timeout'))
+        sampler = ProcessTreeSampler(process.pid).start()
+        try:
+            fd = process.stdout.fileno()
+            while True:
+                chunk = os.read(fd, _CHUNK_SIZE)
+                if not chunk:
+                    break
+                if watch is not None:
+                    watch.touch()
+                self._outbox.put({'op': 'output', 'run': run_id}, chunk)
+            process.stdout.close()
+            exit_code, rusage = wait_with_rusage(process)
+        finally:
+            if watch is not None:
+                self._watchdog.unwatch(watch)
+            sampler.stop()
+            with self._lock:
+                self._procs.pop(run_id, None)
+        usage = summarize(time.monotonic() - started, rusage, sampler)
+        if watch is not None and watch.reason:
+            usage['timeout'] = watch.reason
+        # Killed because this agent is shutting down: the coordinator runs it again elsewhere
+        lost = self.stopping.is_set()
+        self._outbox.put({'op': 'exit', 'run': run_id, 'exit_code': exit_code, 'usage': usage, 'lost': lost})
+
+    def stop(self, drain=5.0):
+        """Stop the runs and their process groups, give their exits `drain` seconds to arrive and disconnect."""
+        from .watchdog import stop_group, own_group
+
+        self.stopping.set()
+        self._outbox.put({'op': 'bye'})
+        with self._lock:
+            procs = list(self._procs.values())
+        for p in procs:
+            stop_group(p, own_group(p))
+
+        def disconnect():
+            deadline = time.monotonic() + drain
+            while self._open and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        threading.Thread(target=disconnect, daemon=True).start()
+
+# --- Coordinator ---
+
+
+class AgentLost(ConnectionError):
+    """The agent running a run went away and did not come back within the grace period."""
+
+class _RemoteRun:
+    """A run executing on an agent; the hub puts its ('output' | 'exit' | 'lost', value) events on a queue."""
+    def __init__(self, run_id, link):
+        import queue
+        self.run_id = run_id
+        self.link = link
+        self.events = queue.Queue()
+
+    def terminate(self):
+        """Ask the agent to stop the run (this is the `process` registered with a job's handle)."""
+        try:
+            self.link.send({'op': 'cancel', 'run': self.run_id})
+        except OSError:
+            pass
+
+class AgentLink:
+    """
+    Coordinator-side state of one connected agent.
+    `memory_probe` returns the agent's last GPU memory report for its slot pool.
+    """
+    def __init__(self, hello, sock, memory_probe=None):
+        from .gpu_slots import GpuSlotPool
+
+        self.name = str(hello['name'])
+        self.slots = max(1, int(hello['slots']))
+        self.cpus = hello.get('cpus')
+        self.gpus = hello.get('gpus') or []
+        self.gpu_pool = GpuSlotPool(self.gpus, memory_probe=memory_probe, probe_interval=0)
+        self.busy = 0
+        self.running = {}   # run id -> _RemoteRun
+        self.alive = True
+        self.leaving = False   # the agent is shutting down: no new runs
+        self.lost_at = None
+        self._sock = sock
+        self._send_lock = threading.Lock()
+
+    @property
+    def free(self):
+        return self.slots - self.busy if self.alive and not self.leaving else 0
+
+    def send(self, header, payload=b""):
+        _send(self._sock, self._send_lock, header, payload)
+
+class AgentHub:
+    """TCP listener that agents connect to; places runs on them and relays their output."""
+    def __init__(self, address, token=None, grace=AGENT_GRACE):
+        self.address = address
+        self.token = token
+        self.grace = grace
+        self.closing = threading.Event()
+        self.on_change = None   # called when capacity may have appeared
+        self.log = print
+        self._links = {}   # agent name -> AgentLink
+        self._memory = {}  # agent name -> its last GPU memory report
+        self._lock = threading.Lock()
+        self._server = None
+
+    # -- Server --
+
+    def start(self):
+        import socketserver
+
+        hub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                hub._serve_agent(self.request, self.rfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server(self.address, Handler)
+        self.address = self._server.server_address[:2]
+        threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.5}, daemon=True).start()
+
+    def close(self):
+        self.closing.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _serve_agent(self, sock, rfile):
+        import hmac
+
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        try:
+            hello, _ = _read(rfile)
+        except ValueError:
+            return
+        if hello is None or hello.get('op') != 'hello':
+            return
+        if self.token and not hmac.compare_digest(str(hello.get('token') or ''), self.token):
+            _send(sock, threading.Lock(), {'op': 'refused', 'error': 'bad token'})
+            self.log(f"refused agent '{hello.get('name')}' from {sock.getpeername()[0]}: bad token")
+            return
+
+        name = str(hello['name'])
+        link = AgentLink(hello, sock, memory_probe=lambda: self._memory.get(name, []))
+        still_running = set(hello.get('running') or [])
+        with self._lock:
+            previous = self._links.get(link.name)
+            self._links[link.name] = link
+            # Reconnect: adopt the runs the agent still has, give up on the ones it lost
+            if previous is not None:
+                previous.alive = False
+                link.gpu_pool = previous.gpu_pool
+                for run_id, remote in list(previous.running.items()):
+                    del previous.running[run_id]
+                    if run_id in still_running:
+                        remote.link = link
+                        link.running[run_id] = remote
+                        link.busy += 1
+                    else:
+                        remote.events.put(('lost', f"agent '{link.name}' restarted without the run"))
+                previous.busy = 0
+        orphans = sorted(still_running - set(link.running))
+        link.send({'op': 'welcome', 'orphans': orphans})
+        self.log(f"agent '{link.name}' connected from {sock.getpeername()[0]}: {link.slots} slot(s), "
+                  f"{len(link.gpus)} GPU(s)" + (f", {len(link.running)} run(s) resumed" if link.running else ""))
+        self._changed()
+
+        try:
+            while True:
+                header, payload = _read(rfile)
+                if header is None:
+                    break
+                if header['op'] == 'bye':
+                    link.leaving = True
+                    continue
+                if header['op'] == 'memory':
+                    self._memory[link.name] = header.get('gpus') or []
+                    self._changed()
+                    continue
+                remote = link.running.get(header.get('run'))
+                if remote is None:
+                    continue
+                if header['op'] == 'output':
+                    remote.events.put(('output', payload))
+                elif header['op'] == 'exit':
+                    remote.events.put(('lost', f"agent '{link.name}' stopped") if header.get('lost')
+                                      else ('exit', header))
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            if not link.alive:
+                return   # replaced by a newer connection
+            link.alive = False
+            link.lost_at = time.monotonic()
+        if not self.closing.is_set():
+            self.log(f"agent '{link.name}' disconnected"
+                     + (f"; keeping its {len(link.running)} run(s) for {self.grace}s" if link.running else ""))
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    # -- Placement --
+
+    def describe(self):
+        with self._lock:
+            return [{'name': link.name, 'slots': link.slots, 'busy': link.busy, 'gpus': len(link.gpus),
+                     'connected': link.alive} for link in self._links.values() if link.alive or link.running]
+
+    def max_free(self):
+        with self._lock:
+            return max((link.free for link in self._links.values()), default=0)
+
+    def place(self, amount, mem_mb=None):
+        """Reserve a slot (and `amount` GPUs with `mem_mb` to spare, if not None) on the agent with the most
+        free slots. Returns (AgentLink, GpuLease or None), or None if no agent has room right now."""
+        with self._lock:
+            for link in sorted(self._links.values(), key=lambda l: -l.free):
+                if link.free <= 0:
+                    break
+                lease = None
+                if amount is not None:
+                    lease = link.gpu_pool.try_lease(amount, mem_mb=mem_mb)
+                    if lease is None:
+                        continue
+                link.busy += 1
+                return link, lease
+        return None
+
+    # -- Execution --
+
+    def execute(self, link, lease, run_id, cmd, log_path, pool=None, usage=None, log_codec=None,
+                max_log_bytes=None, timeout=None, idle_timeout=None):
+        """
+        Run `cmd` on the agent behind `link` (reserved with `place`) and write its output to
+        `log_path`, like engine._execute_subprocess does for local runs; the agent enforces
+        `timeout` / `idle_timeout` and reports why it stopped the run in `usage['timeout']`.
+        Returns the exit code; raises AgentLost if the agent dropped the run.
+        """
+        import queue
+        from datetime import datetime
+        from .logstore import open_log
+
+        remote = _RemoteRun(run_id, link)
+        with self._lock:
+            link.running[run_id] = remote
+        # Ordinals on the agent, which maps them through its own CUDA_VISIBLE_DEVICES
+        env_extra = {'CUDA_VISIBLE_DEVICES': lease.visible_devices} if lease else {}
+        closing_since = None
+        try:
+            with open_log(log_path, codec=log_codec, max_bytes=max_log_bytes) as f:
+                header = f"Cmd: {' '.join(cmd)}\n"
+                header += f"Start: {datetime.now()}\n"
+                header += f"Host: {link.name}\n"
+                for key, value in env_extra.items():
+                    header += f"Env: {key}={value}\n"
+                header += "-" * 40 + "\n"
+                f.write(header.encode())
+                f.flush()
+
+                if pool is not None and not pool.register(remote):
+                    return None
+                try:
+                    link.send({'op': 'run', 'run': run_id, 'cmd': cmd, 'env_extra': env_extra,
+                               'timeout': timeout, 'idle_timeout': idle_timeout})
+                except OSError:
+                    pass   # the agent reports the run as lost or reconnects without it
+
+                while True:
+                    try:
+                        kind, value = remote.events.get(timeout=1.0)
+                    except queue.Empty:
+                        # A gone agent is waited for `grace` seconds, or a few seconds on shutdown
+                        current = remote.link
+                        if self.closing.is_set():
+                            closing_since = closing_since or time.monotonic()
+                        if not current.alive and current.lost_at is not None and \
+                                time.monotonic() - current.lost_at > self.grace:
+                            raise AgentLost(f"agent '{current.name}' did not come back")
+                        if closing_since is not None and time.monotonic() - closing_since > 10:
+                            raise AgentLost(f"agent '{current.name}' did not answer before shutdown")
+                        continue
+                    if kind == 'output':
+                        f.write(value)
+                    elif kind == 'lost':
+                        raise AgentLost(value)
+                    else:
+                        break
+
+                remote_usage = value.get('usage') or {}
+                if usage is not None:
+                    usage.update(remote_usage)
+                return_code = value.get('exit_code')
+                footer = "\n" + "-" * 40 + "\n"
+                footer += f"End: {datetime.now()}\n"
+                footer += f"Exit Code: {return_code}\n"
+                if remote_usage.get('timeout'):
+                    footer += f"Killed: {remote_usage['timeout']}\n"
+                f.write(footer.encode())
+                return return_code
+        finally:
+            if pool is not None:
+                pool.unregister(remote)
+            current = remote.link
+            with self._lock:
+                if current.running.pop(run_id, None) is not None:
+                    current.busy = max(0, current.busy - 1)
+            current.gpu_pool.release(lease)
+            self._changed()
@@ -0,0 +1,481 @@
+"""
+xschr.bench
+
+scheduler overhead benchmarks: what xschr itself costs on top of the runs it executes.
+
+    python -m xschr.bench                        # run everything, compare with the saved baseline
+    python -m xschr.bench --save-baseline        # record this machine's numbers as the baseline
+    python -m xschr.bench --only dispatch,config --json results.json
+    python -m xschr.bench --only warm --warm-modules numpy,torch
+
+Suites:
+    dispatch    thousands of no-op runs through run_sequence, minus the cost of spawning them bare
+    output      MB/s of child stdout through _execute_subprocess (direct, pumped, echoed, gzip)
+    config      load_and_validate on a generated YAML file with tens of thousands of runs
+    startup     `python -m xschr --version`, minus a bare interpreter start
+    warm        time to a run's first output line, cold (fresh interpreter) vs warm (forked
+                from a template that preloaded the run's imports); skipped where unsupported
+
+Every metric is the median of --repeat samples. A metric more than --tolerance worse than
+the baseline is reported as a regression and the exit status is 1. Baselines are per
+host (under ~/.cache/xschr by default) since the numbers only compare on one machine.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SUITES = ("dispatch", "output", "config", "startup", "warm")
+
+# Imported by the warm suite's child and preloaded by its template
+WARM_MODULES = ["json", "decimal", "asyncio", "email.mime.text", "http.client"]
+
+NOOP_SCRIPT = ""
+
+OUTPUT_SCRIPT = """
+import sys
+line = b"x" * 79 + b"\\n"
+block = line * ((1 << 20) // len(line))
+out = sys.stdout.buffer
+for _ in range(int(sys.argv[1])):
+    out.write(block)
+out.flush()
+"""
+
+IMPORT_SCRIPT = """
+import sys
+for name in sys.argv[1].split(","):
+    __import__(name)
+print("up", flush=True)
+"""
+
+
+def default_baseline_path():
+    from .config import user_cache_dir
+
+    # Keyed by host, like the hardware cache: numbers from another machine say nothing
+    host = (
+        os.uname().nodename
+        if hasattr(os, "uname")
+        else os.environ.get("COMPUTERNAME", "local")
+    )
+    return user_cache_dir(f"bench-baseline-{host}.json")
+
+
+def _metric(value, unit, better="lower", compare=True):
+    return {
+        "value": round(value, 4),
+        "unit": unit,
+        "better": better,
+        "compare": compare,
+    }
+
+
+def _median(fn, repeat):
+    return statistics.median(fn() for _ in range(repeat))
+
+
+def _quiet(fn):
+    """Run fn with the console (and the engine's ENTER prompt) redirected."""
+    import contextlib
+    import io
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stdin, sys.stdin = sys.stdin, io.StringIO("\n")
+        try:
+            return fn()
+        finally:
+            sys.stdin = stdin
+
+
+# --- Suites ---
+
+
+def bench_dispatch(tmp, runs, jobs, repeat):
+    """Per-run scheduling overhead of run_sequence over spawning the same children directly."""
+    from .engine import OutputSettings, SessionSettings, run_sequence
+
+    script = os.path.join(tmp, "noop.py")
+    with open(script, "w") as f:
+        f.write(NOOP_SCRIPT)
+    experiments = [
+        {"name": "noop", "script": "noop.py", "runs": [[] for _ in range(runs)]}
+    ]
+
+    def bare():
+        started = time.perf_counter()
+        for _ in range(runs):
+            subprocess.run([sys.executable, script], stdout=subprocess.DEVNULL)
+        return time.perf_counter() - started
+
+    def scheduled(n_jobs):
+        def once():
+            started = time.perf_counter()
+            settings = SessionSettings(
+                jobs=n_jobs,
+                cpu_affinity=False,
+                order="file",
+                output=OutputSettings(echo=False),
+            )
+            _quiet(
+                lambda: run_sequence(
+                    experiments,
+                    os.path.join(tmp, "bench.yaml"),
+                    sys.executable,
+                    os.path.join(tmp, "logs"),
+                    settings,
+                )
+            )
+            return time.perf_counter() - started
+
+        return once
+
+    bare_s = _median(bare, repeat)
+    serial_s = _median(scheduled(1), repeat)
+    parallel_s = _median(scheduled(jobs), repeat)
+    return {
+        "dispatch.bare_spawn_ms": _metric(
+            bare_s / runs * 1000, "ms/run", compare=False
+        ),
+        "dispatch.overhead_ms": _metric(
+            max(0.0, serial_s - bare_s) / runs * 1000, "ms/run"
+        ),
+        "dispatch.serial_runs_per_s": _metric(
+            runs / serial_s, "runs/s", better="higher"
+        ),
+        "dispatch.parallel_runs_per_s": _metric(
+            runs / parallel_s, "runs/s", better="higher"
+        ),
+    }
+
+
+def bench_output(tmp, megabytes, repeat):
+    """Child stdout throughput into the run log, for each output path of _execute_subprocess."""
+    from .engine import OutputSettings, _execute_subprocess
+
+    script = os.path.join(tmp, "output.py")
+    with open(script, "w") as f:
+        f.write(OUTPUT_SCRIPT)
+    cmd = [sys.executable, script, str(megabytes)]
+    log_path = os.path.join(tmp, "output.log")
+
+    def measure(**kwargs):
+        def once():
+            started = time.perf_counter()
+            _quiet(
+                lambda: _execute_subprocess(
+                    cmd, log_path, output=OutputSettings(flush_interval=1.0, **kwargs)
+                )
+            )
+            return time.perf_counter() - started
+
+        return megabytes / _median(once, repeat)
+
+    return {
+        "output.direct_mb_per_s": _metric(measure(echo=False), "MB/s", better="higher"),
+        "output.pumped_mb_per_s": _metric(
+            measure(echo=False, max_log_bytes=1 << 40), "MB/s", better="higher"
+        ),
+        "output.echo_mb_per_s": _metric(measure(echo=True), "MB/s", better="higher"),
+        "output.gzip_mb_per_s": _metric(
+            measure(echo=False, log_codec="gzip", max_log_bytes=None),
+            "MB/s",
+            better="higher",
+        ),
+    }
+
+
+def bench_config(tmp, experiments, runs, repeat):
+    """load_and_validate on a large generated config, parsed from scratch and served from its cache."""
+    from .config import load_and_validate
+
+    path = os.path.join(tmp, "huge.yaml")
+    with open(path, "w") as f:
+        f.write("config:\n  max_parallel: 4\nexperiments:\n")
+        for e in range(experiments):
+            f.write(f"  - name: exp_{e}\n    script: train.py\n    runs:\n")
+            for r in range(runs):
+                f.write(
+                    f'      - "--lr {0.001 * (r + 1):.3f} --seed {r} --tag e{e}r{r}"\n'
+                )
+        f.write(
+            "  - name: swept\n    script: train.py\n    sweep:\n      params:\n"
+            "        lr: [0.1, 0.01, 0.001, 0.0001]\n        bs: [16, 32, 64, 128, 256]\n"
+        )
+
+    def parse():
+        started = time.perf_counter()
+        load_and_validate(path, use_cache=False)
+        return time.perf_counter() - started
+
+    def cached():
+        started = time.perf_counter()
+        load_and_validate(path)
+        return time.perf_counter() - started
+
+    load_and_validate(path)  # fill the cache
+    size_mb = os.path.getsize(path) / (1 << 20)
+    return {
+        "config.parse_ms": _metric(_median(parse, repeat) * 1000, "ms"),
+        "config.cached_ms": _metric(_median(cached, repeat) * 1000, "ms"),
+        "config.size_mb": _metric(size_mb, "MB", compare=False),
+    }
+
+
+def bench_startup(repeat):
+    """Time to a finished `python -m xschr --version`, and what a bare interpreter costs."""
+
+    def timed(cmd):
+        def once():
+            started = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return time.perf_counter() - started
+
+        return once
+
+    bare_s = _median(timed([sys.executable, "-c", "pass"]), repeat)
+    xschr_s = _median(timed([sys.executable, "-m", "xschr", "--version"]), repeat)
+    return {
+        "startup.interpreter_ms": _metric(bare_s * 1000, "ms", compare=False),
+        "startup.xschr_ms": _metric(xschr_s * 1000, "ms"),
+        "startup.overhead_ms": _metric(max(0.0, xschr_s - bare_s) * 1000, "ms"),
+    }
+
+
+def bench_warm(tmp, modules, runs, repeat):
+    """Latency from launching a run to its first line of output, cold vs warm start."""
+    from .engine import _popen
+    from .warm import WarmTemplate, is_supported
+
+    if not is_supported():
+        return {}
+    script = os.path.join(tmp, "imports.py")
+    with open(script, "w") as f:
+        f.write(IMPORT_SCRIPT)
+    cmd = [sys.executable, script, ",".join(modules)]
+    env = dict(os.environ)
+
+    def first_line(spawn):
+        def once():
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                p = spawn(cmd, env=env, stdout=subprocess.PIPE)
+                p.stdout.readline()
+                samples.append(time.perf_counter() - started)
+                p.stdout.close()
+                p.wait()
+            return statistics.mean(samples)
+
+        return once
+
+    cold_s = _median(first_line(_popen), repeat)
+    template = WarmTemplate(sys.executable, modules)
+    try:
+        warm_s = _median(first_line(template.spawn), repeat)
+    finally:
+        template.close()
+    return {
+        "warm.cold_ms": _metric(cold_s * 1000, "ms", compare=False),
+        "warm.warm_ms": _metric(warm_s * 1000, "ms"),
+        "warm.speedup": _metric(
+            cold_s / warm_s if warm_s else 0.0, "x", better="higher"
+        ),
+    }
+
+
+def run_suites(suites, quick=False, repeat=3, warm_modules=None):
+    """Run the named suites in a scratch directory. Returns {metric name: metric}."""
+    scale = 0.1 if quick else 1.0
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="xschr-bench-") as tmp:
+        # Keep the config cache and history of the benchmark out of the user's
+        env_cache = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = os.path.join(tmp, "cache")
+        try:
+            if "dispatch" in suites:
+                results.update(
+                    bench_dispatch(
+                        tmp,
+                        max(20, int(1000 * scale)),
+                        max(2, os.cpu_count() or 1),
+                        repeat,
+                    )
+                )
+            if "output" in suites:
+                results.update(bench_output(tmp, max(8, int(256 * scale)), repeat))
+            if "config" in suites:
+                results.update(
+                    bench_config(tmp, max(20, int(2000 * scale)), 10, repeat)
+                )
+            if "warm" in suites:
+                results.update(
+                    bench_warm(
+                        tmp,
+                        warm_modules or WARM_MODULES,
+                        max(2, int(20 * scale)),
+                        repeat,
+                    )
+                )
+        finally:
+            if env_cache is None:
+                os.environ.pop("XDG_CACHE_HOME", None)
+            else:
+                os.environ["XDG_CACHE_HOME"] = env_cache
+        if "startup" in suites:
+            results.update(bench_startup(max(5, int(20 * scale))))
+    return results
+
+
+# --- Baseline ---
+
+
+def compare(results, baseline, tolerance):
+    """[(name, current, baseline value, change, regressed)] for metrics present in both."""
+    rows = []
+    for name, metric in results.items():
+        base = baseline.get(name)
+        if base is None or not metric["compare"] or not base["value"]:
+            rows.append((name, metric, None, None, False))
+            continue
+        change = metric["value"] / base["value"] - 1
+        worse = -change if metric["better"] == "higher" else change
+        rows.append((name, metric, base["value"], change, worse > tolerance))
+    return rows
+
+
+def print_report(rows):
+    print(f"\n[Benchmarks]")
+    print(f"  {'Metric':<34} {'Value':>12}  {'Unit':<8} {'Baseline':>10} {'Change':>8}")
+    for name, metric, base, change, regressed in rows:
+        base_text = f"{base:10.2f}" if base is not None else f"{'-':>10}"
+        change_text = f"{change * 100:+7.1f}%" if change is not None else f"{'':>8}"
+        flag = "  \033[91m✗ regression\033[0m" if regressed else ""
+        print(
+            f"  {name:<34} {metric['value']:12.2f}  {metric['unit']:<8} {base_text} {change_text}{flag}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m xschr.bench",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--only",
+        default=None,
+        help=f"Comma-separated suites to run ({', '.join(SUITES)}).",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="A tenth of the default sizes (smoke test).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Samples per metric; the median is kept (default: 3).",
+    )
+    parser.add_argument(
+        "--json",
+        metavar="PATH",
+        default=None,
+        help="Write the results as JSON ('-' for stdout).",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        default=None,
+        help="Baseline file (default: per host in ~/.cache/xschr).",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store these results as the new baseline.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fraction a metric may be worse than the baseline before it counts as a regression (default: 0.2).",
+    )
+    parser.add_argument(
+        "--warm-modules",
+        metavar="MODULES",
+        default=None,
+        help=f"Comma-separated modules the warm suite imports and preloads (default: {','.join(WARM_MODULES)}).",
+    )
+    args = parser.parse_args(argv)
+
+    suites = args.only.split(",") if args.only else list(SUITES)
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    from .__version__ import __version__
+
+    results = run_suites(
+        suites,
+        quick=args.quick,
+        repeat=max(1, args.repeat),
+        warm_modules=args.warm_modules.split(",") if args.warm_modules else None,
+    )
+    document = {
+        "version": __version__,
+        "python": sys.version.split()[0],
+        "quick": args.quick,
+        "created": time.time(),
+        "metrics": results,
+    }
+
+    baseline_path = args.baseline or default_baseline_path()
+    baseline = {}
+    try:
+        with open(baseline_path) as f:
+            saved = json.load(f)
+        # Quick and full runs use different sizes and don't compare
+        if saved.get("quick") == args.quick:
+            baseline = saved.get("metrics", {})
+    except (OSError, ValueError):
+        pass
+
+    rows = compare(results, baseline, args.tolerance)
+    if args.json == "-":
+        print(json.dumps(document, indent=2))
+    else:
+        print_report(rows)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(document, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nBaseline saved to {baseline_path}", file=sys.stderr)
+    elif not baseline:
+        print(
+            f"\nNo baseline at {baseline_path} yet (record one with --save-baseline).",
+            file=sys.stderr,
+        )
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(
+            f"\n\033[91m✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}: "
+            f"{', '.join(regressions)}\033[0m",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+xschr.cache
+
+content-addressed cache of successful runs, stored under <log_dir>/.cache.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+from .logstore import SUFFIXES, INDEX_SUFFIX, codec_for
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def fingerprint(script_hash, arg_list, python_cmd, env_keys=(), environ=None):
+    """
+    Identity of a run: script contents, argument list, interpreter and selected env vars.
+    Two runs with the same fingerprint are expected to produce the same result.
+    """
+    environ = os.environ if environ is None else environ
+    payload = {
+        'script': script_hash,
+        'args': [str(a) for a in arg_list],
+        'python': python_cmd,
+        'env': {k: environ.get(k) for k in sorted(env_keys)},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def _log_suffix(log_path):
+    """'.log', '.log.gz' or '.log.zst': a cached log keeps its codec's suffix."""
+    return ".log" + SUFFIXES[codec_for(log_path)]
+
+def _link_or_copy(src, dst):
+    """Hardlink when possible (same filesystem), otherwise copy."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+class RunCache:
+    """
+    One `<key>.json` record plus a copy of the run's log per successful run: `<key>.log`,
+    or `<key>.log.gz` / `<key>.log.zst` (with its frame index) for compressed logs.
+    Writes go through a temp file + rename so concurrent workers never see partial entries.
+    """
+    def __init__(self, root, env_keys=()):
+        self.root = root
+        self.env_keys = tuple(env_keys)
+        self._script_hashes = {}
+
+    def key_for(self, script_path, arg_list, python_cmd):
+        """Fingerprint a run, hashing each script only once per session."""
+        if script_path not in self._script_hashes:
+            self._script_hashes[script_path] = hash_file(script_path)
+        return fingerprint(self._script_hashes[script_path], arg_list, python_cmd, self.env_keys)
+
+    def lookup(self, key, touch=True):
+        """Return the cached record for `key`, or None. `touch` marks the entry as used (see evict)."""
+        meta_path = os.path.join(self.root, f"{key}.json")
+        try:
+            with open(meta_path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(os.path.join(self.root, key + record.get('suffix', ".log"))):
+            return None
+
+        # Touch on hit so size-based eviction drops the least recently used entries
+        if touch:
+            try:
+                os.utime(meta_path)
+            except OSError:
+                pass
+        return record
+
+    def record(self, key, cmd, log_path, duration):
+        """Store a successful run."""
+        os.makedirs(self.root, exist_ok=True)
+        suffix = _log_suffix(log_path)
+        cached_log = os.path.join(self.root, key + suffix)
+        # An earlier entry for this run may have been logged with another codec
+        for path in self._files(key):
+            if not path.endswith(".json") and not path.startswith(cached_log):
+                os.remove(path)
+        for src, dst in ((log_path + INDEX_SUFFIX, cached_log + INDEX_SUFFIX), (log_path, cached_log)):
+            if src != log_path and not os.path.exists(src):
+                continue
+            tmp = f"{dst}.{os.getpid()}.tmp"
+            _link_or_copy(src, tmp)
+            os.replace(tmp, dst)
+
+        record = {
+            'key': key,
+            'cmd': cmd,
+            'log': os.path.abspath(log_path),
+            'suffix': suffix,
+            'finished': time.time(),
+            'duration': round(duration, 3),
+        }
+        meta_path = os.path.join(self.root, f"{key}.json")
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_meta, meta_path)
+
+    def restore_log(self, key, log_path, suffix=".log"):
+        """
+        Place the cached log at `log_path` in the current run directory, with the suffix
+        it was cached with (from its record) in place of `log_path`'s. Returns the path.
+        """
+        stem = log_path[:-len(_log_suffix(log_path))]
+        cached_log = os.path.join(self.root, key + suffix)
+        target = stem + suffix
+        _link_or_copy(cached_log, target)
+        if os.path.exists(cached_log + INDEX_SUFFIX):
+            _link_or_copy(cached_log + INDEX_SUFFIX, target + INDEX_SUFFIX)
+        return target
+
+    def _files(self, key):
+        """Every file of the entry `key` that exists."""
+        names = [f"{key}.json"] + [f"{key}.log{s}{i}" for s in SUFFIXES.values() for i in ("", INDEX_SUFFIX)]
+        return [p for p in (os.path.join(self.root, n) for n in names) if os.path.exists(p)]
+
+    def evict(self, max_age_days=None, max_size_mb=None):
+        """
+        Drop entries older than `max_age_days`, then the least recently used ones
+        until the cache fits in `max_size_mb`. Returns the number of entries removed.
+        """
+        if not os.path.isdir(self.root):
+            return 0
+
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-5]
+            meta_path = os.path.join(self.root, name)
+            try:
+                used = os.path.getmtime(meta_path)
+                size = sum(os.path.getsize(path) for path in self._files(key))
+            except OSError:
+                continue
+            entries.append((used, size, key))
+
+        entries.sort()  # Oldest first
+        doomed = set()
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            doomed.update(key for used, _, key in entries if used < cutoff)
+        if max_size_mb is not None:
+            budget = max_size_mb * 1024 * 1024
+            total = sum(size for _, size, key in entries if key not in doomed)
+            for _, size, key in entries:
+                if total <= budget:
+                    break
+                if key not in doomed:
+                    doomed.add(key)
+                    total -= size
+
+        for key in doomed:
+            for path in self._files(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(doomed)
@@ -45,16 +45,34 @@ class XSchrArgumentParser(argparse.ArgumentParser):
         
         # 2. Post-processing logic
         self._validate_path(parsed_args)
+        self._validate_jobs(parsed_args)
         self._process_verbosity(parsed_args)
         
         return parsed_args
 
     def _validate_path(self, args):
-        """Ensure the config file actually exists before proceeding."""
-        
+        """Ensure the config file (or the run directory to resume) actually exists before proceeding."""
+
+        if args.resume is not None:
+            if not os.path.isdir(args.resume):
+                self.error(f"Run directory not found: '{args.resume}'")
+            return
+
+        if args.retry_failed:
+            self.error("--retry-failed only applies with --resume")
+
+        if args.path is None:
+            self.error("one of the arguments -p/--path or --resume is required")
+
         if not os.path.exists(args.path):
             self.error(f"Configuration file not found: '{args.path}'")
 
+    def _validate_jobs(self, args):
+        """Reject non-positive worker counts."""
+
+        if args.jobs is not None and args.jobs < 1:
+            self.error(f"--jobs must be at least 1 (got {args.jobs})")
+
     def _process_verbosity(self, args):
         """Map generic flags to specific internal logic settings."""
  
@@ -67,6 +85,16 @@ class XSchrArgumentParser(argparse.ArgumentParser):
         self.env.log_error(message)
         sys.exit(2)
 
+class XSchrCommandParser(XSchrArgumentParser):
+    """
+    Parser for subcommands (`xschr logs ...`): same error reporting, none of the run checks.
+    """
+    def parse_args(self, args=None, namespace=None):
+        return argparse.ArgumentParser.parse_args(self, args, namespace)
+
+# Subcommands dispatched before the main parser, e.g. `xschr logs tail ...`
+COMMANDS = ('logs', 'results', 'daemon', 'submit', 'status', 'cancel', 'agent')
+
 # --- 3. The Definition (Groups & formatting) ---
 def get_parser(env: Environment = None) -> XSchrArgumentParser:
     """Create and return the standard XSchr argument parser."""
@@ -88,8 +116,19 @@ def get_parser(env: Environment = None) -> XSchrArgumentParser:
     source_group.add_argument(
         "-p", "--path",
         metavar="FILE",
-        required=True,
-        help="Path to the experiment configuration file (.json)"
+        help="Path to the experiment configuration file (.yaml)"
+    )
+    source_group.add_argument(
+        "--resume",
+        metavar="RUN_DIR",
+        default=None,
+        help="Resume an interrupted run_<timestamp> directory, executing only unfinished runs."
+    )
+    source_group.add_argument(
+        "--retry-failed",
+        action="store_true",
+        default=False,
+        help="With --resume, also run again the runs that failed or timed out (by default they count as done)."
     )
 
     # -- Group: Execution Control --
@@ -106,6 +145,61 @@ def get_parser(env: Environment = None) -> XSchrArgumentParser:
         default=False,
         help="Simulate the execution plan without running any scripts."
     )
+    exec_group.add_argument(
+        "--plan-limit",
+        metavar="N",
+        type=int,
+        default=50,
+        help="With --dry-run, list at most N runs per experiment (0 = all). Default: 50."
+    )
+    exec_group.add_argument(
+        "-j", "--jobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Number of runs to execute in parallel (overrides config 'max_parallel')."
+    )
+    exec_group.add_argument(
+        "--order",
+        choices=["auto", "file", "lpt"],
+        default=None,
+        help="Dispatch order: file order, or longest estimated run first (lpt). "
+             "Default: config 'order', else lpt when running in parallel."
+    )
+    exec_group.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        default=False,
+        help="Don't echo run output to the console; logs are written directly by the runs."
+    )
+    exec_group.add_argument(
+        "--console",
+        choices=["auto", "dashboard", "lines"],
+        default=None,
+        help="Show run output as a live dashboard redrawn 10x per second, or echo every line. "
+             "Default: config 'console', else dashboard when running in parallel."
+    )
+    exec_group.add_argument(
+        "--sort-by",
+        choices=["wall", "cpu", "rss", "io"],
+        default="wall",
+        help="Column to sort the final resource table by (heaviest first). Default: wall."
+    )
+
+    # -- Group: Result Cache --
+    cache_group = parser.add_argument_group(title="Result Cache")
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Re-run everything, ignoring cached results (fresh results are still recorded)."
+    )
+    cache_group.add_argument(
+        "--cache-only-check",
+        action="store_true",
+        default=False,
+        help="Report which runs are cached and which would execute, then exit."
+    )
 
     # -- Group: Troubleshooting & Info --
     debug_group = parser.add_argument_group(title="Troubleshooting")
@@ -114,6 +208,24 @@ def get_parser(env: Environment = None) -> XSchrArgumentParser:
         action="store_true",
         help="Print detailed diagnostic information for bug reports."
     )
+    debug_group.add_argument(
+        "--refresh-hw",
+        action="store_true",
+        default=False,
+        help="Re-probe GPUs instead of using the cached hardware inventory."
+    )
+    debug_group.add_argument(
+        "--trace",
+        action="store_true",
+        default=False,
+        help="Write a Chrome/Perfetto timeline of scheduler events to trace.json in the run directory."
+    )
+    debug_group.add_argument(
+        "--profile-startup",
+        action="store_true",
+        default=False,
+        help="Print a timing breakdown of startup phases before running."
+    )
     debug_group.add_argument(
         "-v", "--version",
         action="version",
@@ -122,3 +234,282 @@ def get_parser(env: Environment = None) -> XSchrArgumentParser:
     )
 
     return parser
+
+def _line_range(value):
+    """Parse START:END (1-based, inclusive, either side optional) into (start, end) or raise."""
+    start, sep, end = value.partition(":")
+    try:
+        start = int(start) if start else 1
+        end = int(end) if end else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:END line numbers, got '{value}'")
+    if not sep:
+        end = start
+    if start < 1 or (end is not None and end < start):
+        raise argparse.ArgumentTypeError(f"invalid line range '{value}'")
+    return start, end
+
+def get_logs_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr logs`: reading plain or compressed run logs."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr logs",
+        description="Read and search run logs (plain, .gz or .zst) without decompressing them in full."
+    )
+    commands = parser.add_subparsers(dest="action", metavar="ACTION", required=True)
+
+    tail = commands.add_parser("tail", help="Print the last lines of a log.")
+    tail.add_argument("log", metavar="LOG", help="Path to a run log (the .log/.gz/.zst suffixes may be omitted).")
+    tail.add_argument(
+        "-n", "--lines",
+        metavar="N",
+        type=int,
+        default=20,
+        help="Number of lines to print. Default: 20."
+    )
+
+    show = commands.add_parser("show", help="Print a log, or a range of its lines.")
+    show.add_argument("log", metavar="LOG", help="Path to a run log (the .log/.gz/.zst suffixes may be omitted).")
+    show.add_argument(
+        "--range",
+        metavar="START:END",
+        type=_line_range,
+        default=None,
+        help="1-based inclusive line range, e.g. 100:200, 5000: or :50."
+    )
+
+    grep = commands.add_parser("grep", help="Search the logs of every run for a pattern.")
+    grep.add_argument("pattern", metavar="PATTERN", help="Regular expression (Python syntax) to search for.")
+    grep.add_argument(
+        "-d", "--dir",
+        dest="paths",
+        metavar="DIR",
+        action="append",
+        default=None,
+        help="Log root or run_<timestamp> directory to search (repeatable). Default: ./logs."
+    )
+    grep.add_argument("-i", "--ignore-case", action="store_true", default=False, help="Case-insensitive match.")
+    grep.add_argument(
+        "-F", "--fixed-strings",
+        action="store_true",
+        default=False,
+        help="Treat PATTERN as a literal string, not a regex."
+    )
+    grep.add_argument(
+        "--since",
+        metavar="WHEN",
+        default=None,
+        help="Only logs written since an age (30m, 12h, 2d) or a date (2026-01-31[ 14:00])."
+    )
+    grep.add_argument("--exp", metavar="NAME", default=None, help="Only runs of experiments matching this glob.")
+    grep.add_argument(
+        "--status",
+        choices=["success", "failed", "timeout", "stopped", "cancelled", "retried", "cached"],
+        default=None,
+        help="Only runs that ended with this status (from runs.jsonl)."
+    )
+    grep.add_argument(
+        "-m", "--max-count",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Stop after N matching lines per log."
+    )
+    grep.add_argument(
+        "-l", "--files-with-matches",
+        action="store_true",
+        default=False,
+        help="Only list the matching runs, not their lines."
+    )
+    grep.add_argument(
+        "-j", "--jobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Processes to search with. Default: one per core."
+    )
+    grep.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="Print one JSON object per matching log instead of text."
+    )
+
+    return parser
+
+def get_results_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr results`: ranking runs by the metrics they reported."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr results",
+        description="Aggregate and rank runs by extracted metrics (from runs.jsonl, logs are not re-read)."
+    )
+    parser.add_argument("run_dirs", metavar="RUN_DIR", nargs="+", help="One or more run_<timestamp> directories.")
+    parser.add_argument(
+        "-m", "--metric",
+        metavar="NAME",
+        action="append",
+        default=None,
+        help="Metric column to show (repeatable). Default: every metric found."
+    )
+    parser.add_argument(
+        "--rank",
+        metavar="NAME",
+        default=None,
+        help="Metric to rank runs by, best first. Default: keep run order."
+    )
+    parser.add_argument(
+        "--stat",
+        choices=["final", "best", "mean"],
+        default="final",
+        help="Per-run statistic shown and ranked on. Default: final."
+    )
+    parser.add_argument(
+        "--maximize",
+        action="store_true",
+        default=False,
+        help="Higher is better for --rank and 'best' (e.g. accuracy). Default: lower is better."
+    )
+    parser.add_argument(
+        "--top",
+        metavar="N",
+        type=int,
+        default=20,
+        help="Show at most N runs (0 = all). Default: 20."
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="Print the ranked records as JSON lines instead of a table."
+    )
+
+    return parser
+
+def _add_socket_argument(parser):
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=None,
+        help="Daemon socket. Default: $XSCHR_SOCKET, else /tmp/xschr-daemon.sock."
+    )
+
+def get_daemon_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr daemon`: the shared, persistent scheduler."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr daemon",
+        description="Run a persistent scheduler that owns this machine's run and GPU slots."
+    )
+    _add_socket_argument(parser)
+    parser.add_argument(
+        "--db",
+        metavar="FILE",
+        default=None,
+        help="SQLite queue database. Default: ~/.cache/xschr/daemon.sqlite."
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Number of runs to execute in parallel on this host (0: only on agents). Default: one per CPU core."
+    )
+    parser.add_argument(
+        "--listen",
+        metavar="HOST:PORT",
+        default=None,
+        help="Accept `xschr agent` workers on this TCP address (e.g. 0.0.0.0:7621). "
+             "Addresses other than loopback require --token."
+    )
+    _add_token_argument(parser)
+    return parser
+
+def _add_token_argument(parser):
+    parser.add_argument(
+        "--token",
+        metavar="SECRET",
+        default=None,
+        help="Shared secret between the daemon and its agents. Default: $XSCHR_TOKEN. "
+             "The link is not encrypted: the token and run output cross the network in plain text."
+    )
+
+def get_agent_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr agent`: a worker host for a daemon started with --listen."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr agent",
+        description="Execute runs for a coordinating xschr daemon; reconnects whenever the connection drops."
+    )
+    parser.add_argument(
+        "--coordinator",
+        metavar="HOST:PORT",
+        required=True,
+        help="Address the daemon listens on for agents (its --listen)."
+    )
+    parser.add_argument(
+        "--slots",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Number of runs to execute in parallel. Default: one per CPU core."
+    )
+    parser.add_argument(
+        "--name",
+        metavar="NAME",
+        default=None,
+        help="Name of this agent, unique per coordinator. Default: the hostname."
+    )
+    _add_token_argument(parser)
+    return parser
+
+def get_submit_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr submit`: queue a config on the daemon."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr submit",
+        description="Queue every run of a config on the xschr daemon and return immediately."
+    )
+    parser.add_argument(
+        "-p", "--path",
+        metavar="FILE",
+        required=True,
+        help="Path to the experiment configuration file (.yaml)"
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        default=False,
+        help="Cancel the rest of this job as soon as one of its runs fails."
+    )
+    _add_socket_argument(parser)
+    return parser
+
+def get_status_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr status`: the daemon's jobs."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr status",
+        description="Show the jobs known to the xschr daemon."
+    )
+    parser.add_argument("job", metavar="JOB", type=int, nargs="?", default=None, help="Show only this job.")
+    _add_socket_argument(parser)
+    return parser
+
+def get_cancel_parser(env: Environment = None) -> XSchrCommandParser:
+    """Parser for `xschr cancel`: stop a daemon job."""
+
+    parser = XSchrCommandParser(
+        env=env,
+        prog="xschr cancel",
+        description="Cancel a job: drop its queued runs and terminate the running ones."
+    )
+    parser.add_argument("job", metavar="JOB", type=int, help="Job id (see `xschr status`).")
+    _add_socket_argument(parser)
+    return parser
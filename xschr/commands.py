@@ -0,0 +1,245 @@
+"""
+xschr.commands
+
+subcommands other than running a config directly: inspecting finished work (`xschr logs`,
+`xschr results`), the shared daemon (`xschr daemon`, `submit`, `status`, `cancel`) and its
+remote workers (`xschr agent`).
+"""
+
+import os
+import sys
+
+def _write_lines(lines):
+    """Copy log lines (bytes) to stdout untouched; stop quietly if the reader goes away."""
+    out = sys.stdout.buffer
+    try:
+        for line in lines:
+            out.write(line)
+        out.flush()
+    except BrokenPipeError:
+        # e.g. `xschr logs show ... | head`: silence the flush at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+def logs(args, env):
+    """`xschr logs tail|show|grep`."""
+    from .logstore import find_log, tail_lines, iter_lines
+
+    if args.action == 'grep':
+        return _grep_logs(args, env)
+    try:
+        path = find_log(args.log)
+        if args.action == 'tail':
+            return _write_lines(tail_lines(path, max(0, args.lines)))
+
+        start, end = args.range or (1, None)
+        return _write_lines(iter_lines(path, start - 1, end))
+    except (OSError, RuntimeError, EOFError) as e:
+        env.log_error(str(e))
+        return 1
+
+def _grep_logs(args, env):
+    """`xschr logs grep`: matching lines of every run log, grouped by run."""
+    import re
+    import json
+    from .logsearch import parse_since, find_logs, search, run_args
+
+    pattern = re.escape(args.pattern) if args.fixed_strings else args.pattern
+    flags = re.MULTILINE | (re.IGNORECASE if args.ignore_case else 0)
+    try:
+        re.compile(pattern.encode(), flags)
+        since = parse_since(args.since) if args.since else None
+        logs = find_logs(args.paths or ['logs'], since=since, exp=args.exp, status=args.status)
+    except (re.error, ValueError, OSError) as e:
+        env.log_error(str(e))
+        return 1
+
+    found = 0
+    out = sys.stdout.buffer
+    try:
+        for log, cmd, matches in search(logs, pattern.encode(), flags, limit=args.max_count, jobs=args.jobs):
+            found += 1
+            where = f"{os.path.basename(log['run_dir'])}/{log['run']}"
+            if args.json:
+                record = {'run_dir': log['run_dir'], 'run': log['run'], 'exp': log['exp'],
+                          'status': log['status'], 'log': log['path'], 'cmd': cmd,
+                          'matches': [{'line': n, 'text': text.decode(errors='replace')} for n, text in matches]}
+                out.write(json.dumps(record).encode() + b"\n")
+            elif args.files_with_matches:
+                out.write(f"{where}  {run_args(cmd)}\n".encode())
+            else:
+                title = f"\033[1m{where}\033[0m" if env.is_terminal else where
+                out.write(f"{title}  {run_args(cmd)}\n".encode())
+                for n, text in matches:
+                    out.write(f"  {n}: ".encode() + text + b"\n")
+        out.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    # grep's convention: 1 when nothing matched
+    return 0 if found else 1
+
+def results(args, env):
+    """`xschr results`: rank the runs of one or more run directories by their metrics."""
+    from .metrics import load_results, rank, print_results_table
+
+    try:
+        records = load_results(args.run_dirs)
+    except OSError as e:
+        env.log_error(f"Cannot read results: {e}")
+        return 1
+
+    names = args.metric or sorted({name for r in records for name in r['metrics']})
+    if args.rank:
+        if not any(args.rank in r['metrics'] for r in records):
+            env.log_error(f"No run reported metric '{args.rank}'.")
+            return 1
+        records = rank(records, args.rank, stat=args.stat, maximize=args.maximize)
+        if args.rank not in names:
+            names.insert(0, args.rank)
+
+    if args.json:
+        import json
+        shown = records[:args.top] if args.top else records
+        return _write_lines(json.dumps(r).encode() + b"\n" for r in shown)
+
+    print_results_table(records, names, stat=args.stat, maximize=args.maximize, limit=args.top)
+    return 0
+
+def daemon(args, env):
+    """`xschr daemon`: serve the durable queue until interrupted."""
+    from .daemon import Daemon, RunQueue, socket_path, default_db_path
+
+    if args.jobs is not None and args.jobs < (0 if args.listen else 1):
+        env.log_error(f"--jobs must be at least {0 if args.listen else 1} (got {args.jobs})")
+        return 2
+    hub = None
+    if args.listen:
+        from .agents import AgentHub, TOKEN_ENV, parse_address
+        try:
+            address = parse_address(args.listen)
+        except ValueError:
+            env.log_error(f"--listen must be HOST:PORT (got {args.listen!r})")
+            return 2
+        token = args.token or os.environ.get(TOKEN_ENV)
+        if not token and address[0] not in ('127.0.0.1', 'localhost', '::1'):
+            # Whoever reaches the port could otherwise pose as an agent, or have its own agent run commands
+            env.log_error(f"--listen on {address[0]} needs --token (or ${TOKEN_ENV}): "
+                          f"without one, anyone who can reach the port can connect.")
+            return 2
+        hub = AgentHub(address, token=token)
+    try:
+        queue = RunQueue(args.db or default_db_path())
+        jobs = args.jobs if args.jobs is not None else os.cpu_count() or 1
+        Daemon(queue, jobs, socket_path(args.socket), hub=hub).serve()
+    except (OSError, RuntimeError) as e:
+        env.log_error(f"Daemon Failed: {e}")
+        return 1
+    return 0
+
+def agent(args, env):
+    """`xschr agent`: execute runs for a coordinating daemon until interrupted."""
+    import signal
+    from .agents import Agent, TOKEN_ENV, parse_address
+
+    if args.slots is not None and args.slots < 1:
+        env.log_error(f"--slots must be at least 1 (got {args.slots})")
+        return 2
+    try:
+        address = parse_address(args.coordinator)
+    except ValueError:
+        env.log_error(f"--coordinator must be HOST:PORT (got {args.coordinator!r})")
+        return 2
+
+    worker = Agent(address, name=args.name, slots=args.slots, token=args.token or os.environ.get(TOKEN_ENV))
+    def stop(signum, frame):
+        worker.stop()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    worker.serve()
+    return 0
+
+def _ask_daemon(args, env, payload):
+    """Send a request; returns the reply, or None after reporting the error."""
+    from .daemon import request, socket_path
+
+    try:
+        reply = request(socket_path(args.socket), payload)
+    except (ConnectionError, OSError) as e:
+        env.log_error(str(e))
+        return None
+    if not reply.get('ok'):
+        env.log_error(reply.get('error', 'request failed'))
+        return None
+    return reply
+
+def submit(args, env):
+    """`xschr submit`: hand a config (and this shell's environment) to the daemon."""
+    import getpass
+
+    reply = _ask_daemon(args, env, {
+        'op': 'submit',
+        'config': os.path.abspath(args.path),
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'python': sys.executable,
+        'user': getpass.getuser(),
+        'fail_fast': args.fail_fast,
+    })
+    if reply is None:
+        return 1
+    print(f"Submitted job {reply['job']}: {reply['runs']} run(s) -> {reply['run_dir']}")
+    return 0
+
+def status(args, env):
+    """`xschr status`: slot usage and per-job progress."""
+    reply = _ask_daemon(args, env, {'op': 'status', 'job': args.job})
+    if reply is None:
+        return 1
+
+    print(f"\n[Daemon]")
+    print(f"  • Slots:   {reply['busy']}/{reply['slots']} busy")
+    print(f"  • GPUs:    {reply['gpus']} device(s)")
+    if reply.get('agents') is not None:
+        print(f"\n[Agents]")
+        if not reply['agents']:
+            print("  None connected.")
+        for agent in reply['agents']:
+            state = f"{agent['busy']}/{agent['slots']} busy" if agent['connected'] else "disconnected"
+            print(f"  • {agent['name']}:  {state}, {agent['gpus']} GPU(s)")
+    print(f"\n[Jobs]")
+    if not reply['jobs']:
+        print("  No jobs.")
+        return 0
+    print(f"  {'ID':>4}  {'User':<10} {'Status':<10} {'Done':>11}  {'Running':>7}  {'Failed':>6}  Config")
+    for job in reply['jobs']:
+        runs = job['runs']
+        total = sum(runs.values())
+        done = sum(n for s, n in runs.items() if s not in ('pending', 'running'))
+        print(f"  {job['id']:>4}  {(job['user'] or '-'):<10} {job['status']:<10} {f'{done}/{total}':>11}  "
+              f"{runs.get('running', 0):>7}  {runs.get('failed', 0):>6}  {job['config']}")
+    return 0
+
+def cancel(args, env):
+    """`xschr cancel`: cancel a daemon job."""
+    if _ask_daemon(args, env, {'op': 'cancel', 'job': args.job}) is None:
+        return 1
+    print(f"Cancelled job {args.job}.")
+    return 0
+
+def run(name, argv, env):
+    """Parse `argv` for subcommand `name` and run it. Returns the exit status."""
+    from . import cli
+
+    parsers = {
+        'logs': (cli.get_logs_parser, logs),
+        'results': (cli.get_results_parser, results),
+        'daemon': (cli.get_daemon_parser, daemon),
+        'submit': (cli.get_submit_parser, submit),
+        'status': (cli.get_status_parser, status),
+        'cancel': (cli.get_cancel_parser, cancel),
+        'agent': (cli.get_agent_parser, agent),
+    }
+    get_parser, handler = parsers[name]
+    args = get_parser(env).parse_args(argv)
+    return handler(args, env)
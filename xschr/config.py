@@ -1,33 +1,143 @@
 import os
 import sys
 import json
-import yaml 
+import time
+import marshal
+import hashlib
+from . import sweep
+from .__version__ import __version__
 
-def load_and_validate(config_path):
+def _load_yaml(raw):
+    """Parse YAML with libyaml when available (an order of magnitude faster than pure Python)."""
+    # Imported here so cache hits never pay for importing yaml
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(raw, Loader=loader)
+
+# Bump when the normalized config layout changes so stale caches are ignored
+_CACHE_FORMAT = 2
+
+# Modules whose parsers decide what load_and_validate accepts and returns
+_VALIDATORS = ("config", "sweep", "metrics", "early_stop", "retry", "staging", "gpu_slots", "cpu_slots",
+               "watchdog")
+_validator_hash = None
+
+def _cache_format():
+    """
+    Tag of cached configs: the layout version plus a hash of the validators' source, so
+    changed validation (even without a release) never serves data it would now reject.
+    Read from disk without importing them, which cache hits must not pay for.
+    """
+    global _validator_hash
+    if _validator_hash is None:
+        h = hashlib.sha1()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in _VALIDATORS:
+            try:
+                with open(os.path.join(here, f"{name}.py"), 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(name.encode())
+        _validator_hash = h.hexdigest()[:16]
+    return (_CACHE_FORMAT, __version__, _validator_hash)
+
+def user_cache_dir(*parts):
+    """Per-user cache directory for xschr ($XDG_CACHE_HOME/xschr, default ~/.cache/xschr)."""
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'xschr', *parts)
+
+def _config_cache_path(abs_path):
+    name = hashlib.sha1(abs_path.encode()).hexdigest()
+    return user_cache_dir('configs', f"{name}.bin")
+
+def _read_config_cache(abs_path, st, content_hash=None):
+    """Return cached normalized data if it matches the file's mtime/size (or content hash)."""
+    try:
+        with open(_config_cache_path(abs_path), 'rb') as f:
+            record = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(record, dict) or record.get('format') != _cache_format():
+        return None
+    if content_hash is None:
+        if record.get('mtime_ns') == st.st_mtime_ns and record.get('size') == st.st_size:
+            return record.get('data')
+        return None
+    if record.get('hash') == content_hash:
+        return record.get('data')
+    return None
+
+def _write_config_cache(abs_path, st, content_hash, data):
+    """Persist normalized data; silently skipped if it isn't marshal-able or the dir is read-only."""
+    record = {
+        'format': _cache_format(),
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'hash': content_hash,
+        'data': data,
+    }
+    path = _config_cache_path(abs_path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            marshal.dump(record, f)
+        os.replace(tmp, path)
+    except (OSError, ValueError):
+        pass
+
+def load_and_validate(config_path, use_cache=True, timings=None):
     """
     Loads a YAML configuration file and validates the schema.
+    The validated, normalized result is cached (keyed by path, mtime and content hash),
+    so repeat loads of an unchanged file skip parsing entirely; what depends on this
+    machine rather than the file (see _check_environment) is checked on every load.
+    `timings`, if given, is filled with {'source': 'cache' | 'parse', 'seconds': float}.
     Returns: (config_data: dict, absolute_path: str)
     """
+    started = time.perf_counter()
     abs_path = os.path.abspath(config_path)
     if not os.path.exists(abs_path):
         raise FileNotFoundError(f"Config file not found at {abs_path}")
 
     # Detect format by extension
     ext = os.path.splitext(abs_path)[1].lower()
-    
+
+    # Fast path: file untouched since the last load
+    st = os.stat(abs_path)
+    if use_cache:
+        data = _read_config_cache(abs_path, st)
+        if data is not None:
+            _check_environment(data)
+            if timings is not None:
+                timings.update(source='cache', seconds=time.perf_counter() - started)
+            return data, abs_path
+
+    with open(abs_path, 'rb') as f:
+        raw = f.read()
+    content_hash = hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    # Touched but identical content (e.g. git checkout): still a hit
+    if use_cache:
+        data = _read_config_cache(abs_path, st, content_hash)
+        if data is not None:
+            _write_config_cache(abs_path, st, content_hash, data)
+            _check_environment(data)
+            if timings is not None:
+                timings.update(source='cache', seconds=time.perf_counter() - started)
+            return data, abs_path
+
     try:
-        with open(abs_path, 'r') as f:
-            if ext in ['.yaml', '.yml']:
-                # Safe load prevents arbitrary code execution in YAML
-                data = yaml.safe_load(f)
-            else:
-                # Let's try YAML, then fail.
-                try:
-                    f.seek(0)
-                    data = yaml.safe_load(f)
-                except:
-                    raise ValueError(f"Unsupported file format: {ext}. Please use .yaml file")
-                    
+        if ext not in ['.yaml', '.yml']:
+            # Let's try YAML, then fail.
+            try:
+                data = _load_yaml(raw)
+            except Exception:
+                raise ValueError(f"Unsupported file format: {ext}. Please use .yaml file")
+        else:
+            # Safe loader prevents arbitrary code execution in YAML
+            data = _load_yaml(raw)
     except Exception as e:
         raise ValueError(f"Error parsing {ext} file: {e}")
 
@@ -41,8 +151,202 @@ def load_and_validate(config_path):
     if not isinstance(data['experiments'], list):
         raise ValueError("'experiments' must be a list.")
 
+    conf = data.get('config') or {}
+    for validate in _SECTION_VALIDATORS:
+        validate(conf, data['experiments'])
+
+    if use_cache:
+        _write_config_cache(abs_path, st, content_hash, data)
+    _check_environment(data)
+    if timings is not None:
+        timings.update(source='parse', seconds=time.perf_counter() - started)
+
     return data, abs_path
 
+def _check_environment(data):
+    """Checks that depend on this machine rather than on the file, so cached configs get them too."""
+    if (data.get('config') or {}).get('log_compress') == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("'config.log_compress: zstd' needs the 'zstandard' package (pip install zstandard).")
+
+# --- Section validators: each checks (config section, experiments) and raises ValueError ---
+
+def _settings(conf, experiments, key):
+    """(where, value) of `key` in the config section, then in every experiment."""
+    yield f"config.{key}", conf.get(key)
+    for idx, exp in enumerate(experiments):
+        if isinstance(exp, dict):
+            yield f"experiment '{exp.get('name', idx + 1)}' {key}", exp.get(key)
+
+def _validate_execution(conf, experiments):
+    max_parallel = conf.get('max_parallel', 1)
+    if not isinstance(max_parallel, int) or isinstance(max_parallel, bool) or max_parallel < 1:
+        raise ValueError(f"'config.max_parallel' must be a positive integer (got {max_parallel!r}).")
+
+    order = conf.get('order', 'auto')
+    if order not in ('auto', 'file', 'lpt'):
+        raise ValueError(f"'config.order' must be auto, file or lpt (got {order!r}).")
+
+    console = conf.get('console', 'auto')
+    if console not in ('auto', 'dashboard', 'lines'):
+        raise ValueError(f"'config.console' must be auto, dashboard or lines (got {console!r}).")
+    if not isinstance(conf.get('trace', False), bool):
+        raise ValueError("'config.trace' must be true or false.")
+
+def _validate_cache(conf, experiments):
+    cache_conf = conf.get('cache', {})
+    if cache_conf is not False and not isinstance(cache_conf, dict):
+        raise ValueError("'config.cache' must be false or a mapping (env, max_age_days, max_size_mb).")
+    if isinstance(cache_conf, dict) and not isinstance(cache_conf.get('env', []), list):
+        raise ValueError("'config.cache.env' must be a list of environment variable names.")
+
+def _validate_logs(conf, experiments):
+    flush_interval = conf.get('log_flush_interval', 1.0)
+    if isinstance(flush_interval, bool) or not isinstance(flush_interval, (int, float)) or flush_interval < 0:
+        raise ValueError(f"'config.log_flush_interval' must be a non-negative number of seconds (got {flush_interval!r}).")
+
+    log_compress = conf.get('log_compress')
+    if log_compress not in (None, False, 'gzip', 'zstd'):
+        raise ValueError(f"'config.log_compress' must be gzip, zstd or false (got {log_compress!r}).")
+    max_log_mb = conf.get('max_log_mb')
+    if max_log_mb is not None and (isinstance(max_log_mb, bool) or not isinstance(max_log_mb, (int, float))
+                                   or max_log_mb <= 0):
+        raise ValueError(f"'config.max_log_mb' must be a positive number (got {max_log_mb!r}).")
+
+def _validate_metrics(conf, experiments):
+    # Metric extraction: `true` (XSCHR_METRIC lines only) or a list of regexes with named groups
+    from .metrics import compile_patterns
+    for where, spec in _settings(conf, experiments, 'metrics'):
+        if spec is None or isinstance(spec, bool):
+            continue
+        if not isinstance(spec, list):
+            raise ValueError(f"'{where}' must be true/false or a list of regexes.")
+        try:
+            compile_patterns(spec)
+        except ValueError as e:
+            raise ValueError(f"'{where}': {e}")
+
+    # Early stopping (`scheduler: asha`), globally or per experiment
+    from .early_stop import parse_scheduler
+    for where, spec in _settings(conf, experiments, 'scheduler'):
+        if spec is None or spec is False:
+            continue
+        try:
+            parse_scheduler(spec)
+        except ValueError as e:
+            raise ValueError(f"'{where}': {e}")
+
+def _validate_retry(conf, experiments):
+    # Automatic retries (see xschr.retry), globally or per experiment
+    from .retry import parse_retry
+    for where, spec in _settings(conf, experiments, 'retry'):
+        if spec is None or spec is False:
+            continue
+        try:
+            parse_retry(spec)
+        except ValueError as e:
+            raise ValueError(f"'{where}': {e}")
+
+def _validate_resources(conf, experiments):
+    # Dataset staging (see xschr.staging)
+    from .staging import parse_stage
+    for idx, exp in enumerate(experiments):
+        if isinstance(exp, dict) and exp.get('stage'):
+            try:
+                parse_stage(exp['stage'])
+            except ValueError as e:
+                raise ValueError(f"'experiment '{exp.get('name', idx + 1)}' stage': {e}")
+
+    # GPU requests: validated here so a typo fails before anything is queued
+    from .gpu_slots import parse_gpu_request, parse_gpu_mem
+    gpus_per_run = conf.get('gpus_per_run')
+    if gpus_per_run is not None:
+        parse_gpu_request(gpus_per_run)
+    for idx, exp in enumerate(experiments):
+        if isinstance(exp, dict) and exp.get('gpus') is not None:
+            parse_gpu_request(exp['gpus'])
+        if isinstance(exp, dict) and exp.get('gpu_mem') is not None:
+            parse_gpu_mem(exp['gpu_mem'])
+            if exp.get('gpus', gpus_per_run) is None:
+                raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': 'gpu_mem' needs 'gpus' "
+                                 f"(or 'config.gpus_per_run').")
+
+    # Core requests and pinning (see xschr.cpu_slots)
+    from .cpu_slots import parse_cpu_request
+    cpus_per_run = conf.get('cpus_per_run')
+    if cpus_per_run is not None:
+        parse_cpu_request(cpus_per_run)
+    for exp in experiments:
+        if isinstance(exp, dict) and exp.get('cpus') is not None:
+            parse_cpu_request(exp['cpus'])
+    if not isinstance(conf.get('cpu_affinity', True), bool):
+        raise ValueError("'config.cpu_affinity' must be true or false.")
+
+def _validate_timeouts(conf, experiments):
+    # Run time limits (see xschr.watchdog), globally or per experiment
+    from .watchdog import parse_duration
+    for key in ('timeout', 'idle_timeout'):
+        for where, value in _settings(conf, experiments, key):
+            if value is not None:
+                parse_duration(value, where)
+
+def _validate_runs(conf, experiments):
+    # Runs: explicit `runs` list and/or a lazily expanded `sweep` block
+    for idx, exp in enumerate(experiments):
+        if not isinstance(exp, dict) or 'script' not in exp:
+            raise ValueError(f"Experiment #{idx + 1} must be a mapping with a 'script'.")
+        if 'runs' not in exp and 'sweep' not in exp:
+            raise ValueError(f"Experiment '{exp.get('name', idx + 1)}' needs 'runs' or a 'sweep' block.")
+        exp.setdefault('runs', [])
+        if not isinstance(exp['runs'], list):
+            raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': 'runs' must be a list.")
+        priority = exp.get('priority', 0)
+        if not isinstance(priority, (int, float)) or isinstance(priority, bool):
+            raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': 'priority' must be a number.")
+        if not isinstance(exp.get('warm_start', False), bool):
+            raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': 'warm_start' must be true or false.")
+        preload = exp.get('preload', [])
+        if not isinstance(preload, list) or not all(isinstance(m, str) for m in preload):
+            raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': 'preload' must be a list of module names.")
+        if 'sweep' in exp:
+            try:
+                sweep.validate(exp['sweep'])
+            except ValueError as e:
+                raise ValueError(f"Experiment '{exp.get('name', idx + 1)}': {e}")
+
+# In the order their errors are reported
+_SECTION_VALIDATORS = (_validate_execution, _validate_cache, _validate_logs, _validate_metrics, _validate_retry,
+                       _validate_resources, _validate_timeouts, _validate_runs)
+
+def split_args(args):
+    """Normalize run args given as a string ("--lr 0.1"), a list, or a bare YAML scalar."""
+    if args is None:
+        return []
+    if isinstance(args, list):
+        return [str(a) for a in args]
+    return str(args).split()
+
+def count_runs(exp):
+    """Number of runs in an experiment, without expanding its sweep."""
+    total = len(exp.get('runs', []))
+    if 'sweep' in exp:
+        total += sweep.count(exp['sweep'])
+    return total
+
+def iter_runs(exp):
+    """
+    Yield the argument list of every run in an experiment: explicit `runs` first, then the sweep.
+    Experiment-level `args` are prepended to each run.
+    """
+    base = split_args(exp.get('args'))
+    for run in exp.get('runs', []):
+        yield base + split_args(run.get('args') if isinstance(run, dict) else run)
+    if 'sweep' in exp:
+        for arg_list in sweep.iter_arg_lists(exp['sweep']):
+            yield base + arg_list
+
 def resolve_script_path(config_path_abs, script_relative):
     """
     Resolves a script path relative to the location of the config file.
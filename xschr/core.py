@@ -4,56 +4,189 @@ xschr.core
 core delegation of xschr package.
 """
 
-import sys
 import os
+import sys
 import time
-from .cli import get_parser, Environment
-from .config import load_and_validate
-from .system import print_system_status
-from .engine import run_sequence
 
-def main():
+from .cli import COMMANDS, Environment, get_parser
+
+# Everything else (yaml, ctypes/CUDA, subprocess machinery) is imported inside main()
+# only once we know it is needed, to keep time-to-first-output low.
+
+
+class _StartupProfile:
+    """Records wall-clock marks between startup phases for --profile-startup."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        print("\n[Startup Profile]")
+        for phase, seconds in self.phases:
+            print(f"  • {phase:<22} {seconds * 1000:8.1f} ms")
+        print(f"  • {'total':<22} {(self._last - self.started) * 1000:8.1f} ms")
+
+
+def main(started=None):
     """
     The core logic driver.
+    `started` is the perf_counter() value taken by the entry point, for --profile-startup.
     """
+    profile = _StartupProfile(started)
+
     # 1. Initialize Environment
     env = Environment()
 
-    # 2. Parse Arguments
+    # 2. Parse Arguments (subcommands such as `xschr logs` have their own parsers)
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        from .commands import run
+
+        return run(sys.argv[1], sys.argv[2:], env)
+
     parser = get_parser(env)
     args = parser.parse_args()
+    profile.mark("import + parse arguments")
 
     # 3. System Check (Skip if dry-run to reduce noise, or keep it if you prefer)
-    if not args.dry_run:
-        try: 
-            print_system_status()
+    if not args.dry_run and not args.cache_only_check:
+        try:
+            from .system import print_system_status
+
+            print_system_status(refresh=args.refresh_hw)
         except Exception:
             # Don't crash if nvidia-smi fails, just ignore
             pass
+        profile.mark("hardware inventory")
+
+    # 4. Load Config (when resuming, the journal knows which one)
+    from .config import load_and_validate
+
+    if args.resume:
+        from .journal import replay
+
+        try:
+            journaled = replay(args.resume)["config"]
+        except Exception as e:
+            env.log_error(f"Resume Failed: {e}")
+            return 1
+        if args.path is None:
+            args.path = journaled
+        if args.path is None:
+            env.log_error(
+                f"Resume Failed: journal in {args.resume} does not record a config file."
+            )
+            return 1
 
-    # 4. Load Config
+    load_timings = {}
     try:
-        config_data, config_abs_path = load_and_validate(args.path)
+        config_data, config_abs_path = load_and_validate(
+            args.path, timings=load_timings
+        )
     except Exception as e:
         env.log_error(f"Configuration Failed: {e}")
         return 1
+    if args.debug:
+        verb = (
+            "cache hit" if load_timings["source"] == "cache" else "parsed + validated"
+        )
+        print(f"  • [Debug] Config {verb} in {load_timings['seconds'] * 1000:.1f} ms")
+    profile.mark(f"load config ({load_timings['source']})")
 
     # 5. Extract Global Settings
-    conf_global = config_data.get('config', {})
+    conf_global = config_data.get("config", {})
     # Default to current python interpreter if not specified
-    python_cmd = conf_global.get('python_cmd', sys.executable)
-    log_dir = conf_global.get('log_dir', 'logs')
+    python_cmd = conf_global.get("python_cmd", sys.executable)
+    log_dir = conf_global.get("log_dir", "logs")
+    # CLI flag wins over the config file; default is strictly sequential
+    jobs = args.jobs if args.jobs is not None else conf_global.get("max_parallel", 1)
+
+    # Result cache lives next to the run directories; `cache: false` disables it
+    cache, cache_mode = None, "use"
+    cache_conf = conf_global.get("cache", {})
+    if cache_conf is not False:
+        from .cache import RunCache
+
+        cache_opts = cache_conf if isinstance(cache_conf, dict) else {}
+        cache = RunCache(
+            os.path.join(log_dir, ".cache"), env_keys=cache_opts.get("env", [])
+        )
+        if args.cache_only_check:
+            cache_mode = "check"
+        elif args.no_cache:
+            cache_mode = "refresh"
+        if not args.dry_run and not args.cache_only_check:
+            cache.evict(cache_opts.get("max_age_days"), cache_opts.get("max_size_mb"))
+
+    # Scheduler timeline (--trace or `trace: true`), starting with the config load
+    tracer = None
+    if args.trace or conf_global.get("trace"):
+        from .trace import Tracer
+
+        tracer = Tracer()
+        tracer.event(
+            "config_loaded",
+            duration=load_timings["seconds"],
+            source=load_timings["source"],
+        )
 
     # 6. Run Engine
+    from .engine import (
+        DEFAULT_FLUSH_INTERVAL,
+        OutputSettings,
+        SessionSettings,
+        run_sequence,
+    )
+
+    profile.mark("import engine")
+    if args.profile_startup:
+        profile.report()
+
     # We pass the parsed arguments to the engine
     try:
+        max_log_mb = conf_global.get("max_log_mb")
+        output = OutputSettings(
+            echo=not args.quiet and conf_global.get("echo", True),
+            flush_interval=conf_global.get(
+                "log_flush_interval", DEFAULT_FLUSH_INTERVAL
+            ),
+            log_codec=conf_global.get("log_compress") or None,
+            max_log_bytes=int(max_log_mb * 1024 * 1024) if max_log_mb else None,
+        )
+        settings = SessionSettings(
+            jobs=jobs,
+            fail_fast=args.fail_fast,
+            dry_run=args.dry_run,
+            plan_limit=args.plan_limit,
+            order=args.order or conf_global.get("order", "auto"),
+            console=args.console or conf_global.get("console", "auto"),
+            is_terminal=env.is_terminal,
+            output=output,
+            cache=cache,
+            cache_mode=cache_mode,
+            resume_dir=args.resume,
+            retry_failed=args.retry_failed,
+            gpus_per_run=conf_global.get("gpus_per_run"),
+            cpus_per_run=conf_global.get("cpus_per_run"),
+            cpu_affinity=conf_global.get("cpu_affinity", True),
+            metrics=conf_global.get("metrics"),
+            scheduler=conf_global.get("scheduler"),
+            timeouts={key: conf_global.get(key) for key in ("timeout", "idle_timeout")},
+            retry=conf_global.get("retry"),
+            tracer=tracer,
+        )
         stats = run_sequence(
-            experiments=config_data['experiments'],
+            experiments=config_data["experiments"],
             config_path=config_abs_path,
             python_cmd=python_cmd,
             log_root=log_dir,
-            fail_fast=args.fail_fast,
-            dry_run=args.dry_run
+            settings=settings,
         )
     except KeyboardInterrupt:
         env.log_error("Execution interrupted by user.")
@@ -62,18 +195,47 @@ def main():
         env.log_error(f"Engine Crash: {e}")
         if args.debug:
             import traceback
+
             traceback.print_exc()
         return 1
 
     # 7. Final Summary
     # The engine handles per-run printing, we just summarize the totals.
+    if cache_mode == "check":
+        print(f"\n[Cache Check]")
+        print(f"  • Cached:  {stats['cached']}")
+        print(f"  • Pending: {stats['pending']}")
+        return 0
+
     if not args.dry_run:
+        from .accounting import print_usage_table
+
+        print_usage_table(stats["runs"], sort_by=args.sort_by)
+
         print(f"\n[Final Summary]")
-        if stats['failed'] == 0:
-            print(f"\033[1;32m✓ All {stats['success']} runs completed successfully.\033[0m")
+        notes = [
+            f"{stats[key]} {label}"
+            for key, label in (
+                ("cached", "cached"),
+                ("stopped", "stopped early"),
+                ("retried", "retried"),
+            )
+            if stats.get(key)
+        ]
+        cached_note = f" ({', '.join(notes)})" if notes else ""
+        if stats["failed"] == 0 and not stats.get("timeout"):
+            done = stats["success"] + stats.get("cached", 0) + stats.get("stopped", 0)
+            print(
+                f"\033[1;32m✓ All {done} runs completed successfully{cached_note}.\033[0m"
+            )
             return 0
         else:
-            print(f"\033[1;31m✗ Completed: {stats['success']} | Failed: {stats['failed']}\033[0m")
+            summary = f"✗ Completed: {stats['success']}{cached_note} | Failed: {stats['failed']}"
+            if stats.get("timeout"):
+                summary += f" | Timed out: {stats['timeout']}"
+            if stats.get("cancelled"):
+                summary += f" | Cancelled: {stats['cancelled']}"
+            print(f"\033[1;31m{summary}\033[0m")
             return 1
-    
+
     return 0
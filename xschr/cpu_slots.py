@@ -0,0 +1,153 @@
+"""
+xschr.cpu_slots
+
+CPU slot pool: leases disjoint sets of cores to concurrent runs, one NUMA node per run where possible.
+"""
+
+import os
+import glob
+import threading
+from dataclasses import dataclass
+
+# Thread pools that size themselves to the whole machine unless told otherwise
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+def parse_cpu_request(value):
+    """Normalize a `cpus:` value to a positive number of cores."""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"'cpus' must be a positive whole number of cores (got {value!r}).")
+    return value
+
+def _parse_cpulist(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cores = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cores.extend(range(int(first), int(last or first) + 1))
+    return cores
+
+def format_cpulist(cores):
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def detect_cpu_topology():
+    """
+    Cores this process may run on, grouped by NUMA node: a list of core lists.
+    Falls back to a single node when /sys does not expose the topology (non-Linux, containers).
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        allowed = set(os.sched_getaffinity(0))
+    else:
+        allowed = set(range(os.cpu_count() or 1))
+
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist"),
+                       key=lambda p: int(os.path.basename(os.path.dirname(p))[4:])):
+        try:
+            with open(path) as f:
+                cores = [c for c in _parse_cpulist(f.read()) if c in allowed]
+        except (OSError, ValueError):
+            continue
+        if cores:
+            nodes.append(cores)
+
+    # Cores the node files missed (or no node files at all) form one more node
+    seen = {c for node in nodes for c in node}
+    rest = sorted(allowed - seen)
+    if rest:
+        nodes.append(rest)
+    return nodes
+
+@dataclass
+class CpuLease:
+    """A set of cores held by one run."""
+    cores: tuple
+
+    @property
+    def cpulist(self):
+        """Cores in cpulist notation, e.g. '0-3'."""
+        return format_cpulist(self.cores)
+
+    def thread_env(self):
+        """BLAS/OpenMP thread counts matching the lease."""
+        return {name: str(len(self.cores)) for name in THREAD_ENV_VARS}
+
+class CpuSlotPool:
+    """
+    Tracks free cores per NUMA node and hands out disjoint leases.
+
+    `nodes` is the list returned by `detect_cpu_topology`, so tests can inject
+    a fake layout such as [[0, 1, 2, 3], [4, 5, 6, 7]].
+    """
+    def __init__(self, nodes):
+        self.nodes = [sorted(node) for node in nodes if node]
+        self._free = [set(node) for node in self.nodes]
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return sum(len(node) for node in self.nodes)
+
+    def can_fit(self, amount):
+        """True if the request could ever be satisfied by this pool."""
+        return amount <= len(self)
+
+    def try_lease(self, amount):
+        """Lease `amount` cores if free right now. Returns a CpuLease or None."""
+        with self._cond:
+            return self._take(amount)
+
+    def lease(self, amount, cancelled=None, poll=0.2):
+        """
+        Block until `amount` cores are free and lease them.
+        Returns None if `cancelled` (a threading.Event) is set while waiting.
+        """
+        if not self.can_fit(amount):
+            raise ValueError(f"Run requires {amount} CPU core(s) but only {len(self)} available.")
+
+        with self._cond:
+            while True:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                lease = self._take(amount)
+                if lease is not None:
+                    return lease
+                self._cond.wait(timeout=poll)
+
+    def release(self, lease):
+        """Return a lease's cores to the pool and wake waiting runs."""
+        if lease is None:
+            return
+        with self._cond:
+            for free, node in zip(self._free, self.nodes):
+                free.update(c for c in lease.cores if c in node)
+            self._cond.notify_all()
+
+    def _take(self, amount):
+        if sum(len(free) for free in self._free) < amount:
+            return None
+
+        # Best fit: one node with the least room that still fits keeps memory local
+        fitting = [k for k, free in enumerate(self._free) if len(free) >= amount]
+        if fitting:
+            k = min(fitting, key=lambda k: (len(self._free[k]), k))
+            chosen = sorted(self._free[k])[:amount]
+            self._free[k].difference_update(chosen)
+            return CpuLease(tuple(chosen))
+
+        # Too big for any single node: spread over the emptiest nodes first
+        chosen = []
+        for k in sorted(range(len(self._free)), key=lambda k: -len(self._free[k])):
+            take = sorted(self._free[k])[:amount - len(chosen)]
+            self._free[k].difference_update(take)
+            chosen.extend(take)
+            if len(chosen) == amount:
+                break
+        return CpuLease(tuple(sorted(chosen)))
@@ -1,12 +1,29 @@
 import ctypes
+import threading
 from ctypes.util import find_library
 
 # --- Types ---
 CUresult = ctypes.c_uint32
 CUdevice = ctypes.c_int32
+nvmlReturn_t = ctypes.c_uint32
+nvmlDevice_t = ctypes.c_void_p
+
+class nvmlMemory_t(ctypes.Structure):
+    _fields_ = [('total', ctypes.c_ulonglong), ('free', ctypes.c_ulonglong), ('used', ctypes.c_ulonglong)]
+
+class nvmlUtilization_t(ctypes.Structure):
+    _fields_ = [('gpu', ctypes.c_uint), ('memory', ctypes.c_uint)]
 
 # --- CUDA Error Codes ---
 CUDA_SUCCESS = 0
+NVML_SUCCESS = 0
+# NVML errors after which the library has to be initialized again
+NVML_ERROR_UNINITIALIZED = 1
+NVML_ERROR_DRIVER_NOT_LOADED = 9
+NVML_ERROR_GPU_IS_LOST = 15
+_NVML_REINIT = (NVML_ERROR_UNINITIALIZED, NVML_ERROR_DRIVER_NOT_LOADED, NVML_ERROR_GPU_IS_LOST)
+
+_MB = 1024 * 1024
 
 # --- Library Loading ---
 def load_cuda_driver():
@@ -19,87 +36,238 @@ def load_cuda_driver():
         pass
     return None
 
+def load_nvml():
+    """Load the NVML library (ships with the driver). Returns dll or None."""
+    for name in (find_library('nvidia-ml'), 'libnvidia-ml.so.1'):
+        if not name:
+            continue
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            pass
+    return None
+
 # --- API Function Setup ---
+def _bind(funcs, dll, name, restype, argtypes, required=True):
+    """Look up `name` in `dll` and declare its signature; optional functions may be missing."""
+    try:
+        func = getattr(dll, name)
+    except AttributeError:
+        if required:
+            raise
+        return
+    try:
+        func.restype = restype
+        func.argtypes = argtypes
+    except AttributeError:
+        pass   # a fake library's plain Python method
+    funcs[name] = func
+
 def setup_cuda_functions(dll):
-    """Setup CUDA API function signatures. Returns dict of functions or None."""
+    """
+    Setup CUDA API function signatures. Returns dict of functions or None.
+    `dll` may be any object with the same attributes, so tests can pass a fake library.
+    """
     if not dll:
         return None
-    
+
     funcs = {}
-    
+
     try:
-        # cuInit
-        funcs['cuInit'] = dll.cuInit
-        funcs['cuInit'].restype = CUresult
-        funcs['cuInit'].argtypes = [ctypes.c_uint32]
-        
-        # cuDeviceGetCount
-        funcs['cuDeviceGetCount'] = dll.cuDeviceGetCount
-        funcs['cuDeviceGetCount'].restype = CUresult
-        funcs['cuDeviceGetCount'].argtypes = [ctypes.POINTER(ctypes.c_int32)]
-        
-        # cuDeviceGet
-        funcs['cuDeviceGet'] = dll.cuDeviceGet
-        funcs['cuDeviceGet'].restype = CUresult
-        funcs['cuDeviceGet'].argtypes = [ctypes.POINTER(CUdevice), ctypes.c_int32]
-        
-        # cuDeviceGetName
-        funcs['cuDeviceGetName'] = dll.cuDeviceGetName
-        funcs['cuDeviceGetName'].restype = CUresult
-        funcs['cuDeviceGetName'].argtypes = [ctypes.POINTER(ctypes.c_char), ctypes.c_int32, CUdevice]
-        
+        _bind(funcs, dll, 'cuInit', CUresult, [ctypes.c_uint32])
+        _bind(funcs, dll, 'cuDeviceGetCount', CUresult, [ctypes.POINTER(ctypes.c_int32)])
+        _bind(funcs, dll, 'cuDeviceGet', CUresult, [ctypes.POINTER(CUdevice), ctypes.c_int32])
+        _bind(funcs, dll, 'cuDeviceGetName', CUresult, [ctypes.POINTER(ctypes.c_char), ctypes.c_int32, CUdevice])
+
+        # Optional: memory size and the PCI address used to match NVML devices
+        _bind(funcs, dll, 'cuDeviceTotalMem_v2', CUresult, [ctypes.POINTER(ctypes.c_size_t), CUdevice],
+              required=False)
+        _bind(funcs, dll, 'cuDeviceGetPCIBusId', CUresult, [ctypes.POINTER(ctypes.c_char), ctypes.c_int32, CUdevice],
+              required=False)
+
         return funcs
     except AttributeError:
         return None
 
-# --- Detection Functions ---
-def detect_nvidia_gpus():
-    """
-    Detect NVIDIA GPUs using CUDA driver API.
-    Returns list of dicts with GPU info, or empty list if none found.
-    
-    Returns:
-        [{'id': 0, 'name': 'RTX 4090', 'success': True}, ...]
-    """
-    dll = load_cuda_driver()
+def setup_nvml_functions(dll):
+    """Setup NVML function signatures (live memory and utilization). Returns dict of functions or None."""
     if not dll:
-        return []
-    
+        return None
+
+    funcs = {}
+
+    try:
+        _bind(funcs, dll, 'nvmlInit_v2', nvmlReturn_t, [])
+        _bind(funcs, dll, 'nvmlDeviceGetHandleByPciBusId_v2', nvmlReturn_t,
+              [ctypes.c_char_p, ctypes.POINTER(nvmlDevice_t)])
+        _bind(funcs, dll, 'nvmlDeviceGetMemoryInfo', nvmlReturn_t, [nvmlDevice_t, ctypes.POINTER(nvmlMemory_t)])
+        _bind(funcs, dll, 'nvmlDeviceGetUtilizationRates', nvmlReturn_t,
+              [nvmlDevice_t, ctypes.POINTER(nvmlUtilization_t)], required=False)
+        _bind(funcs, dll, 'nvmlShutdown', nvmlReturn_t, [], required=False)
+        return funcs
+    except AttributeError:
+        return None
+
+# --- NVML Session ---
+# device_status is polled (admission, dashboard): NVML is loaded and initialized once and
+# kept until a call reports it needs initializing again.
+_nvml = {'default': None, 'loaded': False, 'dll': None, 'funcs': None}
+_nvml_lock = threading.Lock()
+
+def _nvml_functions(dll=None):
+    """Initialized NVML functions for `dll` (the system library when None), or None if unusable."""
+    with _nvml_lock:
+        if dll is None:
+            if not _nvml['loaded']:
+                _nvml['default'], _nvml['loaded'] = load_nvml(), True
+            dll = _nvml['default']
+        if _nvml['funcs'] is not None and _nvml['dll'] is dll:
+            return _nvml['funcs']
+        funcs = setup_nvml_functions(dll)
+        if not funcs or funcs['nvmlInit_v2']() != NVML_SUCCESS:
+            # Not remembered: the next probe tries again
+            return None
+        _shutdown_nvml()
+        if _nvml['dll'] is None:
+            import atexit
+            atexit.register(shutdown_nvml)
+        _nvml['dll'], _nvml['funcs'] = dll, funcs
+        return funcs
+
+def _shutdown_nvml():
+    funcs = _nvml['funcs']
+    _nvml['funcs'] = None
+    if funcs is not None and 'nvmlShutdown' in funcs:
+        funcs['nvmlShutdown']()
+
+def shutdown_nvml():
+    """Release NVML; the next device_status initializes it again."""
+    with _nvml_lock:
+        _shutdown_nvml()
+
+def _nvml_failed(dll, result):
+    """Drop the NVML session if `result` says it is no longer usable."""
+    if result in _NVML_REINIT:
+        with _nvml_lock:
+            if _nvml['dll'] is dll or dll is None:
+                _shutdown_nvml()
+
+# --- Detection Functions ---
+def _init_cuda(dll):
+    """Bound functions and device count, or (None, 0) if the driver is unusable."""
     funcs = setup_cuda_functions(dll)
     if not funcs:
-        return []
-    
+        return None, 0
+
     # Initialize CUDA
     result = funcs['cuInit'](0)
     if result != CUDA_SUCCESS:
-        return []
-    
+        return None, 0
+
     # Get device count
     count = ctypes.c_int32()
-    result = funcs['cuDeviceGetCount'](ctypes.byref(count))
-    if result != CUDA_SUCCESS or count.value == 0:
+    result = funcs['cuDeviceGetCount'](ctypes.pointer(count))
+    if result != CUDA_SUCCESS:
+        return None, 0
+    return funcs, count.value
+
+def detect_nvidia_gpus(dll=None):
+    """
+    Detect NVIDIA GPUs using CUDA driver API.
+    Returns list of dicts with GPU info, or empty list if none found.
+    `dll` replaces the real driver library (for tests).
+
+    Returns:
+        [{'id': 0, 'name': 'RTX 4090', 'success': True, 'total_mb': 24210, 'pci_bus_id': '0000:01:00.0'}, ...]
+    """
+    if dll is None:
+        dll = load_cuda_driver()
+    if not dll:
         return []
-    
+
+    funcs, count = _init_cuda(dll)
+    if not funcs or count == 0:
+        return []
+
     # Get info for each GPU
     gpus = []
-    for i in range(count.value):
+    for i in range(count):
         device = CUdevice()
-        result = funcs['cuDeviceGet'](ctypes.byref(device), i)
+        result = funcs['cuDeviceGet'](ctypes.pointer(device), i)
         if result != CUDA_SUCCESS:
             continue
-        
+
         name_buffer = ctypes.create_string_buffer(256)
         result = funcs['cuDeviceGetName'](name_buffer, 256, device)
-        
+
         gpu_info = {
             'id': i,
             'name': name_buffer.value.decode() if result == CUDA_SUCCESS else 'Unknown',
             'success': result == CUDA_SUCCESS
         }
+
+        if 'cuDeviceTotalMem_v2' in funcs:
+            total = ctypes.c_size_t()
+            if funcs['cuDeviceTotalMem_v2'](ctypes.pointer(total), device) == CUDA_SUCCESS:
+                gpu_info['total_mb'] = total.value // _MB
+        if 'cuDeviceGetPCIBusId' in funcs:
+            bus_buffer = ctypes.create_string_buffer(32)
+            if funcs['cuDeviceGetPCIBusId'](bus_buffer, 32, device) == CUDA_SUCCESS:
+                gpu_info['pci_bus_id'] = bus_buffer.value.decode()
         gpus.append(gpu_info)
-    
+
     return gpus
 
+def device_status(gpus=None, cuda_dll=None, nvml_dll=None):
+    """
+    Snapshot of every device's memory and utilization, indexed like `detect_nvidia_gpus`
+    (CUDA order; NVML devices are matched by PCI address, since NVML numbers them differently).
+    `gpus` is a previous `detect_nvidia_gpus` result (probed again when None); the
+    libraries can be replaced by fakes.
+
+    Returns:
+        [{'id': 0, 'name': 'RTX 4090', 'total_mb': 24210, 'free_mb': 20110, 'used_mb': 4100,
+          'util_gpu': 35, 'util_mem': 12}, ...]
+    Values the driver does not report are None; without NVML only 'total_mb' is known.
+    """
+    if gpus is None:
+        gpus = detect_nvidia_gpus(cuda_dll)
+
+    snapshot = [{'id': g['id'], 'name': g.get('name', 'Unknown'), 'total_mb': g.get('total_mb'),
+                 'free_mb': None, 'used_mb': None, 'util_gpu': None, 'util_mem': None} for g in gpus]
+    if not snapshot:
+        return snapshot
+
+    funcs = _nvml_functions(nvml_dll)
+    if not funcs:
+        return snapshot
+
+    for gpu, status in zip(gpus, snapshot):
+        if not gpu.get('pci_bus_id'):
+            continue
+        handle = nvmlDevice_t()
+        result = funcs['nvmlDeviceGetHandleByPciBusId_v2'](gpu['pci_bus_id'].encode(), ctypes.pointer(handle))
+        if result != NVML_SUCCESS:
+            _nvml_failed(nvml_dll, result)
+            continue
+
+        memory = nvmlMemory_t()
+        result = funcs['nvmlDeviceGetMemoryInfo'](handle, ctypes.pointer(memory))
+        if result == NVML_SUCCESS:
+            status['total_mb'] = memory.total // _MB
+            status['free_mb'] = memory.free // _MB
+            status['used_mb'] = memory.used // _MB
+        else:
+            _nvml_failed(nvml_dll, result)
+
+        if 'nvmlDeviceGetUtilizationRates' in funcs:
+            utilization = nvmlUtilization_t()
+            if funcs['nvmlDeviceGetUtilizationRates'](handle, ctypes.pointer(utilization)) == NVML_SUCCESS:
+                status['util_gpu'] = utilization.gpu
+                status['util_mem'] = utilization.memory
+
+    return snapshot
+
 def get_gpu_count():
     """Quick check: how many GPUs? Returns 0 if none or error."""
     gpus = detect_nvidia_gpus()
@@ -112,10 +280,11 @@ def has_gpus():
 # --- Usage Example ---
 if __name__ == "__main__":
     gpus = detect_nvidia_gpus()
-    
+
     if gpus:
         print(f"Found {len(gpus)} NVIDIA GPU(s):")
-        for gpu in gpus:
-            print(f"  [{gpu['id']}] {gpu['name']}")
+        for gpu in device_status(gpus):
+            memory = f", {gpu['free_mb']}/{gpu['total_mb']} MB free" if gpu['free_mb'] is not None else ""
+            print(f"  [{gpu['id']}] {gpu['name']}{memory}")
     else:
         print("No NVIDIA GPUs detected")
@@ -0,0 +1,826 @@
+"""
+xschr.daemon
+
+long-running scheduler that owns the machine's worker and GPU slots and runs the configs
+submitted to it, any number of them at once.
+
+    xschr daemon [-j N]             # serve on $XSCHR_SOCKET (default /tmp/xschr-daemon.sock)
+    xschr submit -p config.yaml     # queue every run of a config, returns immediately
+    xschr status [JOB]
+    xschr cancel JOB
+
+Submissions are expanded into one row per run in a SQLite database, so the queue survives
+a daemon restart: runs that were in flight are queued again. Dispatch is round-robin
+across jobs (one run per job in turn), and a run that cannot get its GPUs yet is passed
+over for one that can, which keeps every slot busy while several configs are queued.
+Runs keep their experiment's timeout, idle_timeout and gpu_mem, wherever they execute;
+settings only an `xschr -p` session honors (retry, cpus, stage, warm_start, metrics,
+scheduler) make a submission fail rather than being dropped.
+
+Requests and replies are single JSON lines over the Unix socket. The daemon asks the
+kernel who is calling (SO_PEERCRED) rather than trusting the request: anyone may ask for
+the status, but only the daemon's own user can submit, and only a job's owner (or the
+daemon's user) may cancel it. A daemon never runs code or writes files on another user's
+behalf, so one running as root only serves root: every user starts a daemon of their own
+(on their own $XSCHR_SOCKET). The config's directory and its logs must belong to the
+submitter too. Where peer credentials are not available, the socket is only accessible to
+the daemon's user.
+
+With --listen the daemon also coordinates `xschr agent` processes on other hosts (see
+xschr.agents): each run goes to whichever of this host and the agents has the most free
+slots and can lease its GPUs.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .config import user_cache_dir
+
+SOCKET_ENV = "XSCHR_SOCKET"
+DEFAULT_SOCKET = "/tmp/xschr-daemon.sock"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    user TEXT, config TEXT, run_dir TEXT, env TEXT, settings TEXT,
+    status TEXT, submitted REAL, finished REAL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    job INTEGER, seq INTEGER, run_key TEXT, exp TEXT, args TEXT, cmd TEXT, gpus TEXT,
+    status TEXT, exit_code INTEGER, started REAL, finished REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_status ON runs(status, job, seq);
+"""
+
+# Columns added since the first queues were created
+_MIGRATIONS = (
+    "ALTER TABLE jobs ADD COLUMN uid INTEGER",
+    # A run's timeout, idle_timeout and gpu_mem, as JSON
+    "ALTER TABLE runs ADD COLUMN limits TEXT",
+)
+
+# Settings only an `xschr -p` session honors: a submission using one is refused
+_SESSION_ONLY = (
+    "retry",
+    "cpus_per_run",
+    "cpus",
+    "stage",
+    "warm_start",
+    "metrics",
+    "scheduler",
+)
+
+
+def peer_uid(sock):
+    """Uid of the process at the other end of a Unix socket, or None where the OS cannot tell."""
+    import socket
+    import struct
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+def _user_name(uid):
+    import pwd
+
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+def _check_owner(path, uid):
+    """
+    Refuse a directory the submitter does not own: `path` if it exists, else its nearest
+    existing parent, which may also be a sticky directory such as /tmp.
+    """
+    import stat
+
+    target = path = os.path.realpath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    st = os.stat(path)
+    # In a sticky parent, what the daemon creates stays the submitter's
+    if st.st_uid != uid and not (path != target and st.st_mode & stat.S_ISVTX):
+        raise PermissionError(f"{path} does not belong to {_user_name(uid)}.")
+
+
+def socket_path(path=None):
+    return path or os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET
+
+
+def default_db_path():
+    return user_cache_dir("daemon.sqlite")
+
+
+# --- Durable queue ---
+
+
+class RunQueue:
+    """SQLite-backed job and run table. One connection, serialized by a lock."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        for statement in _MIGRATIONS:
+            try:
+                self._db.execute(statement)
+            except sqlite3.OperationalError:
+                pass  # already there
+        self._lock = threading.Lock()
+
+    def _tx(self, statements):
+        """Run [(sql, params), ...] in one transaction."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                results = [self._db.execute(sql, params) for sql, params in statements]
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return results
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def recover(self):
+        """Requeue runs that were in flight when the previous daemon stopped. Returns their number."""
+        (cursor,) = self._tx(
+            [
+                (
+                    "UPDATE runs SET status = 'pending', started = NULL WHERE status = 'running'",
+                    (),
+                )
+            ]
+        )
+        return cursor.rowcount
+
+    def add_job(self, user, config, run_dir, env, settings, runs, uid=None):
+        """Insert a job and its runs [(run_key, exp, args, cmd, gpus, limits), ...] atomically. Returns the job id."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._db.execute(
+                    "INSERT INTO jobs (user, uid, config, run_dir, env, settings, status, submitted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                    (
+                        user,
+                        uid,
+                        config,
+                        run_dir,
+                        json.dumps(env),
+                        json.dumps(settings),
+                        time.time(),
+                    ),
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT INTO runs (job, seq, run_key, exp, args, cmd, gpus, limits, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')",
+                    (
+                        (
+                            job,
+                            seq,
+                            key,
+                            exp,
+                            json.dumps(args),
+                            json.dumps(cmd),
+                            gpus,
+                            json.dumps(limits) if limits else None,
+                        )
+                        for seq, (key, exp, args, cmd, gpus, limits) in enumerate(runs)
+                    ),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return job
+
+    def job(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = rows[0]
+        job["env"] = json.loads(job["env"])
+        job["settings"] = json.loads(job["settings"])
+        return job
+
+    def heads(self):
+        """The next pending run of every job with work left, ordered by job id."""
+        return self._query(
+            "SELECT r.* FROM runs r JOIN ("
+            "  SELECT job, MIN(seq) AS seq FROM runs WHERE status = 'pending' GROUP BY job"
+            ") h ON r.job = h.job AND r.seq = h.seq ORDER BY r.job"
+        )
+
+    def start(self, run_id):
+        self._tx(
+            [
+                (
+                    "UPDATE runs SET status = 'running', started = ? WHERE id = ?",
+                    (time.time(), run_id),
+                ),
+                (
+                    "UPDATE jobs SET status = 'running' WHERE id = (SELECT job FROM runs WHERE id = ?) "
+                    "AND status = 'queued'",
+                    (run_id,),
+                ),
+            ]
+        )
+
+    def finish(self, run_id, status, exit_code=None):
+        """Record a run's outcome and close its job once nothing is left open."""
+        self._tx(
+            [
+                (
+                    "UPDATE runs SET status = ?, exit_code = ?, finished = ? WHERE id = ?",
+                    (status, exit_code, time.time(), run_id),
+                ),
+                (
+                    "UPDATE jobs SET finished = ?, status = CASE "
+                    "  WHEN EXISTS (SELECT 1 FROM runs WHERE job = jobs.id AND status IN ('failed', 'timeout')) THEN 'failed' "
+                    "  ELSE 'done' END "
+                    "WHERE id = (SELECT job FROM runs WHERE id = ?) AND status IN ('queued', 'running') "
+                    "AND NOT EXISTS (SELECT 1 FROM runs WHERE job = jobs.id AND status IN ('pending', 'running'))",
+                    (time.time(), run_id),
+                ),
+            ]
+        )
+
+    def requeue(self, run_id):
+        self._tx(
+            [
+                (
+                    "UPDATE runs SET status = 'pending', started = NULL WHERE id = ?",
+                    (run_id,),
+                )
+            ]
+        )
+
+    def cancel(self, job_id):
+        """Cancel a job's pending runs. Returns False if the job does not exist or already ended."""
+        now = time.time()
+        job, _ = self._tx(
+            [
+                (
+                    "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status IN ('queued', 'running')",
+                    (now, job_id),
+                ),
+                (
+                    "UPDATE runs SET status = 'cancelled', finished = ? WHERE job = ? AND status = 'pending'",
+                    (now, job_id),
+                ),
+            ]
+        )
+        return job.rowcount > 0
+
+    def summary(self, job_id=None, limit=50):
+        """Jobs (newest first) with per-status run counts."""
+        where, params = (
+            ("WHERE j.id = ?", (job_id,)) if job_id is not None else ("", ())
+        )
+        jobs = self._query(
+            f"SELECT j.id, j.user, j.config, j.run_dir, j.status, j.submitted, j.finished FROM jobs j {where} "
+            f"ORDER BY j.id DESC LIMIT ?",
+            params + (limit,),
+        )
+        for job in jobs:
+            counts = self._query(
+                "SELECT status, COUNT(*) AS n FROM runs WHERE job = ? GROUP BY status",
+                (job["id"],),
+            )
+            job["runs"] = {row["status"]: row["n"] for row in counts}
+        return jobs
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# --- Daemon ---
+
+
+class _JobProcesses:
+    """Live processes of one job; the `pool` handed to _execute_subprocess so a cancel can reach them."""
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._procs = set()
+
+    def register(self, process):
+        with self._lock:
+            if self.stopped.is_set():
+                return False
+            self._procs.add(process)
+            return True
+
+    def unregister(self, process):
+        with self._lock:
+            self._procs.discard(process)
+
+    def cancel(self):
+        with self._lock:
+            self.stopped.set()
+            procs = list(self._procs)
+        # Runs lead their own process group (see engine._popen); stop it whole
+        from .watchdog import own_group, stop_group
+
+        for p in procs:
+            stop_group(p, own_group(p))
+
+
+class Daemon:
+    """
+    Owns `slots` worker slots and the GPU slot pool, and dispatches queued runs.
+    `gpu_devices` defaults to the detected hardware (injectable for tests).
+    `hub`, an agents.AgentHub, adds remote agents' slots; with a hub `slots` may be 0.
+    """
+
+    def __init__(self, queue, slots, socket_path, gpu_devices=None, hub=None):
+        from .gpu_slots import GpuSlotPool
+
+        self.queue = queue
+        self.hub = hub
+        self.slots = max(0 if hub is not None else 1, slots)
+        self.socket_path = socket_path
+        memory_probe = None
+        if gpu_devices is None and self.slots == 0:
+            gpu_devices = []
+        elif gpu_devices is None:
+            from .cuda_devices import device_status
+            from .system import get_hardware_inventory
+
+            gpu_devices = get_hardware_inventory()["gpus"]
+            # Only consulted for runs that declare gpu_mem
+            memory_probe = lambda: device_status(gpu_devices)
+        self.gpu_pool = GpuSlotPool(gpu_devices, memory_probe=memory_probe)
+
+        self.stopping = threading.Event()
+        self._wake = threading.Condition()
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> job row (env, settings, run_dir)
+        self._handles = {}  # job id -> _JobProcesses
+        self._last_job = None  # round-robin position
+        self._threads = []
+
+    # -- Dispatch --
+
+    def wake(self):
+        with self._wake:
+            self._wake.notify_all()
+
+    def _job(self, job_id):
+        """(job row, _JobProcesses) of a job, loaded on its first run."""
+        with self._lock:
+            if job_id not in self._jobs:
+                self._jobs[job_id] = self.queue.job(job_id)
+                self._handles[job_id] = _JobProcesses()
+            return self._jobs[job_id], self._handles[job_id]
+
+    def _dispatch_loop(self):
+        from .gpu_slots import parse_gpu_request
+
+        while not self.stopping.is_set():
+            placed = False
+            if self._busy < self.slots or (
+                self.hub is not None and self.hub.max_free() > 0
+            ):
+                heads = self.queue.heads()
+                # Round-robin: start with the first job after the one served last
+                if self._last_job is not None:
+                    heads = [h for h in heads if h["job"] > self._last_job] + [
+                        h for h in heads if h["job"] <= self._last_job
+                    ]
+                for run in heads:
+                    amount = None
+                    mem_mb = (
+                        json.loads(run["limits"]).get("gpu_mem")
+                        if run.get("limits")
+                        else None
+                    )
+                    if run["gpus"] is not None:
+                        amount = parse_gpu_request(json.loads(run["gpus"]))
+                        # Agents may still join, so only a local-only daemon gives up on a run
+                        if self.hub is None and not self.gpu_pool.can_fit(
+                            amount, mem_mb
+                        ):
+                            self.queue.finish(run["id"], "failed")
+                            self._log(
+                                f"run {run['run_key']} of job {run['job']} needs {amount} GPU(s)"
+                                + (f" with {mem_mb} MB" if mem_mb else "")
+                                + f"; only {len(self.gpu_pool)} available"
+                            )
+                            placed = True
+                            break
+                    where = self._place(amount, mem_mb)
+                    if where is None:
+                        # Backfill: let a run that fits now go first
+                        continue
+                    self._launch(run, *where)
+                    self._last_job = run["job"]
+                    placed = True
+                    break
+            if not placed:
+                with self._wake:
+                    self._wake.wait(timeout=1.0)
+
+    def _place(self, amount, mem_mb=None):
+        """
+        Reserve room for a run needing `amount` GPUs (None: no GPUs), with `mem_mb` to spare on
+        each if not None, where the most slots are free.
+        Returns (None, lease) for this host, (AgentLink, lease) for an agent, or None if nothing fits yet.
+        """
+        local_free = self.slots - self._busy
+        agents_first = self.hub is not None and self.hub.max_free() > local_free
+        for where in ("agents", "local") if agents_first else ("local", "agents"):
+            if where == "local" and local_free > 0:
+                lease = (
+                    None
+                    if amount is None
+                    else self.gpu_pool.try_lease(amount, mem_mb=mem_mb)
+                )
+                if amount is None or lease is not None:
+                    return None, lease
+            elif where == "agents" and self.hub is not None:
+                placed = self.hub.place(amount, mem_mb=mem_mb)
+                if placed is not None:
+                    return placed
+        return None
+
+    def _launch(self, run, link, lease):
+        self.queue.start(run["id"])
+        if link is None:
+            with self._wake:
+                self._busy += 1
+        t = threading.Thread(target=self._work, args=(run, lease, link), daemon=True)
+        self._threads = [x for x in self._threads if x.is_alive()] + [t]
+        t.start()
+
+    def _work(self, run, lease, link=None):
+        from .accounting import RunRecorder
+        from .agents import AgentLost
+        from .engine import OutputSettings, RunOptions, _execute_subprocess
+        from .journal import RunJournal
+        from .logstore import log_filename
+
+        status, exit_code = "failed", None
+        try:
+            job, handle = self._job(run["job"])
+            settings = job["settings"]
+            limits = json.loads(run["limits"]) if run.get("limits") else {}
+            args = json.loads(run["args"])
+            log_path = os.path.join(
+                job["run_dir"], log_filename(run["run_key"], settings.get("log_codec"))
+            )
+            journal = RunJournal(job["run_dir"])
+            journal.append("started", run=run["run_key"])
+
+            usage = {}
+            if link is None:
+                options = RunOptions(
+                    env=job["env"],
+                    env_extra=(
+                        {"CUDA_VISIBLE_DEVICES": lease.cuda_visible_devices}
+                        if lease
+                        else None
+                    ),
+                    timeout=limits.get("timeout"),
+                    idle_timeout=limits.get("idle_timeout"),
+                )
+                output = OutputSettings(
+                    echo=False,
+                    log_codec=settings.get("log_codec"),
+                    max_log_bytes=settings.get("max_log_bytes"),
+                )
+                exit_code = _execute_subprocess(
+                    json.loads(run["cmd"]),
+                    log_path,
+                    options,
+                    output,
+                    pool=handle,
+                    usage=usage,
+                )
+            else:
+                try:
+                    exit_code = self.hub.execute(
+                        link,
+                        lease,
+                        run["id"],
+                        json.loads(run["cmd"]),
+                        log_path,
+                        pool=handle,
+                        usage=usage,
+                        log_codec=settings.get("log_codec"),
+                        max_log_bytes=settings.get("max_log_bytes"),
+                        timeout=limits.get("timeout"),
+                        idle_timeout=limits.get("idle_timeout"),
+                    )
+                except AgentLost as e:
+                    self._log(f"run {run['run_key']} of job {run['job']} requeued: {e}")
+                    status = "pending"
+                    return
+                usage["host"] = link.name
+            if exit_code == 0:
+                status = "success"
+            elif self.stopping.is_set():
+                status = "pending"
+            elif handle.stopped.is_set():
+                status = "cancelled"
+            elif usage.get("timeout"):
+                status = "timeout"
+
+            if status != "pending":
+                journal.append(
+                    "finished", run=run["run_key"], status=status, exit_code=exit_code
+                )
+                RunRecorder(job["run_dir"]).add(
+                    {
+                        "run": run["run_key"],
+                        "exp": run["exp"],
+                        "args": args,
+                        "status": status,
+                        "exit_code": exit_code,
+                        **usage,
+                        "log": log_path,
+                    }
+                )
+        except Exception as e:
+            self._log(f"run {run['run_key']} of job {run['job']} crashed: {e}")
+        finally:
+            # Interrupted by a daemon shutdown: it runs again on the next start
+            if status == "pending":
+                self.queue.requeue(run["id"])
+            else:
+                self.queue.finish(run["id"], status, exit_code)
+                if status in ("failed", "timeout") and self._job(run["job"])[0][
+                    "settings"
+                ].get("fail_fast"):
+                    self.cancel(run["job"])
+            # Remote runs give their agent slot back in AgentHub.execute
+            if link is None:
+                self.gpu_pool.release(lease)
+                with self._wake:
+                    self._busy -= 1
+                    self._wake.notify_all()
+            else:
+                self.wake()
+
+    # -- Requests --
+
+    def _authorize_submit(self, uid):
+        """Refuse submissions this daemon could only run with its own privileges, root included."""
+        owner = os.geteuid()
+        if uid is None or uid == owner:
+            return
+        raise PermissionError(
+            f"This daemon runs as {_user_name(owner)} and only accepts jobs from that user "
+            f"(start a daemon of your own with `XSCHR_SOCKET=... xschr daemon`)."
+        )
+
+    def submit(self, request, uid=None):
+        """
+        Expand a config into queued runs. Paths in the config resolve against the submitter's cwd.
+        `uid` is the submitter as reported by the kernel; None means the daemon's own user.
+        """
+        from .config import _settings, iter_runs, load_and_validate, resolve_script_path
+        from .gpu_slots import parse_gpu_mem
+        from .watchdog import parse_duration
+
+        self._authorize_submit(uid)
+        uid = uid if uid is not None else os.geteuid()
+        cwd = request["cwd"]
+        if not os.path.isabs(cwd):
+            raise ValueError(f"'cwd' must be an absolute path, got '{cwd}'.")
+        # Both may be absolute paths anywhere: the request alone says nothing about who may write there
+        _check_owner(cwd, uid)
+        config_path = os.path.join(cwd, request["config"])
+        data, config_abs = load_and_validate(config_path)
+        conf = data.get("config", {})
+        python_cmd = conf.get("python_cmd", request.get("python") or sys.executable)
+        log_root = os.path.join(cwd, conf.get("log_dir", "logs"))
+        _check_owner(log_root, uid)
+        max_log_mb = conf.get("max_log_mb")
+        settings = {
+            "log_codec": conf.get("log_compress") or None,
+            "max_log_bytes": int(max_log_mb * 1024 * 1024) if max_log_mb else None,
+            "fail_fast": bool(request.get("fail_fast")),
+        }
+
+        # Refused rather than silently dropped
+        for key in _SESSION_ONLY:
+            for where, value in _settings(conf, data["experiments"], key):
+                if value is not None and value is not False:
+                    raise ValueError(
+                        f"'{where}' is not supported by the daemon; run this config with "
+                        f"`xschr -p` instead."
+                    )
+
+        runs = []
+        for exp_idx, exp in enumerate(data["experiments"]):
+            name = exp.get("name", f"exp_{exp_idx}")
+            safe_name = name.replace(" ", "_").replace("/", "-")
+            script_path = resolve_script_path(config_abs, exp["script"])
+            gpus = exp.get("gpus", conf.get("gpus_per_run"))
+            limits = {
+                key: exp.get(key, conf.get(key)) for key in ("timeout", "idle_timeout")
+            }
+            limits = {
+                key: parse_duration(value, key)
+                for key, value in limits.items()
+                if value is not None
+            }
+            if exp.get("gpu_mem") is not None:
+                limits["gpu_mem"] = parse_gpu_mem(exp["gpu_mem"])
+            for i, arg_list in enumerate(iter_runs(exp)):
+                runs.append(
+                    (
+                        f"{safe_name}_{i + 1}",
+                        name,
+                        arg_list,
+                        [python_cmd, script_path] + arg_list,
+                        json.dumps(gpus) if gpus is not None else None,
+                        limits,
+                    )
+                )
+
+        # Unique suffix: several configs can be submitted within the same second
+        import tempfile
+
+        from .journal import RunJournal
+
+        os.makedirs(log_root, exist_ok=True)
+        run_dir = tempfile.mkdtemp(
+            prefix=f"run_{datetime.now():%Y%m%d_%H%M%S}_", dir=log_root
+        )
+        os.chmod(run_dir, 0o755)
+        # The recorded user is who the kernel says called, not what the request claims
+        user = _user_name(uid)
+        RunJournal(run_dir).append("session", config=config_abs, user=user)
+
+        job_id = self.queue.add_job(
+            user, config_abs, run_dir, request.get("env") or {}, settings, runs, uid=uid
+        )
+        self.wake()
+        return {"job": job_id, "runs": len(runs), "run_dir": run_dir}
+
+    def cancel(self, job_id, uid=None):
+        """Cancel a job; `uid` (the caller, None for the daemon itself) must own it or be the daemon's user."""
+        if uid is not None and uid not in (os.geteuid(), 0):
+            job = self.queue.job(job_id)
+            if job is not None and job.get("uid") != uid:
+                raise PermissionError(f"Job {job_id} belongs to {job['user']}.")
+        if not self.queue.cancel(job_id):
+            return False
+        with self._lock:
+            handle = self._handles.get(job_id)
+        if handle is not None:
+            handle.cancel()
+        self.wake()
+        return True
+
+    def status(self, job_id=None):
+        return {
+            "slots": self.slots,
+            "busy": self._busy,
+            "gpus": len(self.gpu_pool),
+            "agents": self.hub.describe() if self.hub is not None else None,
+            "jobs": self.queue.summary(job_id),
+        }
+
+    def handle(self, request, uid=None):
+        """Answer one request from `uid` (the peer's uid; None for the daemon's own user)."""
+        op = request.get("op")
+        if op == "submit":
+            return self.submit(request, uid)
+        if op == "status":
+            return self.status(request.get("job"))
+        if op == "cancel":
+            if not self.cancel(request["job"], uid):
+                raise ValueError(f"Job {request['job']} is not queued or running.")
+            return {"job": request["job"]}
+        if op == "ping":
+            return {"pid": os.getpid()}
+        raise ValueError(f"Unknown request '{op}'.")
+
+    # -- Lifecycle --
+
+    def _log(self, message):
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+    def serve(self):
+        """Serve until SIGINT/SIGTERM, then stop dispatching and requeue the runs in flight."""
+        import signal
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    uid = peer_uid(self.request)
+                    request = json.loads(self.rfile.readline())
+                    reply = {"ok": True, **daemon.handle(request, uid)}
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        if os.path.exists(self.socket_path):
+            try:
+                request(self.socket_path, {"op": "ping"}, timeout=1)
+                raise RuntimeError(
+                    f"A daemon is already listening on {self.socket_path}"
+                )
+            except ConnectionError:
+                os.remove(self.socket_path)
+
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        server.daemon_threads = True
+        # Shared workstation: any local user may connect, requests are checked against the peer's uid.
+        # Without peer credentials the caller cannot be told apart: keep the socket to ourselves
+        import socket
+
+        os.chmod(self.socket_path, 0o666 if hasattr(socket, "SO_PEERCRED") else 0o600)
+
+        requeued = self.queue.recover()
+        self._log(
+            f"listening on {self.socket_path} with {self.slots} slot(s) and {len(self.gpu_pool)} GPU(s)"
+            + (f"; requeued {requeued} interrupted run(s)" if requeued else "")
+        )
+        if self.hub is not None:
+            self.hub.on_change = self.wake
+            self.hub.log = self._log
+            self.hub.start()
+            host, port = self.hub.address
+            self._log(f"waiting for agents on {host}:{port}")
+
+        def stop(signum, frame):
+            self.stopping.set()
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        dispatcher.start()
+        try:
+            server.serve_forever(poll_interval=0.5)
+        finally:
+            self.stopping.set()
+            self.wake()
+            if self.hub is not None:
+                self.hub.closing.set()
+            for handle in self._handles.values():
+                handle.cancel()
+            for t in self._threads:
+                t.join()
+            if self.hub is not None:
+                self.hub.close()
+            server.server_close()
+            os.remove(self.socket_path)
+            self.queue.close()
+            self._log("stopped")
+
+
+# --- Client ---
+
+
+def request(path, payload, timeout=30):
+    """Send one request to the daemon and return its reply. Raises ConnectionError if none is listening."""
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(
+                f"No xschr daemon listening on {path} (start one with `xschr daemon`)."
+            ) from e
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise ConnectionError(f"The daemon on {path} closed the connection.")
+    return json.loads(line)
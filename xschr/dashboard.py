@@ -0,0 +1,148 @@
+"""
+xschr.dashboard
+
+live console view of the runs in flight, redrawn at a fixed rate instead of echoing
+every line the runs print (the logs still get everything).
+
+On a terminal, a block at the bottom of the screen shows each running run's status,
+elapsed time, latest metrics and last output line, redrawn `rate` times per second.
+Scheduler messages (run started, ✓ Success, ...) scroll above it. When stdout is not a
+terminal (CI, `| tee`), a plain summary is printed every `summary_interval` seconds.
+"""
+
+import sys
+import time
+import shutil
+import threading
+
+class _RunState:
+    __slots__ = ('label', 'started', 'line', 'metrics')
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.monotonic()
+        self.line = ""
+        self.metrics = {}
+
+def _elapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def _metric_text(metrics, limit=3):
+    return " ".join(f"{name}={value:.4g}" for name, value in list(metrics.items())[:limit])
+
+class Dashboard:
+    """
+    Tracks the runs in flight and renders them from a background thread.
+    The engine reports runs with start/update/finish and prints messages with write.
+    """
+    def __init__(self, total=None, terminal=None, rate=10.0, summary_interval=10.0, stream=None):
+        self.stream = stream or sys.stdout
+        self.terminal = self.stream.isatty() if terminal is None else terminal
+        self.total = total
+        self.interval = 1.0 / rate if self.terminal else summary_interval
+        self.finished = {}   # status -> count
+        self._runs = {}      # run key -> _RunState, in start order
+        self._drawn = 0      # lines of the live block currently on screen
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop redrawing and remove the live block."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            self._clear()
+            self.stream.flush()
+
+    # -- Reporting (any thread) --
+
+    def run_started(self, key, label):
+        with self._lock:
+            self._runs[key] = _RunState(label)
+
+    def update(self, key, line=None, metrics=None):
+        """Latest output line and/or metric values of a run; older lines are simply replaced."""
+        state = self._runs.get(key)
+        if state is None:
+            return
+        if line is not None:
+            state.line = line
+        if metrics:
+            state.metrics = metrics
+
+    def run_finished(self, key, status):
+        with self._lock:
+            self._runs.pop(key, None)
+            # A retried run goes back to the queue: it is not finished yet
+            if status != 'retried':
+                self.finished[status] = self.finished.get(status, 0) + 1
+
+    def write(self, text):
+        """Print scheduler output above the live block."""
+        with self._lock:
+            self._clear()
+            self.stream.write(text)
+            self._draw()
+            self.stream.flush()
+
+    # -- Rendering --
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if self.terminal:
+                    self._clear()
+                    self._draw()
+                else:
+                    self._summary()
+                self.stream.flush()
+
+    def _counts(self):
+        done = sum(self.finished.values())
+        text = f"{len(self._runs)} running, {done}{f'/{self.total}' if self.total else ''} finished"
+        problems = [f"{self.finished[s]} {s}" for s in ('failed', 'timeout', 'cancelled', 'stopped') if self.finished.get(s)]
+        return text + (f" ({', '.join(problems)})" if problems else "")
+
+    def _rows(self, width):
+        now = time.monotonic()
+        rows = []
+        for state in list(self._runs.values()):
+            row = f"  {state.label[:24]:<24} {_elapsed(now - state.started):>8}"
+            metrics = _metric_text(state.metrics)
+            if metrics:
+                row += f"  {metrics}"
+            row += f"  | {state.line}"
+            rows.append(row[:width - 1])
+        return rows
+
+    def _draw(self):
+        if not self.terminal:
+            return
+        width, height = shutil.get_terminal_size()
+        rows = self._rows(width)
+        # Keep the block on screen; the counts line tells how many are hidden
+        hidden = max(0, len(rows) - (height - 3))
+        if hidden:
+            rows = rows[:len(rows) - hidden] + [f"  ... {hidden} more"]
+        block = [f"\033[1m[Live]\033[0m {self._counts()}"[:width + 7]] + rows
+        self.stream.write("\n".join(block) + "\n")
+        self._drawn = len(block)
+
+    def _clear(self):
+        if self.terminal and self._drawn:
+            # Up to the first line of the block, then erase to the end of the screen
+            self.stream.write(f"\033[{self._drawn}F\033[J")
+            self._drawn = 0
+
+    def _summary(self):
+        lines = [f"[{time.strftime('%H:%M:%S')}] {self._counts()}"]
+        lines += self._rows(200)
+        self.stream.write("\n".join(lines) + "\n")
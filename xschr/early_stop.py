@@ -0,0 +1,150 @@
+"""
+xschr.early_stop
+
+early stopping of unpromising runs within an experiment, driven by extracted metrics.
+
+    scheduler: asha                # shorthand: asha on `loss`, lower is better
+
+    scheduler:
+      type: asha                   # asha | median
+      metric: loss                 # metric compared between runs
+      mode: min                    # min | max
+      progress: epoch              # progress axis (default: number of `metric` reports)
+      grace: 1                     # never stop a run before this much progress
+      reduction: 3                 # asha: keep the best 1/reduction at each rung
+      min_runs: 3                  # median: runs needed at a checkpoint before comparing
+
+asha (asynchronous successive halving) places rungs at grace * reduction^k; a run
+reaching a rung is stopped unless its value is within the best 1/reduction of the
+values recorded at that rung so far. median stops a run whose best value so far is
+worse than the median of the other runs' best values at the same progress.
+"""
+
+import threading
+
+SCHEDULERS = ('asha', 'median')
+
+_DEFAULTS = {'metric': 'loss', 'mode': 'min', 'progress': None, 'grace': 1, 'reduction': 3, 'min_runs': 3}
+
+def parse_scheduler(spec):
+    """Normalize a `scheduler:` value into EarlyStopper keyword arguments. Raises ValueError."""
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    if not isinstance(spec, dict):
+        raise ValueError("'scheduler' must be asha, median or a mapping with a 'type'.")
+    unknown = set(spec) - set(_DEFAULTS) - {'type'}
+    if unknown:
+        raise ValueError(f"unknown scheduler option(s): {', '.join(sorted(unknown))}.")
+
+    opts = {**_DEFAULTS, **spec}
+    if opts.get('type') not in SCHEDULERS:
+        raise ValueError(f"scheduler type must be one of: {', '.join(SCHEDULERS)} (got {opts.get('type')!r}).")
+    if not isinstance(opts['metric'], str):
+        raise ValueError("scheduler 'metric' must be a metric name.")
+    if opts['progress'] is not None and not isinstance(opts['progress'], str):
+        raise ValueError("scheduler 'progress' must be a metric name.")
+    if opts['mode'] not in ('min', 'max'):
+        raise ValueError(f"scheduler 'mode' must be min or max (got {opts['mode']!r}).")
+    for key, low in (('grace', 0), ('reduction', 2), ('min_runs', 1)):
+        value = opts[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < low:
+            raise ValueError(f"scheduler '{key}' must be a number >= {low} (got {value!r}).")
+    return opts
+
+def describe(opts):
+    """One-line summary for the plan output."""
+    target = f"{opts['metric']} ({opts['mode']})"
+    axis = opts['progress'] or f"{opts['metric']} reports"
+    if opts['type'] == 'asha':
+        return f"asha on {target}, rungs every x{opts['reduction']} {axis} from {opts['grace']}"
+    return f"median stopping on {target} per {axis} from {opts['grace']}"
+
+def _percentile(values, q):
+    """Linear-interpolated percentile of a sorted list (q in [0, 1])."""
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+class EarlyStopper:
+    """Shared state of one experiment's runs. Thread-safe; each run reports through its own `trial`."""
+    def __init__(self, type, metric='loss', mode='min', progress=None, grace=1, reduction=3, min_runs=3):
+        self.type = type
+        self.metric = metric
+        self.sign = 1 if mode == 'min' else -1
+        self.progress = progress
+        self.grace = grace
+        self.reduction = reduction
+        self.min_runs = min_runs
+        self._lock = threading.Lock()
+        self._rungs = {}        # asha: rung index -> [signed values]
+        self._checkpoints = {}  # median: progress -> {run_key: signed best so far}
+
+    def trial(self, run_key):
+        return _Trial(self, run_key)
+
+    def _rung_level(self, k):
+        return self.grace * self.reduction ** k
+
+    def _asha(self, trial, progress, value):
+        while progress >= self._rung_level(trial.rung):
+            recorded = self._rungs.setdefault(trial.rung, [])
+            recorded.append(value)
+            cutoff = _percentile(sorted(recorded), 1 / self.reduction)
+            level = self._rung_level(trial.rung)
+            trial.rung += 1
+            if value > cutoff:
+                return f"not in the best 1/{self.reduction} at {self._axis()} {level:g}"
+        return None
+
+    def _median(self, trial, progress, value):
+        if progress < self.grace:
+            return None
+        best = min(trial.best, value) if trial.best is not None else value
+        trial.best = best
+        others = self._checkpoints.setdefault(progress, {})
+        peers = sorted(v for k, v in others.items() if k != trial.run_key)
+        others[trial.run_key] = best
+        if len(peers) >= self.min_runs:
+            median = _percentile(peers, 0.5)
+            if best > median:
+                return f"worse than the median of {len(peers)} run(s) at {self._axis()} {progress:g}"
+        return None
+
+    def _axis(self):
+        return self.progress or f"{self.metric} report"
+
+    def _decide(self, trial, progress, value):
+        with self._lock:
+            if self.type == 'asha':
+                return self._asha(trial, progress, value)
+            return self._median(trial, progress, value)
+
+class _Trial:
+    """One run's view of the stopper; `report` is the MetricExtractor listener."""
+    def __init__(self, stopper, run_key):
+        self.stopper = stopper
+        self.run_key = run_key
+        self.rung = 0
+        self.best = None
+        self.reports = 0
+        self.progress = None
+        self.reason = None
+
+    def report(self, values):
+        """Take the values of one metric line; returns True once the run should be stopped."""
+        stopper = self.stopper
+        if self.reason is not None:
+            return True
+        if stopper.progress is not None and stopper.progress in values:
+            self.progress = values[stopper.progress]
+        if stopper.metric not in values:
+            return False
+
+        self.reports += 1
+        progress = self.progress if stopper.progress is not None else self.reports
+        value = values[stopper.metric] * stopper.sign
+        if progress is None or value != value:
+            return False
+        self.reason = stopper._decide(self, progress, value)
+        return self.reason is not None
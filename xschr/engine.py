@@ -1,147 +1,1566 @@
-import sys
+import codecs
+import math
 import os
-import time
+import selectors
 import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from .config import resolve_script_path
 
-def run_sequence(experiments, config_path, python_cmd, log_root, fail_fast=False, dry_run=False):
+from .accounting import ProcessTreeSampler, RunRecorder, summarize, wait_with_rusage
+from .config import count_runs, iter_runs, resolve_script_path
+from .cpu_slots import (
+    CpuSlotPool,
+    detect_cpu_topology,
+    format_cpulist,
+    parse_cpu_request,
+)
+from .early_stop import EarlyStopper, describe, parse_scheduler
+from .gpu_slots import GpuSlotPool, parse_gpu_mem, parse_gpu_request
+from .history import DurationHistory, format_duration, predict_makespan
+from .journal import DONE_STATUSES, FAILED_STATUSES, RunJournal, replay
+from .logstore import log_filename, open_log
+from .metrics import MetricExtractor, compile_patterns, series_dir
+from .retry import RetryPolicy
+from .retry import describe as describe_retry
+from .retry import parse_retry
+from .staging import StageArea, parse_stage
+from .watchdog import Watchdog, own_group, parse_duration, stop_group
+
+# Output pipeline tuning
+_CHUNK_SIZE = 1 << 16
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Largest queue that is estimated (and, for LPT ordering, materialized and sorted);
+# bigger sweeps stream in file order without an estimate
+_PLAN_LIMIT = 100_000
+
+# Duration markers in a plan: no estimate yet, and a run that will not execute
+_UNKNOWN = float("nan")
+_SKIPPED = -1.0
+
+# Serializes console writes so lines from concurrent runs never interleave mid-line
+_console_lock = threading.Lock()
+
+# Live dashboard of the running queue, if any; console writes then scroll above it
+_dashboard = None
+
+# Enforces run timeouts; shared by every queue in the process
+_watchdog = Watchdog()
+
+# --- Settings ---
+
+
+@dataclass
+class OutputSettings:
+    """Where run output goes: the console (`echo`) and the run logs, and how those are written."""
+
+    echo: bool = True
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL
+    log_codec: str = None  # 'gzip' or 'zstd' (see xschr.logstore)
+    max_log_bytes: int = None  # cap per log, keeping its head and tail
+
+
+@dataclass
+class RunOptions:
+    """How _execute_subprocess starts and supervises one run."""
+
+    label: str = None  # console prefix (parallel mode)
+    key: str = None  # the run's line on the dashboard
+    env: dict = None  # base child environment (default: our own)
+    env_extra: dict = None  # merged into it (e.g. CUDA_VISIBLE_DEVICES)
+    affinity: tuple = None  # core ids to pin the child to as soon as it is spawned
+    # Replaces subprocess.Popen (e.g. a warm-start template's spawn)
+    launcher: object = None
+    timeout: float = None  # seconds; the watchdog stops the run's process group
+    idle_timeout: float = None  # seconds without output
+
+
+@dataclass
+class SessionSettings:
+    """Everything run_sequence does besides running the experiments; see its docstring."""
+
+    jobs: int = 1
+    fail_fast: bool = False
+    dry_run: bool = False
+    plan_limit: int = None
+    order: str = "auto"
+    console: str = "lines"
+    is_terminal: bool = None
+    output: OutputSettings = field(default_factory=OutputSettings)
+    cache: object = None
+    cache_mode: str = "use"
+    resume_dir: str = None
+    retry_failed: bool = False
+    gpus_per_run: object = None
+    gpu_devices: list = None
+    cpus_per_run: object = None
+    cpu_affinity: bool = True
+    cpu_nodes: list = None
+    metrics: object = None
+    scheduler: object = None
+    timeouts: dict = None
+    retry: object = None
+    tracer: object = None
+
+
+def _echo(text):
+    """Write text to the console atomically."""
+    if _dashboard is not None:
+        _dashboard.write(text)
+        return
+    with _console_lock:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class _WorkerPool:
+    """
+    Bounded pool of worker threads, one per in-flight run.
+    Each worker only blocks on its own child process, so threads are enough to keep N runs busy.
+    """
+
+    def __init__(
+        self,
+        settings,
+        stats,
+        gpu_pool=None,
+        cpu_pool=None,
+        journal=None,
+        recorder=None,
+        history=None,
+    ):
+        self.size = settings.jobs
+        self.fail_fast = settings.fail_fast
+        self.stats = stats
+        self.gpu_pool = gpu_pool
+        self.cpu_pool = cpu_pool
+        self.output = settings.output
+        self.cache = settings.cache
+        self.journal = journal
+        self.recorder = recorder
+        self.history = history
+        self.tracer = settings.tracer
+        self.dashboard = None
+        self.stopped = threading.Event()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._slot_ids = list(
+            range(self.size)
+        )  # free slot numbers, for the trace timeline
+        self._procs = set()
+        self._threads = []
+        self._active = 0  # runs submitted and not finished yet
+        self._retries = []  # next attempts of failed runs, for the dispatcher
+        self._retry_cond = threading.Condition(self._lock)
+
+    def acquire(self):
+        """Block until a worker slot is free. Returns False if the queue has been stopped."""
+        # Poll with a timeout so Ctrl+C is still delivered to the main thread
+        while not self._slots.acquire(timeout=0.2):
+            pass
+        if self.stopped.is_set():
+            self._slots.release()
+            return False
+        return True
+
+    def release(self):
+        """Give back a slot that was acquired but never used."""
+        self._slots.release()
+
+    def submit(self, task):
+        """
+        Start a run on a previously acquired slot.
+        `task` holds: run_key, exp, args, cmd, log_path, label and optionally gpu_lease, cpu_lease, cache_key, launcher
+        metrics (compiled patterns; extraction is off when None), stopper (an EarlyStopper), and
+        retry (a RetryPolicy) with what a next attempt needs: ctx, index, attempt, gpu_amount, gpu_mem.
+        stage (a StageArea) is released by the run when it ends.
+        """
+        with self._lock:
+            task["slot"] = self._slot_ids.pop(0)
+            self._active += 1
+        if self.tracer is not None:
+            lease, cpu_lease = task.get("gpu_lease"), task.get("cpu_lease")
+            self.tracer.event(
+                "leased",
+                run=task["run_key"],
+                slot=task["slot"],
+                gpus=lease.visible_devices if lease else None,
+                cpus=cpu_lease.cpulist if cpu_lease else None,
+            )
+        if self.size == 1:
+            # Sequential mode: run inline to keep the classic console behaviour
+            self._work(task)
+            return
+        t = threading.Thread(target=self._work, args=(task,), daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def record(self, key):
+        """Increment a stats counter."""
+        with self._lock:
+            self.stats[key] += 1
+
+    def register(self, process):
+        """Track a live child. Returns False if the queue was stopped before it started."""
+        with self._lock:
+            if self.stopped.is_set():
+                return False
+            self._procs.add(process)
+            return True
+
+    def unregister(self, process):
+        with self._lock:
+            self._procs.discard(process)
+
+    def cancel(self):
+        """Stop dispatching and terminate every in-flight run (with its process group, SIGKILL after a grace period)."""
+        with self._lock:
+            self.stopped.set()
+            procs = list(self._procs)
+        for p in procs:
+            stop_group(p, own_group(p))
+
+    def next_retry(self, wait=False):
+        """
+        The next attempt of a failed run whose backoff has passed, or None.
+        With `wait`, block until one is due; None then means nothing can ask for a retry anymore.
+        """
+        with self._retry_cond:
+            while not self.stopped.is_set():
+                now = time.monotonic()
+                due = [r for r in self._retries if r["not_before"] <= now]
+                if due:
+                    retry = min(due, key=lambda r: r["not_before"])
+                    self._retries.remove(retry)
+                    return retry
+                if not wait or (not self._retries and not self._active):
+                    return None
+                # Short waits keep Ctrl+C responsive in the main thread
+                soonest = min(
+                    (r["not_before"] - now for r in self._retries), default=0.2
+                )
+                self._retry_cond.wait(timeout=min(max(soonest, 0.01), 0.2))
+            return None
+
+    def abandon_retries(self):
+        """Drop the attempts that were still waiting (the queue stopped); returns them."""
+        with self._lock:
+            retries, self._retries = self._retries, []
+        for retry in retries:
+            if retry["stage"] is not None:
+                retry["stage"].release()
+        return retries
+
+    def _plan_retry(self, task, status, exit_code):
+        """The next attempt of a failed run if its retry policy asks for one, queued for the dispatcher."""
+        policy = task.get("retry")
+        attempt = task.get("attempt", 1)
+        # A resumed rerun gets the policy's attempts afresh
+        tries = attempt - task.get("first_attempt", 1) + 1
+        if policy is None or tries >= policy.attempts or self.stopped.is_set():
+            return None
+        verdict = policy.classify(status, exit_code, task["log_path"])
+        if verdict is None:
+            return None
+        kind, reason = verdict
+        amount, mem_mb = task.get("gpu_amount"), task.get("gpu_mem")
+        if kind == "oom" and amount is not None:
+            # More room this time: a whole card, and more declared memory
+            amount, mem_mb = policy.oom_placement(
+                amount, mem_mb, self.gpu_pool.largest_mb()
+            )
+        delay = policy.delay(attempt + 1)
+        # Keep the staged inputs around for the next attempt
+        stage = task.get("stage")
+        if stage is not None:
+            stage.acquire()
+        retry = {
+            "stage": stage,
+            "ctx": task["ctx"],
+            "index": task["index"],
+            "args": task["args"],
+            "attempt": attempt + 1,
+            "first_attempt": task.get("first_attempt", 1),
+            "gpu_amount": amount,
+            "gpu_mem": mem_mb,
+            "kind": kind,
+            "reason": reason,
+            "status": status,
+            "delay": delay,
+            "not_before": time.monotonic() + delay,
+        }
+        with self._retry_cond:
+            self._retries.append(retry)
+            self._retry_cond.notify_all()
+        return retry
+
+    def join(self):
+        """Wait for all in-flight runs to finish."""
+        try:
+            for t in self._threads:
+                while t.is_alive():
+                    t.join(timeout=0.2)
+        except KeyboardInterrupt:
+            self.cancel()
+            raise
+
+    def _journal(self, event, **fields):
+        if self.journal is not None:
+            self.journal.append(event, **fields)
+
+    def _work(self, task):
+        label = task["label"] if self.size > 1 else None
+        prefix = f"[{label}] " if label else ""
+        lease = task.get("gpu_lease")
+        cpu_lease = task.get("cpu_lease")
+        env_extra = (
+            {"CUDA_VISIBLE_DEVICES": lease.cuda_visible_devices} if lease else {}
+        )
+        if cpu_lease is not None:
+            # Size BLAS/OpenMP pools to the lease, unless the user already chose a thread count
+            env_extra.update(
+                {k: v for k, v in cpu_lease.thread_env().items() if k not in os.environ}
+            )
+        stage = task.get("stage")
+        if stage is not None:
+            env_extra[stage.env] = stage.path
+        extractor = trial = on_event = None
+        if self.tracer is not None:
+            on_event = lambda name, **args: self.tracer.event(
+                name, run=task["run_key"], slot=task["slot"], **args
+            )
+        if task.get("metrics") is not None:
+            if task.get("stopper") is not None:
+                trial = task["stopper"].trial(task["run_key"])
+            extractor = MetricExtractor(
+                task["metrics"],
+                series_dir(os.path.dirname(task["log_path"]), task["run_key"]),
+                listener=trial.report if trial else None,
+            )
+        if self.dashboard is not None:
+            self.dashboard.run_started(task["run_key"], task["label"])
+        status = "failed"
+        try:
+            self._journal("started", run=task["run_key"])
+            started = time.monotonic()
+            usage = {}
+            options = RunOptions(
+                label=label,
+                key=task["run_key"],
+                env_extra=env_extra or None,
+                affinity=cpu_lease.cores if cpu_lease else None,
+                launcher=task.get("launcher"),
+                timeout=task.get("timeout"),
+                idle_timeout=task.get("idle_timeout"),
+            )
+            exit_code = _execute_subprocess(
+                task["cmd"],
+                task["log_path"],
+                options,
+                self.output,
+                pool=self,
+                usage=usage,
+                metrics=extractor,
+                on_event=on_event,
+                dashboard=self.dashboard,
+            )
+            success = exit_code == 0
+
+            if success:
+                status = "success"
+                _echo(f"     {prefix}\033[92m✓ Success\033[0m\n")
+                if self.history is not None and "wall_s" in usage:
+                    self.history.record(
+                        task["exp"], task["cmd"][1], task["args"], usage["wall_s"]
+                    )
+                if self.cache is not None and task.get("cache_key"):
+                    try:
+                        self.cache.record(
+                            task["cache_key"],
+                            task["cmd"],
+                            task["log_path"],
+                            time.monotonic() - started,
+                        )
+                    except OSError as e:
+                        _echo(
+                            f"     {prefix}\033[93m[Cache] Could not record result: {e}\033[0m\n"
+                        )
+            elif usage.get("timeout"):
+                status = "timeout"
+                _echo(f"     {prefix}\033[91m⏱ Timed out\033[0m ({usage['timeout']})\n")
+            elif trial is not None and trial.reason:
+                status = "stopped"
+                _echo(f"     {prefix}\033[93m⊘ Stopped early\033[0m ({trial.reason})\n")
+            elif self.stopped.is_set():
+                status = "cancelled"
+                _echo(f"     {prefix}\033[93m⊘ Cancelled\033[0m\n")
+            else:
+                status = "failed"
+                _echo(f"     {prefix}\033[91m✗ Failed\033[0m\n")
+
+            retry = (
+                self._plan_retry(task, status, exit_code)
+                if status in ("failed", "timeout")
+                else None
+            )
+            if retry is not None:
+                status = "retried"
+                wait = (
+                    f" in {format_duration(retry['delay'])}" if retry["delay"] else ""
+                )
+                last = retry["first_attempt"] + task["retry"].attempts - 1
+                _echo(
+                    f"     {prefix}\033[93m↻ Retry {retry['attempt']}/{last}{wait}\033[0m "
+                    f"({retry['reason']})\n"
+                )
+
+            self.record(status)
+            if retry is not None:
+                self._journal(
+                    "retry",
+                    run=task["run_key"],
+                    attempt=retry["attempt"],
+                    reason=retry["reason"],
+                    exit_code=exit_code,
+                )
+            elif task.get("attempt", 1) > 1:
+                self._journal(
+                    "finished",
+                    run=task["run_key"],
+                    status=status,
+                    exit_code=exit_code,
+                    attempt=task["attempt"],
+                )
+            else:
+                self._journal(
+                    "finished", run=task["run_key"], status=status, exit_code=exit_code
+                )
+            if on_event is not None:
+                on_event("finished", status=status, exit_code=exit_code)
+            if self.recorder is not None:
+                record = {
+                    "run": task["run_key"],
+                    "exp": task["exp"],
+                    "args": task["args"],
+                    "status": status,
+                    "exit_code": exit_code,
+                    **usage,
+                    "log": task["log_path"],
+                }
+                if extractor is not None:
+                    record["metrics"] = extractor.close()
+                if status == "stopped":
+                    record["stop_reason"] = trial.reason
+                if task.get("attempt", 1) > 1:
+                    record["attempt"] = task["attempt"]
+                if retry is not None:
+                    record["retry_reason"] = retry["reason"]
+                self.recorder.add(record)
+
+            if (
+                status in ("failed", "timeout")
+                and self.fail_fast
+                and not self.stopped.is_set()
+            ):
+                _echo("\n\033[93m[!] Fail-fast triggered. Stopping queue.\033[0m\n")
+                self.cancel()
+        finally:
+            if self.dashboard is not None:
+                self.dashboard.run_finished(task["run_key"], status)
+            if self.gpu_pool is not None:
+                self.gpu_pool.release(lease)
+            if self.cpu_pool is not None:
+                self.cpu_pool.release(cpu_lease)
+            if stage is not None:
+                stage.release()
+            with self._lock:
+                self._slot_ids.append(task["slot"])
+                self._slot_ids.sort()
+                self._active -= 1
+                self._retry_cond.notify_all()
+            self._slots.release()
+
+
+def run_sequence(experiments, config_path, python_cmd, log_root, settings=None):
     """
     The main execution loop. Iterates through experiments and runs, managing subprocesses and logs.
+    `settings` (a SessionSettings) holds the options below; the defaults run in order with no extras.
+    Up to `jobs` runs are executed concurrently; with jobs=1 runs execute strictly in order.
+    With `fail_fast`, the first failure stops the queue; `dry_run` only lists the runs.
+
+    Experiments that declare `gpus` (or inherit `gpus_per_run`) lease device shares from a
+    slot pool built from `gpu_devices` (detected via the CUDA driver when None). Experiments
+    that also declare `gpu_mem` are only admitted onto a device with that much memory to
+    spare, judged from live NVML readings when the devices were detected here.
+
+    With cpu_affinity (the default) and jobs > 1, or when an experiment declares `cpus`
+    (or inherits `cpus_per_run`), each run leases a disjoint set of cores from `cpu_nodes`
+    (the NUMA layout from /sys when None): it is pinned to them and its BLAS/OpenMP thread
+    counts are set to match. Runs without `cpus` get an equal share of the cores.
+
+    With output.echo=False child output goes only to the log files; output.flush_interval
+    bounds how stale a log may be while its run is still writing. With console='dashboard' runs
+    are shown in a live view redrawn at a fixed rate (plain periodic summaries when
+    `is_terminal` is false) rather than line by line; 'auto' picks it when jobs > 1.
+
+    `cache` (a RunCache) skips runs whose fingerprint already succeeded. cache_mode is
+    'use' (skip + record), 'refresh' (run everything, record) or 'check' (report only).
+
+    Every state change is written to an fsync'd journal in the run directory. With
+    `resume_dir`, that directory is reused and runs the journal marks as done are skipped;
+    runs that failed or timed out count as done unless `retry_failed`. A rerun continues
+    the run's attempt numbering (each attempt keeps its log) with a fresh retry budget.
+
+    Runs (including `sweep:` expansions) are streamed one at a time; a dry run lists at
+    most `plan_limit` runs per experiment without expanding the rest.
+
+    Run durations are remembered per script + args (see xschr.history) to predict the
+    makespan. `order` is 'file', 'lpt' (longest estimated run first) or 'auto' (lpt when
+    jobs > 1); experiments with a `priority` are dispatched first either way.
+
+    Experiments with `warm_start: true` fork their runs from a template interpreter that
+    has already imported the experiment's `preload` modules.
+
+    output.log_codec ('gzip' or 'zstd') compresses run logs in indexed frames and
+    output.max_log_bytes caps each log, keeping its head and tail (see xschr.logstore).
+
+    `metrics` (true, or a list of regexes; experiments may override it) turns on metric
+    extraction from run output into per-run column files and runs.jsonl (see xschr.metrics).
+    `scheduler` (e.g. 'asha'; experiments may override it) stops runs whose metrics fall
+    behind their peers, freeing the slot for the next queued run (see xschr.early_stop).
+
+    `timeouts` ({'timeout', 'idle_timeout'}; experiments may override either) stop runs
+    that take too long or go quiet, with their whole process group (see xschr.watchdog).
+    `retry` (experiments may override it) runs failed attempts again when they ran out of
+    memory or match its exit codes / log patterns, after a backoff and in their own log;
+    out-of-memory retries get a whole card and more memory (see xschr.retry).
+
+    Experiments with `stage:` have their input files copied once to /dev/shm (or scratch)
+    when dispatch reaches them; runs get the directory in $XSCHR_STAGE_DIR and it is removed
+    after the experiment's last run (see xschr.staging).
+
+    `tracer` (an xschr.trace.Tracer) receives a timeline of scheduler events, which is also
+    written to trace.json in the run directory.
     """
-    
+
+    settings = settings or SessionSettings()
+    fail_fast, dry_run, cache, cache_mode = (
+        settings.fail_fast,
+        settings.dry_run,
+        settings.cache,
+        settings.cache_mode,
+    )
+    resume_dir, retry_failed, tracer = (
+        settings.resume_dir,
+        settings.retry_failed,
+        settings.tracer,
+    )
+    gpus_per_run, cpus_per_run, gpu_devices = (
+        settings.gpus_per_run,
+        settings.cpus_per_run,
+        settings.gpu_devices,
+    )
+    echo = settings.output.echo
+
     # 1. Setup Logging Directory
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    run_dir = os.path.join(log_root, f"run_{timestamp}")
-    
+    done_statuses = DONE_STATUSES
+    if resume_dir:
+        run_dir = resume_dir
+        previous = replay(run_dir)["runs"]
+        if retry_failed:
+            done_statuses = tuple(s for s in DONE_STATUSES if s not in FAILED_STATUSES)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_dir = os.path.join(log_root, f"run_{timestamp}")
+        previous = {}
+    jobs = max(1, int(settings.jobs))
+
     # 2. Calculate Stats for the Plan
     total_experiments = len(experiments)
-    total_runs = sum(len(exp.get('runs', [])) for exp in experiments)
-    
+    total_runs = sum(count_runs(exp) for exp in experiments)
+
     print(f"\n[Plan]")
     print(f"  • Config:  {config_path}")
     print(f"  • Output:  {run_dir}")
-    print(f"  • Task:    Running {total_runs} jobs across {total_experiments} experiments")
+    print(
+        f"  • Task:    Running {total_runs} jobs across {total_experiments} experiments"
+    )
+    if jobs > 1:
+        print(f"  • Workers: {jobs} runs in parallel")
+    if resume_dir:
+        done = sum(1 for r in previous.values() if r["status"] in done_statuses)
+        failed = sum(1 for r in previous.values() if r["status"] in FAILED_STATUSES)
+        note = (
+            (
+                f", {failed} failed run(s) to run again"
+                if retry_failed
+                else f" ({failed} failed; --retry-failed runs them again)"
+            )
+            if failed
+            else ""
+        )
+        print(f"  • Resume:  {done} run(s) already finished in this directory{note}")
+
+    # GPU slot pool, only built when some experiment asks for devices
+    gpu_pool = None
+    if gpus_per_run is not None or any(
+        exp.get("gpus") is not None for exp in experiments
+    ):
+        memory_probe = None
+        if gpu_devices is None:
+            from .system import get_hardware_inventory
+
+            gpu_devices = get_hardware_inventory()["gpus"]
+            if any(exp.get("gpu_mem") is not None for exp in experiments):
+                from .cuda_devices import device_status
+
+                memory_probe = lambda: device_status(gpu_devices)
+        gpu_pool = GpuSlotPool(gpu_devices, memory_probe=memory_probe)
+        print(
+            f"  • GPUs:    {len(gpu_pool)} device(s) in slot pool"
+            + (", memory-aware admission" if memory_probe else "")
+        )
+
+    # CPU slot pool: concurrent runs get disjoint cores instead of oversubscribing them all
+    cpu_pool = None
+    if settings.cpu_affinity and (
+        jobs > 1
+        or cpus_per_run is not None
+        or any(exp.get("cpus") is not None for exp in experiments)
+    ):
+        cpu_pool = CpuSlotPool(
+            settings.cpu_nodes
+            if settings.cpu_nodes is not None
+            else detect_cpu_topology()
+        )
+        pinned = (
+            "pinned"
+            if hasattr(os, "sched_setaffinity")
+            else "thread counts only, no pinning here"
+        )
+        print(
+            f"  • CPUs:    {len(cpu_pool)} core(s) across {len(cpu_pool.nodes)} NUMA node(s) ({pinned})"
+        )
+
+    # Dispatch order: longest expected run first (LPT) keeps one late straggler from
+    # stretching a parallel sweep; experiment `priority` always comes first
+    contexts = [
+        _experiment_context(idx, exp, config_path, settings)
+        for idx, exp in enumerate(experiments)
+    ]
+    if cpu_pool is not None and len(cpu_pool) >= jobs:
+        # More workers than cores: unpinned runs would only be serialized by the pool
+        for ctx in contexts:
+            if ctx["cpu_amount"] is None:
+                ctx["cpu_amount"] = len(cpu_pool) // jobs
+    order, console = settings.order, settings.console
+    if order == "auto":
+        order = "lpt" if jobs > 1 else "file"
+    if console == "auto":
+        console = "dashboard" if jobs > 1 else "lines"
+    ordered = order == "lpt" or any(ctx["priority"] for ctx in contexts)
+    history = DurationHistory(log_root)
+    queue = None
+    if ordered and total_runs > _PLAN_LIMIT:
+        print(f"  • Order:   file order (more than {_PLAN_LIMIT} runs to sort)")
+        ordered = False
+    elif ordered or (total_runs <= _PLAN_LIMIT and len(history)):
+
+        def pending(ctx, i, arg_list):
+            """Whether a run will execute: not done in the resumed session, nor a cache hit."""
+            earlier = previous.get(f"{ctx['safe_name']}_{i + 1}")
+            if (
+                earlier
+                and earlier["status"] in done_statuses
+                and earlier["args"] == arg_list
+            ):
+                return False
+            if cache is not None and cache_mode != "refresh" and ctx["exists"]:
+                return (
+                    cache.lookup(
+                        cache.key_for(ctx["script_path"], arg_list, python_cmd),
+                        touch=False,
+                    )
+                    is None
+                )
+            return True
+
+        queue, summary = _plan_queue(contexts, history, ordered, jobs, pending)
+        if summary["makespan"] is not None:
+            sources = summary["sources"]
+            skipped = (
+                f", {summary['skipped']} done or cached" if summary["skipped"] else ""
+            )
+            print(
+                f"  • Estimate: ~{format_duration(summary['makespan'])} with {jobs} worker(s) "
+                f"({sources['run']} from history, {sources['experiment']} from experiment averages, "
+                f"{sources[None]} unknown{skipped})"
+            )
+    if ordered:
+        print(
+            f"  • Order:   {'priority, then ' if any(ctx['priority'] for ctx in contexts) else ''}"
+            f"longest estimated run first"
+        )
+    if queue is None:
+        queue = _file_order(contexts)
+
+    # Cache check is a dry run that also reports hits
+    check_only = cache is not None and cache_mode == "check"
+    preview = dry_run or check_only
 
     # 3. Safety Confirmation
-    if not dry_run:
+    if not preview:
         try:
             # Flush stdout to ensure prompt appears before input
-            sys.stdout.write("\nPress ENTER to start the experiments (or Ctrl+C to abort)...")
+            sys.stdout.write(
+                "\nPress ENTER to start the experiments (or Ctrl+C to abort)..."
+            )
             sys.stdout.flush()
             input()
-            
+
             # Create directory only after confirmation
             os.makedirs(run_dir, exist_ok=True)
         except KeyboardInterrupt:
             print("\nAborted.")
             sys.exit(0)
 
-    stats = {'success': 0, 'failed': 0}
-    
+    journal = recorder = None
+    if tracer is not None:
+        tracer.event("session_started", run_dir=run_dir, jobs=jobs, runs=total_runs)
+    if not preview:
+        journal = RunJournal(run_dir)
+        journal.append("session", config=config_path, resumed=bool(resume_dir))
+        recorder = RunRecorder(run_dir)
+
+    stats = {
+        "success": 0,
+        "failed": 0,
+        "cancelled": 0,
+        "cached": 0,
+        "stopped": 0,
+        "timeout": 0,
+        "retried": 0,
+        "runs": recorder.records if recorder is not None else [],
+    }
+    if check_only:
+        stats["pending"] = 0
+    pool = _WorkerPool(
+        replace(settings, jobs=jobs),
+        stats,
+        gpu_pool=gpu_pool,
+        cpu_pool=cpu_pool,
+        journal=journal,
+        recorder=recorder,
+        history=history,
+    )
+
+    # Live view: child lines update it instead of scrolling past one by one
+    global _dashboard
+    if echo and console == "dashboard" and not preview:
+        from .dashboard import Dashboard
+
+        pool.dashboard = _dashboard = Dashboard(
+            total=total_runs, terminal=settings.is_terminal
+        ).start()
+
+    # Warm-start templates, one per (python_cmd, preload) pair, shut down when the queue ends
+    templates = {}
+
     # 4. The Loop
-    for exp_idx, exp in enumerate(experiments):
-        exp_name = exp.get('name', f"exp_{exp_idx}")
-        script_rel = exp['script']
-        
-        # Resolve script path relative to the config file location
-        script_path = resolve_script_path(config_path, script_rel)
-        
-        # Verify script exists (unless dry run)
-        if not os.path.exists(script_path) and not dry_run:
-            print(f"\n\033[91m[Error]\033[0m Script not found: {script_path}")
-            stats['failed'] += 1
-            if fail_fast: return stats
-            continue
-
-        print(f"\n>> Experiment: {exp_name}")
-
-        for i, run in enumerate(exp['runs']):
+    try:
+        current = None
+        shown = 0
+        for ctx, i, arg_list, retrying in _with_retries(
+            queue, pool, on_done=_done_with
+        ):
+            if pool.stopped.is_set():
+                break
+
+            if ctx["skip"]:
+                continue
+            if ctx is not current:
+                current = ctx
+                if not _enter_experiment(
+                    ctx, pool, dry_run, preview, templates, python_cmd
+                ):
+                    if fail_fast:
+                        pool.cancel()
+                        break
+                    continue
+
+            exp_name, script_rel, script_path = (
+                ctx["name"],
+                ctx["script_rel"],
+                ctx["script_path"],
+            )
+            n_runs = ctx["n_runs"]
             run_id = i + 1
-            args = run['args']
-            
+            args = " ".join(arg_list)
+
+            # Dry run only pages through the first plan_limit runs; the rest are never generated
+            plan_limit = settings.plan_limit
+            if dry_run and plan_limit:
+                if ordered and shown >= plan_limit:
+                    print(f"   ... {total_runs - shown} more run(s)")
+                    break
+                if not ordered and i >= plan_limit:
+                    print(f"   ... {n_runs - i} more run(s)")
+                    ctx["skip"] = True
+                    continue
+                shown += 1
+
             # Construct command
-            # Handle args as string ("--lr 0.1") or list (["--lr", "0.1"])
-            arg_list = args.split() if isinstance(args, str) else args
             cmd = [python_cmd, script_path] + arg_list
-            
-            # Visual indicator
-            print(f"   [{run_id}/{len(exp['runs'])}] {script_rel} {args}")
 
-            if dry_run:
+            # Log file setup
+            safe_exp_name = ctx["safe_name"]
+            run_key = f"{safe_exp_name}_{run_id}"
+            # A resumed run carries on with its attempts where the journal left them; one that
+            # had failed (--retry-failed) starts a new round of its retry policy
+            earlier = previous.get(run_key) if retrying is None else None
+            attempt = (
+                retrying["attempt"] if retrying else (earlier or {}).get("attempt", 1)
+            )
+            if retrying:
+                first_attempt = retrying["first_attempt"]
+            else:
+                first_attempt = (
+                    attempt if earlier and earlier["status"] in FAILED_STATUSES else 1
+                )
+            # Every attempt keeps its own log
+            log_stem = run_key if attempt == 1 else f"{run_key}_attempt{attempt}"
+            log_path = os.path.join(
+                run_dir, log_filename(log_stem, settings.output.log_codec)
+            )
+            patterns = ctx["patterns"]
+
+            # Already finished in the session being resumed (same args)
+            if (
+                earlier
+                and earlier["status"] in done_statuses
+                and earlier["args"] == arg_list
+            ):
+                status = (
+                    "success" if earlier["status"] == "cached" else earlier["status"]
+                )
+                _echo(
+                    f"   [{run_id}/{n_runs}] {script_rel} {args}  (done: {earlier['status']})\n"
+                )
+                pool.record(status)
                 continue
 
-            # Log file setup
-            safe_exp_name = exp_name.replace(" ", "_").replace("/", "-")
-            log_filename = f"{safe_exp_name}_{run_id}.log"
-            log_path = os.path.join(run_dir, log_filename)
-            
+            # Content-addressed cache lookup
+            cache_key, cached = None, None
+            if cache is not None and ctx["exists"]:
+                cache_key = cache.key_for(script_path, arg_list, python_cmd)
+                if cache_mode != "refresh" and retrying is None:
+                    cached = cache.lookup(cache_key)
+
+            if preview:
+                cache_note = "  \033[96m(cached)\033[0m" if cached else ""
+                seconds, _ = history.estimate(exp_name, script_path, arg_list)
+                estimate_note = (
+                    f"  (~{format_duration(seconds)})"
+                    if seconds is not None and not cached
+                    else ""
+                )
+                print(
+                    f"   [{run_id}/{n_runs}] {script_rel} {args}{cache_note}{estimate_note}"
+                )
+                if check_only:
+                    stats["cached" if cached else "pending"] += 1
+                continue
+
+            if cached:
+                try:
+                    log_path = cache.restore_log(
+                        cache_key, log_path, cached.get("suffix", ".log")
+                    )
+                except OSError:
+                    # Cache entry vanished underneath us: just run it
+                    cached = None
+            if cached:
+                _echo(
+                    f"   [{run_id}/{n_runs}] {script_rel} {args}\n"
+                    f"     \033[96m⟳ Cached\033[0m (from {cached['log']})\n"
+                )
+                pool.record("cached")
+                journal.append(
+                    "finished", run=run_key, args=arg_list, status="cached", exit_code=0
+                )
+                if tracer is not None:
+                    tracer.event("cached", run=run_key)
+                if patterns is not None:
+                    # The restored log is the only trace of a cached run: re-extract its metrics
+                    recorder.add(
+                        {
+                            "run": run_key,
+                            "exp": exp_name,
+                            "args": arg_list,
+                            "status": "cached",
+                            "exit_code": 0,
+                            "log": log_path,
+                            "metrics": _extract_from_log(
+                                patterns, log_path, series_dir(run_dir, run_key)
+                            ),
+                        }
+                    )
+                continue
+
+            journal.append("queued", run=run_key, args=arg_list)
+            if tracer is not None:
+                tracer.event("queued", run=run_key)
+
+            # Wait for a free worker before announcing the run
+            if not pool.acquire():
+                break
+
+            # Then for enough GPU capacity (a retry after running out of memory may ask for more)
+            lease = None
+            gpu_amount, gpu_mem = (
+                (retrying["gpu_amount"], retrying["gpu_mem"])
+                if retrying
+                else (ctx["gpu_amount"], ctx["gpu_mem"])
+            )
+            if gpu_amount is not None:
+                try:
+                    lease = gpu_pool.lease(
+                        gpu_amount, cancelled=pool.stopped, mem_mb=gpu_mem
+                    )
+                except ValueError as e:
+                    pool.release()
+                    _echo(f"   [{run_id}/{n_runs}] \033[91m[Error]\033[0m {e}\n")
+                    pool.record("failed")
+                    journal.append(
+                        "finished", run=run_key, status="failed", exit_code=None
+                    )
+                    if fail_fast:
+                        pool.cancel()
+                    continue
+                if lease is None:
+                    pool.release()
+                    break
+
+            # And for free cores
+            cpu_lease = None
+            if ctx["cpu_amount"] is not None:
+                try:
+                    cpu_lease = cpu_pool.lease(
+                        ctx["cpu_amount"], cancelled=pool.stopped
+                    )
+                except ValueError as e:
+                    _echo(f"   [{run_id}/{n_runs}] \033[91m[Error]\033[0m {e}\n")
+                    pool.record("failed")
+                    journal.append(
+                        "finished", run=run_key, status="failed", exit_code=None
+                    )
+                    if fail_fast:
+                        pool.cancel()
+                if cpu_lease is None:
+                    if gpu_pool is not None:
+                        gpu_pool.release(lease)
+                    pool.release()
+                    if pool.stopped.is_set():
+                        break
+                    continue
+
+            # Visual indicator
+            placement = (
+                ([f"GPU {lease.visible_devices}"] if lease else [])
+                + ([f"{lease.mem_mb} MB"] if lease and lease.mem_mb else [])
+                + ([f"CPU {cpu_lease.cpulist}"] if cpu_lease else [])
+            )
+            if retrying:
+                placement.insert(
+                    0,
+                    f"attempt {attempt}/{retrying['first_attempt'] + ctx['retry'].attempts - 1}",
+                )
+            device_note = f"  ({', '.join(placement)})" if placement else ""
+            _echo(f"   [{run_id}/{n_runs}] {script_rel} {args}{device_note}\n")
+
+            # The run holds the experiment's staged inputs until it ends
+            if ctx["stage"] is not None:
+                ctx["stage"].acquire()
+
             # Execute
-            success = _execute_subprocess(cmd, log_path)
-            
-            if success:
-                print("     \033[92m✓ Success\033[0m")
-                stats['success'] += 1
-            else:
-                print("     \033[91m✗ Failed\033[0m")
-                stats['failed'] += 1
-                
-                if fail_fast:
-                    print("\n\033[93m[!] Fail-fast triggered. Stopping queue.\033[0m")
-                    return stats
+            pool.submit(
+                {
+                    "run_key": run_key,
+                    "exp": exp_name,
+                    "args": arg_list,
+                    "cmd": cmd,
+                    "log_path": log_path,
+                    "label": f"{safe_exp_name}#{run_id}",
+                    "gpu_lease": lease,
+                    "cpu_lease": cpu_lease,
+                    "cache_key": cache_key,
+                    "launcher": ctx["launcher"],
+                    "metrics": patterns,
+                    "stopper": ctx["stopper"],
+                    "timeout": ctx["timeout"],
+                    "idle_timeout": ctx["idle_timeout"],
+                    "retry": ctx["retry"],
+                    "ctx": ctx,
+                    "index": i,
+                    "attempt": attempt,
+                    "first_attempt": first_attempt,
+                    "gpu_amount": gpu_amount,
+                    "gpu_mem": gpu_mem,
+                    "stage": ctx["stage"],
+                }
+            )
+
+        pool.join()
+    except KeyboardInterrupt:
+        pool.cancel()
+        raise
+    finally:
+        # Attempts still waiting for their backoff when the queue stopped end as they failed
+        for waiting in pool.abandon_retries():
+            pool.record(waiting["status"])
+            if journal is not None:
+                journal.append(
+                    "finished",
+                    run=f"{waiting['ctx']['safe_name']}_{waiting['index'] + 1}",
+                    status=waiting["status"],
+                    exit_code=None,
+                )
+        if pool.dashboard is not None:
+            _dashboard = None
+            pool.dashboard.close()
+        # Whatever is still staged (the queue stopped early) goes now
+        for ctx in contexts:
+            if ctx["stage"] is not None:
+                ctx["stage"].close()
+        for template in templates.values():
+            if template is not None:
+                template.close()
+        if tracer is not None and not preview:
+            tracer.event(
+                "session_ended",
+                **{k: v for k, v in stats.items() if isinstance(v, int)},
+            )
+            try:
+                from .trace import TRACE_FILE
+
+                _echo(
+                    f"\n  • Trace:   {tracer.export(os.path.join(run_dir, TRACE_FILE))}\n"
+                )
+            except OSError as e:
+                _echo(f"\n\033[93m[!] Could not write the trace: {e}\033[0m\n")
 
     return stats
 
-def _execute_subprocess(cmd, log_path):
+
+def _experiment_context(exp_idx, exp, config_path, settings):
+    """Everything about an experiment its runs need, resolved once before dispatch (`settings` gives the defaults)."""
+    name = exp.get("name", f"exp_{exp_idx}")
+    # Resolve script path relative to the config file location
+    script_path = resolve_script_path(config_path, exp["script"])
+
+    # Per-experiment GPU demand overrides the global default
+    gpu_value = exp.get("gpus", settings.gpus_per_run)
+    cpu_value = exp.get("cpus", settings.cpus_per_run)
+    # Run time limits: the experiment's own, else the config-wide ones
+    timeouts = {
+        key: exp.get(key, (settings.timeouts or {}).get(key))
+        for key in ("timeout", "idle_timeout")
+    }
+
+    metric_spec = exp.get("metrics", settings.metrics)
+    patterns = None
+    if metric_spec:
+        patterns = compile_patterns(
+            metric_spec if isinstance(metric_spec, list) else []
+        )
+
+    # Early stopping compares this experiment's runs with each other
+    scheduler_spec = exp.get("scheduler", settings.scheduler)
+    scheduler_opts = parse_scheduler(scheduler_spec) if scheduler_spec else None
+    if scheduler_opts is not None and patterns is None:
+        patterns = []
+
+    retry_spec = exp.get("retry", settings.retry)
+    retry_opts = parse_retry(retry_spec) if retry_spec else None
+
+    stage = None
+    if exp.get("stage"):
+        stage = StageArea(
+            name, base_dir=os.path.dirname(config_path), **parse_stage(exp["stage"])
+        )
+
+    return {
+        "exp": exp,
+        "name": name,
+        "safe_name": name.replace(" ", "_").replace("/", "-"),
+        "script_rel": exp["script"],
+        "script_path": script_path,
+        "exists": os.path.exists(script_path),
+        "gpu_amount": parse_gpu_request(gpu_value) if gpu_value is not None else None,
+        "gpu_mem": (
+            parse_gpu_mem(exp["gpu_mem"]) if exp.get("gpu_mem") is not None else None
+        ),
+        "cpu_amount": parse_cpu_request(cpu_value) if cpu_value is not None else None,
+        "timeout": (
+            parse_duration(timeouts["timeout"])
+            if timeouts.get("timeout") is not None
+            else None
+        ),
+        "idle_timeout": (
+            parse_duration(timeouts["idle_timeout"], "idle_timeout")
+            if timeouts.get("idle_timeout") is not None
+            else None
+        ),
+        "patterns": patterns,
+        "scheduler": scheduler_opts,
+        "stopper": EarlyStopper(**scheduler_opts) if scheduler_opts else None,
+        "retry_opts": retry_opts,
+        "retry": (
+            RetryPolicy(**retry_opts)
+            if retry_opts and retry_opts["attempts"] > 1
+            else None
+        ),
+        "priority": exp.get("priority", 0),
+        "n_runs": count_runs(exp),
+        "stage": stage,
+        "stage_held": False,
+        "queued_left": count_runs(exp),
+        "launcher": None,
+        "entered": False,
+        "skip": False,
+    }
+
+
+def _enter_experiment(ctx, pool, dry_run, preview, templates, python_cmd):
+    """
+    Announce an experiment the first time dispatch reaches it (the queue may interleave
+    experiments), check its script and start its warm-start template.
+    Returns False if its runs must be skipped.
+    """
+    if ctx["entered"]:
+        return True
+    ctx["entered"] = True
+
+    # Verify script exists (unless dry run)
+    if not ctx["exists"] and not dry_run:
+        _echo(f"\n\033[91m[Error]\033[0m Script not found: {ctx['script_path']}\n")
+        pool.record("failed")
+        ctx["skip"] = True
+        return False
+
+    _echo(f"\n>> Experiment: {ctx['name']}\n")
+    if ctx["scheduler"]:
+        _echo(f"   Early stopping: {describe(ctx['scheduler'])}\n")
+    if ctx["retry"]:
+        _echo(f"   Retry: {describe_retry(ctx['retry_opts'])}\n")
+    if ctx["stage"] is not None and not preview:
+        # Staged before the first run; the dispatcher holds it while runs are still queued
+        try:
+            path = ctx["stage"].acquire()
+        except OSError as e:
+            _echo(f"\n\033[91m[Error]\033[0m Could not stage inputs: {e}\n")
+            pool.record("failed")
+            ctx["skip"] = True
+            return False
+        ctx["stage_held"] = True
+        _echo(
+            f"   Staged: {ctx['stage'].size / (1 << 20):.0f} MB in {path} (${ctx['stage'].env})\n"
+        )
+    if ctx["exp"].get("warm_start") and not preview:
+        ctx["launcher"] = _warm_launcher(
+            templates, python_cmd, ctx["exp"].get("preload", [])
+        )
+    return True
+
+
+def _with_retries(queue, pool, on_done=None):
+    """
+    Queue items as (ctx, index, args, retry): due retries of failed runs go ahead of the next
+    queued run (retry None); once the queue is drained, wait for the retries still to come.
+    `on_done(ctx, retry)` is called once the dispatcher has moved past an item.
+    """
+
+    def items():
+        for ctx, i, arg_list in queue:
+            retry = pool.next_retry()
+            while retry is not None:
+                yield retry["ctx"], retry["index"], retry["args"], retry
+                retry = pool.next_retry()
+            yield ctx, i, arg_list, None
+        retry = pool.next_retry(wait=True)
+        while retry is not None:
+            yield retry["ctx"], retry["index"], retry["args"], retry
+            retry = pool.next_retry(wait=True)
+
+    for item in items():
+        yield item
+        if on_done is not None:
+            on_done(item[0], item[3])
+
+
+def _done_with(ctx, retry):
+    """The dispatcher moved past one of ctx's runs: drop the holds that kept its staged inputs."""
+    if retry is not None:
+        if retry["stage"] is not None:
+            retry["stage"].release()
+        return
+    ctx["queued_left"] -= 1
+    if ctx["queued_left"] == 0 and ctx["stage_held"]:
+        ctx["stage_held"] = False
+        ctx["stage"].release()
+
+
+def _file_order(contexts):
+    """Runs in config order, generated lazily; an experiment's remaining runs are dropped once it is skipped."""
+    for ctx in contexts:
+        for i, arg_list in enumerate(iter_runs(ctx["exp"])):
+            if ctx["skip"]:
+                break
+            yield ctx, i, arg_list
+
+
+def _plan_queue(contexts, history, ordered, jobs, pending=None):
+    """
+    Estimate the duration of every run that will execute and return (queue, summary).
+    Only with `ordered` are the runs materialized: queue is then sorted by experiment
+    priority, then longest estimate first (LPT). Otherwise queue is None (runs stream in
+    file order) and only the estimates are kept, 8 bytes per run.
+    Unknown runs count as the average known run. Runs `pending(ctx, index, args)` rules
+    out (done in a resumed session, or cached) are left out of the estimate and go last.
+    summary holds the predicted makespan, how many estimates came from each source and
+    how many runs were skipped.
+    """
+    from array import array
+
+    items, durations = [], array("d")
+    sources = {"run": 0, "experiment": 0, None: 0}
+    known_total, known, skipped = 0.0, 0, 0
+    for ctx in contexts:
+        for i, arg_list in enumerate(iter_runs(ctx["exp"])):
+            if ordered:
+                items.append((ctx, i, arg_list))
+            if pending is not None and not pending(ctx, i, arg_list):
+                skipped += 1
+                durations.append(_SKIPPED)
+                continue
+            seconds, source = history.estimate(
+                ctx["name"], ctx["script_path"], arg_list
+            )
+            sources[source] += 1
+            if seconds is None:
+                durations.append(_UNKNOWN)
+            else:
+                durations.append(seconds)
+                known_total += seconds
+                known += 1
+
+    fallback = known_total / known if known else 0.0
+
+    def seconds(k):
+        return fallback if math.isnan(durations[k]) else durations[k]
+
+    order = range(len(durations))
+    queue = None
+    if ordered:
+        order = sorted(
+            order,
+            key=lambda k: (
+                -items[k][0]["priority"],
+                durations[k] == _SKIPPED,
+                -seconds(k),
+            ),
+        )
+        queue = [items[k] for k in order]
+    makespan = None
+    if known:
+        makespan = predict_makespan(
+            (seconds(k) for k in order if durations[k] != _SKIPPED), jobs
+        )
+    return queue, {"makespan": makespan, "sources": sources, "skipped": skipped}
+
+
+def _warm_launcher(templates, python_cmd, preload):
+    """Return a template's spawn function for warm-start runs, or None to fall back to a cold start."""
+    from .warm import WarmTemplate, is_supported
+
+    if not is_supported():
+        _echo(
+            "   \033[93m[!] warm_start needs fork() and Unix sockets; using cold starts.\033[0m\n"
+        )
+        return None
+
+    key = (python_cmd, tuple(preload))
+    if key not in templates:
+        _echo(f"   Warming up {python_cmd} ({', '.join(preload) or 'no preload'})...\n")
+        try:
+            templates[key] = WarmTemplate(python_cmd, preload)
+        except (OSError, RuntimeError) as e:
+            _echo(
+                f"   \033[93m[!] Warm start unavailable ({e}); using cold starts.\033[0m\n"
+            )
+            templates[key] = None
+    template = templates[key]
+    return template.spawn if template is not None else None
+
+
+def _extract_from_log(patterns, log_path, out_dir):
+    """Run metric extraction over a finished log file."""
+    from .logstore import read_chunks
+
+    extractor = MetricExtractor(patterns, out_dir)
+    for chunk in read_chunks(log_path):
+        extractor.feed(chunk)
+    return extractor.close()
+
+
+def _popen(cmd, env, stdout):
+    """Cold start: a fresh interpreter per run."""
+    # stderr=subprocess.STDOUT merges errors into the main output stream;
+    # a session of its own lets the watchdog stop the run with everything it started
+    return subprocess.Popen(
+        cmd,
+        stdout=stdout,
+        stderr=subprocess.STDOUT,
+        env=env,
+        bufsize=0,
+        start_new_session=hasattr(os, "setsid"),
+    )
+
+
+def _execute_subprocess(
+    cmd,
+    log_path,
+    options=None,
+    output=None,
+    pool=None,
+    usage=None,
+    metrics=None,
+    on_event=None,
+    dashboard=None,
+):
     """
     Handles the low-level subprocess creation, output streaming, and logging.
-    Returns True if exit code is 0, False otherwise.
+    `options` (a RunOptions) says how the run is started and supervised, `output` (an
+    OutputSettings) where its output goes.
+    With echo=False the child writes straight into the log file and the scheduler never touches its output,
+    unless the log is compressed (`log_codec`), capped (`max_log_bytes`) or parsed for `metrics`
+    (a MetricExtractor), which needs the output pumped.
+    `on_event(name, **args)` is told about spawned, first_output, exited and log_closed
+    (tracing pumps the output, so first output can be seen).
+    With a `dashboard`, echoed output only updates the run's last line there (under `options.key`).
+    An expired `timeout` / `idle_timeout` goes into the log footer and into `usage['timeout']`.
+    `usage`, if given, is filled with wall/CPU time, peak RSS and I/O of the run.
+    Returns the child's exit code, or None if it could not be run.
     """
+    options = options or RunOptions()
+    output = output or OutputSettings()
     # Force unbuffered output so we see print statements immediately
-    env = os.environ.copy()
-    env['PYTHONUNBUFFERED'] = '1'
+    env = dict(os.environ if options.env is None else options.env)
+    env["PYTHONUNBUFFERED"] = "1"
+    env.update(options.env_extra or {})
+    prefix = f"[{options.label}] " if options.label else ""
+    affinity = options.affinity
+    timeout, idle_timeout = options.timeout, options.idle_timeout
+    # Watching for idle runs needs to see their output
+    direct = (
+        not output.echo
+        and output.log_codec is None
+        and not output.max_log_bytes
+        and metrics is None
+        and on_event is None
+        and idle_timeout is None
+    )
 
     try:
-        with open(log_path, 'w') as f:
+        with open_log(
+            log_path, codec=output.log_codec, max_bytes=output.max_log_bytes
+        ) as f:
             # Write Header
-            f.write(f"Cmd: {' '.join(cmd)}\n")
-            f.write(f"Start: {datetime.now()}\n")
-            f.write("-" * 40 + "\n")
+            header = f"Cmd: {' '.join(cmd)}\n"
+            header += f"Start: {datetime.now()}\n"
+            for key, value in (options.env_extra or {}).items():
+                header += f"Env: {key}={value}\n"
+            if affinity:
+                header += f"Affinity: {format_cpulist(affinity)}\n"
+            header += "-" * 40 + "\n"
+            f.write(header.encode())
             f.flush()
 
             # Start Process
-            # stderr=subprocess.STDOUT merges errors into the main output stream
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                env=env,
-                bufsize=1 # Line buffered
-            )
-
-            # Stream Output
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
-                if line:
-                    # Print to console (indented for visual hierarchy)
-                    sys.stdout.write(f"     | {line}")
-                    sys.stdout.flush()
-                    
-                    # Write to log
-                    f.write(line)
-                    f.flush()
-
-            # Write Footer
-            return_code = process.poll()
-            f.write("\n" + "-" * 40 + "\n")
-            f.write(f"End: {datetime.now()}\n")
-            f.write(f"Exit Code: {return_code}\n")
-            
-            return return_code == 0
+            spawn = options.launcher or _popen
+            started = time.monotonic()
+            process = spawn(cmd, env=env, stdout=f if direct else subprocess.PIPE)
+            if on_event is not None:
+                on_event("spawned", pid=process.pid)
+            # While the run is alive: its group outlives it, but its pid stops naming it
+            pgid = own_group(process)
+            watch = None
+            if timeout is not None or idle_timeout is not None:
+                watch = _watchdog.watch(
+                    process, timeout=timeout, idle_timeout=idle_timeout
+                )
+            if affinity and hasattr(os, "sched_setaffinity"):
+                # Before the interpreter gets to start its thread pools, which inherit the mask
+                try:
+                    os.sched_setaffinity(process.pid, affinity)
+                except OSError:
+                    pass
+            sampler = (
+                ProcessTreeSampler(process.pid).start() if usage is not None else None
+            )
+
+            # Queue stopped between dispatch and spawn: kill it straight away
+            if pool is not None and not pool.register(process):
+                stop_group(process, pgid)
+
+            try:
+                if not direct:
+                    _pump_output(
+                        process.stdout,
+                        f,
+                        prefix,
+                        output.flush_interval,
+                        echo=output.echo,
+                        metrics=metrics,
+                        on_stop=lambda: stop_group(process, pgid),
+                        on_first=(
+                            (lambda: on_event("first_output")) if on_event else None
+                        ),
+                        dashboard=dashboard,
+                        dashboard_key=options.key,
+                        watch=watch,
+                    )
+                    process.stdout.close()
+                return_code, rusage = wait_with_rusage(process)
+                if on_event is not None:
+                    on_event("exited", exit_code=return_code)
+            except KeyboardInterrupt:
+                # Its own session keeps the terminal's SIGINT from the run: stop it before letting go of it
+                stop_group(process, pgid, wait=True)
+                raise
+            finally:
+                if watch is not None:
+                    _watchdog.unwatch(watch)
+                if sampler is not None:
+                    sampler.stop()
+                if pool is not None:
+                    pool.unregister(process)
+
+            if usage is not None:
+                usage.update(summarize(time.monotonic() - started, rusage, sampler))
+                if watch is not None and watch.reason:
+                    usage["timeout"] = watch.reason
+
+            # Write Footer (after whatever the child appended to the shared fd)
+            if direct:
+                f.seek(0, os.SEEK_END)
+            footer = "\n" + "-" * 40 + "\n"
+            footer += f"End: {datetime.now()}\n"
+            footer += f"Exit Code: {return_code}\n"
+            if watch is not None and watch.reason:
+                footer += f"Killed: {watch.reason}\n"
+            f.write(footer.encode())
+
+        if on_event is not None:
+            on_event("log_closed")
+        return return_code
 
     except Exception as e:
-        print(f"     \033[91m[System Error] {e}\033[0m")
-        return False
+        _echo(f"     {prefix}\033[91m[System Error] {e}\033[0m\n")
+        return None
+
+
+def _pump_output(
+    pipe,
+    f,
+    prefix,
+    flush_interval,
+    echo=True,
+    metrics=None,
+    on_stop=None,
+    on_first=None,
+    dashboard=None,
+    dashboard_key=None,
+    watch=None,
+):
+    """
+    Copy a child's output pipe into the log in large binary chunks, echoing complete lines.
+    The log is flushed at most every `flush_interval` seconds (0 flushes every chunk).
+    With echo=False the output only goes to the log. Chunks are also fed to `metrics`, if given,
+    and `on_stop` is called once as soon as the metrics ask for the run to be stopped.
+    `on_first` is called when the first chunk arrives.
+    With a `dashboard`, only the last complete line of each chunk (and the latest metrics)
+    reaches it; the lines in between go to the log alone.
+    Output is reported to the run's `watch`, whose abandoned event ends the copy even if
+    an escaped descendant still holds the pipe open.
+    """
+    fd = pipe.fileno()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    last_flush = time.monotonic()
+
+    with selectors.DefaultSelector() as sel:
+        sel.register(fd, selectors.EVENT_READ)
+        while True:
+            # Wake up at least once per flush interval so idle runs still hit the disk
+            wait = flush_interval or None
+            if watch is not None:
+                wait = min(wait or 1.0, 1.0)
+            if sel.select(timeout=wait):
+                chunk = os.read(fd, _CHUNK_SIZE)
+                if not chunk:
+                    break
+                if watch is not None:
+                    watch.touch()
+                if on_first is not None:
+                    on_first()
+                    on_first = None
+                f.write(chunk)
+                if metrics is not None:
+                    metrics.feed(chunk)
+                    if metrics.stop_requested and on_stop is not None:
+                        on_stop()
+                        on_stop = None
+
+                if dashboard is not None:
+                    _show_last_line(dashboard, dashboard_key, chunk, metrics)
+                # Echo whole lines only; keep the tail for the next chunk
+                elif echo:
+                    text = pending + decoder.decode(chunk)
+                    lines = text.split("\n")
+                    pending = lines.pop()
+                    if len(pending) > _CHUNK_SIZE:
+                        lines.append(pending)
+                        pending = ""
+                    if lines:
+                        _echo("".join(f"     {prefix}| {line}\n" for line in lines))
+
+            if watch is not None and watch.abandoned.is_set():
+                break
+            now = time.monotonic()
+            if now - last_flush >= flush_interval:
+                f.flush()
+                last_flush = now
+
+    pending += decoder.decode(b"", final=True)
+    if pending and dashboard is None:
+        _echo(f"     {prefix}| {pending}\n")
+    f.flush()
+
+
+def _show_last_line(dashboard, key, chunk, metrics):
+    """Hand the dashboard the last complete line in `chunk` without decoding the rest."""
+    end = chunk.rfind(b"\n")
+    if end > 0:
+        start = chunk.rfind(b"\n", 0, end) + 1
+        line = chunk[start:end].rstrip(b"\r")
+        # Progress bars redraw with \r: show the latest state
+        line = line[line.rfind(b"\r") + 1 :]
+        dashboard.update(
+            key,
+            line=line[:512].decode("utf-8", errors="replace"),
+            metrics=dict(metrics.last) if metrics is not None else None,
+        )
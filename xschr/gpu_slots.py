@@ -0,0 +1,215 @@
+"""
+xschr.gpu_slots
+
+GPU slot pool: leases (optionally fractional) device shares to runs, and admits runs that
+declare `gpu_mem` only onto a device with that much memory to spare.
+"""
+
+import os
+import re
+import time
+import threading
+from dataclasses import dataclass
+from fractions import Fraction
+
+def parse_gpu_request(value):
+    """
+    Normalize a `gpus:` value to a Fraction.
+    Fractions below 1 share a single card; values of 1 or more must be whole devices.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"'gpus' must be a number (got {value!r}).")
+    try:
+        amount = Fraction(str(value)).limit_denominator(1000)
+    except ValueError:
+        raise ValueError(f"'gpus' must be a number (got {value!r}).")
+
+    if amount <= 0:
+        raise ValueError(f"'gpus' must be positive (got {value!r}).")
+    if amount > 1 and amount.denominator != 1:
+        raise ValueError(f"'gpus' above 1 must be a whole number of devices (got {value!r}).")
+    return amount
+
+_MEM_UNITS = {'': 1, 'm': 1, 'mb': 1, 'mib': 1, 'g': 1024, 'gb': 1024, 'gib': 1024}
+
+def parse_gpu_mem(value):
+    """Normalize a `gpu_mem:` value (MB as a number, or a string such as '8GB' or '512MB') to MB."""
+    match = None
+    if isinstance(value, str):
+        match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*", value)
+    if isinstance(value, bool) or not (isinstance(value, (int, float)) or match):
+        raise ValueError(f"'gpu_mem' must be a size such as 8GB or 512MB (got {value!r}).")
+    if match:
+        unit = match.group(2).lower()
+        if unit not in _MEM_UNITS:
+            raise ValueError(f"'gpu_mem' unit must be MB or GB (got {value!r}).")
+        value = float(match.group(1)) * _MEM_UNITS[unit]
+    if value <= 0:
+        raise ValueError(f"'gpu_mem' must be positive (got {value!r}).")
+    return int(value + 0.5)
+
+def cuda_visible_devices(device_ids, inherited=None):
+    """
+    CUDA_VISIBLE_DEVICES selecting scheduler devices `device_ids`.
+    The scheduler numbers the devices CUDA shows it from 0; if this process was itself
+    limited (`inherited`, default: its own CUDA_VISIBLE_DEVICES), ordinal i is the i-th
+    entry of that list, an index or a UUID, since a child reads the variable afresh.
+    """
+    if inherited is None:
+        inherited = os.environ.get('CUDA_VISIBLE_DEVICES')
+    entries = [e.strip() for e in inherited.split(',')] if inherited else []
+    return ",".join(entries[d] if d < len(entries) else str(d) for d in device_ids)
+
+@dataclass
+class GpuLease:
+    """A set of device shares held by one run, with the memory it declared on each device."""
+    device_ids: tuple
+    amount: Fraction
+    mem_mb: int = None
+
+    @property
+    def visible_devices(self):
+        """The leased devices as scheduler ordinals ('0,1'), for display."""
+        return ",".join(str(d) for d in self.device_ids)
+
+    @property
+    def cuda_visible_devices(self):
+        """Value for this host's runs' CUDA_VISIBLE_DEVICES (see cuda_visible_devices)."""
+        return cuda_visible_devices(self.device_ids)
+
+class GpuSlotPool:
+    """
+    Tracks free capacity per device (1.0 per card) and hands out leases.
+
+    `devices` is the list returned by `cuda_devices.detect_nvidia_gpus`,
+    so tests can inject a fake list such as [{'id': 0}, {'id': 1}].
+
+    Memory admission: a lease with `mem_mb` only goes to a device whose spare memory
+    covers it. Spare memory is the smaller of the card's total minus what our own leases
+    declared (runs that have not allocated yet) and the live free memory (other users).
+    `memory_probe` returns that live view as `cuda_devices.device_status` does; it is
+    polled at most every `probe_interval` seconds. Without it only declared memory counts.
+    """
+    def __init__(self, devices, memory_probe=None, probe_interval=1.0):
+        self.device_ids = [d['id'] for d in devices]
+        self._free = {d: Fraction(1) for d in self.device_ids}
+        self._total_mb = {d['id']: d.get('total_mb') for d in devices}
+        self._reserved_mb = {d: 0 for d in self.device_ids}
+        self._probe = memory_probe
+        self._probe_interval = probe_interval
+        self._live_mb = {}
+        self._probed_at = None
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    def can_fit(self, amount, mem_mb=None):
+        """True if the request could ever be satisfied by this pool."""
+        devices = self.device_ids
+        if mem_mb is not None:
+            devices = [d for d in devices if self._total_mb.get(d) is None or self._total_mb[d] >= mem_mb]
+        if amount < 1:
+            return len(devices) > 0
+        return int(amount) <= len(devices)
+
+    def largest_mb(self):
+        """Memory of the biggest device, or None if no device reports it."""
+        known = [mb for mb in self._total_mb.values() if mb is not None]
+        return max(known) if known else None
+
+    def try_lease(self, amount, mem_mb=None):
+        """Lease `amount` GPUs (with `mem_mb` spare on each) if free right now. Returns a GpuLease or None."""
+        with self._cond:
+            return self._take(amount, mem_mb)
+
+    def lease(self, amount, cancelled=None, poll=0.2, mem_mb=None):
+        """
+        Block until `amount` GPUs are free (and, with `mem_mb`, have that much memory to spare) and lease them.
+        Returns None if `cancelled` (a threading.Event) is set while waiting.
+        """
+        if not self.can_fit(amount, mem_mb):
+            if mem_mb is not None and self.can_fit(amount):
+                raise ValueError(f"Run requires {mem_mb} MB of GPU memory but no device has that much.")
+            raise ValueError(f"Run requires {amount} GPU(s) but only {len(self.device_ids)} detected.")
+
+        with self._cond:
+            while True:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                lease = self._take(amount, mem_mb)
+                if lease is not None:
+                    return lease
+                self._cond.wait(timeout=poll)
+
+    def spare_mb(self, device):
+        """Memory a new run may claim on `device`, or None if unknown. Call with the lock held."""
+        total = self._total_mb.get(device)
+        spare = [total - self._reserved_mb[device]] if total is not None else []
+        live = self._live_mb.get(device)
+        if live is not None:
+            spare.append(live)
+        return min(spare) if spare else None
+
+    def _refresh(self):
+        """Re-read live free memory if the last probe is stale."""
+        if self._probe is None:
+            return
+        now = time.monotonic()
+        if self._probed_at is not None and now - self._probed_at < self._probe_interval:
+            return
+        self._probed_at = now
+        try:
+            snapshot = self._probe()
+        except Exception:
+            return
+        for status in snapshot:
+            if status['id'] in self._reserved_mb:
+                self._live_mb[status['id']] = status.get('free_mb')
+                if status.get('total_mb') is not None:
+                    self._total_mb[status['id']] = status['total_mb']
+
+    def _fits(self, device, mem_mb):
+        if mem_mb is None:
+            return True
+        spare = self.spare_mb(device)
+        return spare is None or spare >= mem_mb
+
+    def release(self, lease):
+        """Return a lease's shares to the pool and wake waiting runs."""
+        if lease is None:
+            return
+        share = lease.amount if lease.amount < 1 else Fraction(1)
+        with self._cond:
+            for d in lease.device_ids:
+                self._free[d] = min(Fraction(1), self._free[d] + share)
+                self._reserved_mb[d] = max(0, self._reserved_mb[d] - (lease.mem_mb or 0))
+            self._cond.notify_all()
+
+    def _take(self, amount, mem_mb=None):
+        if mem_mb is not None:
+            self._refresh()
+        if amount < 1:
+            # Best fit: pack small jobs onto the card with the least room that still fits
+            candidates = [d for d in self.device_ids if self._free[d] >= amount and self._fits(d, mem_mb)]
+            if not candidates:
+                return None
+            device = min(candidates, key=lambda d: (self._free[d], self.spare_mb(d) or 0, d))
+            self._free[device] -= amount
+            chosen = (device,)
+        else:
+            # Whole devices: only cards nobody is sharing
+            idle = [d for d in self.device_ids if self._free[d] == 1 and self._fits(d, mem_mb)]
+            if len(idle) < int(amount):
+                return None
+            chosen = tuple(idle[:int(amount)])
+            for d in chosen:
+                self._free[d] = Fraction(0)
+
+        if mem_mb is not None:
+            for d in chosen:
+                self._reserved_mb[d] += mem_mb
+                # Until the next probe, assume the run allocates what it declared right away
+                if self._live_mb.get(d) is not None:
+                    self._live_mb[d] -= mem_mb
+        return GpuLease(chosen, amount, mem_mb)
@@ -0,0 +1,151 @@
+"""
+xschr.history
+
+run-duration history used to order the queue and predict a sweep's makespan.
+
+Every successful run appends {key, exp, wall} to <log_dir>/.history.jsonl, keyed by
+script path + arguments. A run's estimate is a moving average of its last few durations;
+runs never seen before fall back to the average of their experiment. Only the last
+KEEP_PER_RUN durations of a run count, so once the file holds many more lines than
+that, it is rewritten with just those.
+"""
+
+import os
+import json
+import heapq
+import hashlib
+import threading
+import collections
+
+HISTORY_FILENAME = ".history.jsonl"
+
+# Weight of the newest duration in a run's moving average
+_ALPHA = 0.5
+
+# Durations kept per run: older ones weigh less than 1% of the average
+KEEP_PER_RUN = 8
+
+# Rewrite the file once it has this many lines and twice as many as it would keep
+_COMPACT_LINES = 4096
+
+def run_key(script_path, arg_list):
+    digest = hashlib.sha1(os.path.abspath(script_path).encode())
+    digest.update("\0".join(arg_list).encode())
+    return digest.hexdigest()[:20]
+
+def experiment_key(exp_name, script_path):
+    return f"{exp_name}\0{os.path.abspath(script_path)}"
+
+class DurationHistory:
+    """Duration estimates per run and per experiment, loaded lazily from the log directory."""
+    def __init__(self, log_root):
+        self.path = os.path.join(log_root, HISTORY_FILENAME)
+        self._lock = threading.Lock()
+        self._runs = None   # run key -> (estimate seconds, experiment key)
+        self._walls = {}    # run key -> (last KEEP_PER_RUN durations, experiment key)
+        self._lines = 0
+
+    def _load(self):
+        if self._runs is not None:
+            return
+        self._runs = {}
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self._add(entry['key'], entry['exp'], float(entry['wall']))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            pass
+        for key, (walls, exp_key) in self._walls.items():
+            estimate = walls[0]
+            for wall in list(walls)[1:]:
+                estimate = _ALPHA * wall + (1 - _ALPHA) * estimate
+            self._runs[key] = (estimate, exp_key)
+        self._by_experiment()
+        with self._lock:
+            self._maybe_compact()
+
+    def _add(self, key, exp_key, wall):
+        if key not in self._walls:
+            self._walls[key] = (collections.deque(maxlen=KEEP_PER_RUN), exp_key)
+        self._walls[key][0].append(wall)
+
+    def _maybe_compact(self):
+        """Rewrite the file with the durations that still count, if it grew well past them. Call with the lock held."""
+        kept = sum(len(walls) for walls, _ in self._walls.values())
+        if self._lines < _COMPACT_LINES or self._lines < 2 * kept:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                for key, (walls, exp_key) in self._walls.items():
+                    for wall in walls:
+                        f.write(json.dumps({'key': key, 'exp': exp_key, 'wall': wall}) + "\n")
+            os.replace(tmp, self.path)
+            self._lines = kept
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _by_experiment(self):
+        totals = {}
+        for estimate, exp_key in self._runs.values():
+            total, n = totals.get(exp_key, (0.0, 0))
+            totals[exp_key] = (total + estimate, n + 1)
+        self._experiments = {k: total / n for k, (total, n) in totals.items()}
+
+    def __len__(self):
+        self._load()
+        return len(self._runs)
+
+    def estimate(self, exp_name, script_path, arg_list):
+        """Return (seconds, source) with source 'run', 'experiment' or None when nothing is known."""
+        self._load()
+        known = self._runs.get(run_key(script_path, arg_list))
+        if known is not None:
+            return known[0], 'run'
+        average = self._experiments.get(experiment_key(exp_name, script_path))
+        if average is not None:
+            return average, 'experiment'
+        return None, None
+
+    def record(self, exp_name, script_path, arg_list, wall):
+        """Append one successful run's wall time (it counts for the next session's estimates)."""
+        entry = {'key': run_key(script_path, arg_list), 'exp': experiment_key(exp_name, script_path),
+                 'wall': round(wall, 3)}
+        with self._lock:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                return
+            if self._runs is not None:
+                self._add(entry['key'], entry['exp'], entry['wall'])
+                self._lines += 1
+                self._maybe_compact()
+
+def predict_makespan(durations, workers):
+    """
+    Finish time of greedy list scheduling of `durations` (in dispatch order) on `workers` slots.
+    `durations` may be any iterable; it is consumed once.
+    """
+    finish = [0.0] * max(1, workers)
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+def format_duration(seconds):
+    seconds = float(seconds)
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(int(round(seconds)), 60)
+    if minutes < 60:
+        return f"{minutes}m {secs:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
@@ -0,0 +1,84 @@
+"""
+xschr.journal
+
+append-only, fsync'd run journal kept in each run_<timestamp> directory.
+"""
+
+import os
+import json
+import time
+import threading
+
+JOURNAL_FILENAME = "journal.jsonl"
+
+# Terminal states that --resume will not re-execute
+DONE_STATUSES = ('success', 'failed', 'cached', 'stopped', 'timeout')
+
+# The ones --resume --retry-failed runs again
+FAILED_STATUSES = ('failed', 'timeout')
+
+class RunJournal:
+    """
+    One JSON object per line: a 'session' record per invocation, then
+    queued / started / finished events keyed by run (the log file stem), and a
+    'retry' event when a failed run goes back to the queue for another attempt.
+    Every append is fsync'd so the file survives a crash or power loss.
+    """
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+
+    def append(self, event, **fields):
+        """Durably append a single event."""
+        record = {'event': event, 'time': time.time(), **fields}
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+def replay(run_dir):
+    """
+    Rebuild run state from a journal.
+    Returns {'config': path or None, 'runs': {run_key: {'status', 'args', 'exit_code', 'attempt'}}}.
+    A run that was queued or started but never finished is reported as 'interrupted'.
+    'attempt' is the attempt a rerun continues with: the one a retry was waiting for,
+    or the one after the last attempt that finished (1 for runs that never finished),
+    so a rerun never overwrites an earlier attempt's log.
+    """
+    path = os.path.join(run_dir, JOURNAL_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No journal found in {run_dir}")
+
+    state = {'config': None, 'runs': {}}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn final line from a crash mid-write
+                continue
+
+            event = record.get('event')
+            if event == 'session':
+                state['config'] = record.get('config', state['config'])
+                continue
+
+            key = record.get('run')
+            if key is None:
+                continue
+            run = state['runs'].setdefault(key, {'status': 'interrupted', 'args': None, 'exit_code': None,
+                                                 'attempt': 1})
+            if 'args' in record:
+                run['args'] = record['args']
+            if event in ('queued', 'started', 'retry'):
+                run['status'] = 'interrupted'
+                if event == 'retry':
+                    run['attempt'] = record.get('attempt', run['attempt'])
+            elif event == 'finished':
+                run['status'] = record.get('status', 'failed')
+                run['exit_code'] = record.get('exit_code')
+                run['attempt'] = record.get('attempt', 1) + 1
+
+    return state
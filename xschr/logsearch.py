@@ -0,0 +1,216 @@
+"""
+xschr.logsearch
+
+full-text search across the logs of every run_<timestamp> directory.
+
+    xschr logs grep "CUDA out of memory"                 # every run under ./logs
+    xschr logs grep -i "nan loss" --since 2d --exp "lr_*"
+    xschr logs grep -l Traceback --status failed -d logs/run_20260101_120000
+
+Plain logs are memory-mapped and scanned by the regex engine without copying them into
+Python; compressed ones are decompressed frame by frame. Files are spread over a pool of
+processes, largest first, so a few big logs do not serialize the search.
+
+The run index is runs.jsonl, which the scheduler appends to as each run's log is closed:
+it maps a log to its experiment and status for --exp / --status without opening the log.
+Logs it does not know (older sessions, interrupted runs) fall back to their file name.
+Matching runs are reported with the arguments from their log's `Cmd:` header.
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import fnmatch
+
+# Below this much data, a process pool costs more than it saves
+_PARALLEL_BYTES = 32 << 20
+
+_DURATION = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*")
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+def parse_since(value, now=None):
+    """Epoch seconds from an age ('30m', '12h', '2d', '1w') or a date ('2026-01-31', '2026-01-31 14:00')."""
+    match = _DURATION.fullmatch(value)
+    if match:
+        return (now or time.time()) - float(match.group(1)) * _UNITS[match.group(2)]
+    for fmt in ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            pass
+    raise ValueError(f"invalid --since '{value}' (use an age such as 12h or 2d, or a date such as 2026-01-31)")
+
+# --- Finding logs ---
+
+def _run_dirs(paths):
+    """run_<timestamp> directories given directly or found under log roots, oldest first."""
+    dirs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No such directory: {path}")
+        if os.path.basename(os.path.normpath(path)).startswith("run_"):
+            dirs.append(path)
+            continue
+        dirs += [os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if name.startswith("run_") and os.path.isdir(os.path.join(path, name))]
+    return dirs
+
+def _run_index(run_dir):
+    """{log file name: latest runs.jsonl record} for one run directory."""
+    from .accounting import RUNS_FILENAME
+    index = {}
+    try:
+        with open(os.path.join(run_dir, RUNS_FILENAME), 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('log'):
+                    index[os.path.basename(record['log'])] = record
+    except OSError:
+        pass
+    return index
+
+def _stem(name):
+    return re.sub(r"\.log(\.gz|\.zst)?$", "", name)
+
+def find_logs(paths, since=None, exp=None, status=None):
+    """
+    Logs to search as dicts (run_dir, path, run, exp, status, size), filtered by modification
+    time (`since`, epoch seconds), experiment name (`exp`, a glob) and run status.
+    """
+    logs = []
+    for run_dir in _run_dirs(paths):
+        index = _run_index(run_dir)
+        for name in sorted(os.listdir(run_dir)):
+            if not re.search(r"\.log(\.gz|\.zst)?$", name):
+                continue
+            path = os.path.join(run_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if since is not None and st.st_mtime < since:
+                continue
+            record = index.get(name, {})
+            stem = _stem(name)
+            run_exp = record.get('exp') or re.sub(r"_\d+(_attempt\d+)?$", "", stem)
+            if exp is not None and not fnmatch.fnmatchcase(run_exp, exp):
+                continue
+            if status is not None and record.get('status') != status:
+                continue
+            logs.append({'run_dir': run_dir, 'path': path, 'run': stem, 'exp': run_exp,
+                         'status': record.get('status'), 'size': st.st_size})
+    return logs
+
+# --- Searching one log ---
+
+def _header_cmd(path):
+    """The command from a log's `Cmd:` header, or None."""
+    from .logstore import iter_lines
+    try:
+        first = next(iter_lines(path, 0, 1), b"")
+    except (OSError, RuntimeError, EOFError):
+        return None
+    if not first.startswith(b"Cmd: "):
+        return None
+    return first[5:].rstrip(b"\n").decode(errors='replace')
+
+def _scan(data, regex, limit, matches, lineno=0, start=0, end=None):
+    """
+    Append (line number, line) for lines of `data` (bytes or mmap) matching `regex`, from `start`
+    to `end`; `lineno` is the number of the line at `start`. Returns the line number at `end`.
+    """
+    end = len(data) if end is None else end
+    pos = start
+    while len(matches) < limit:
+        match = regex.search(data, pos, end)
+        if match is None:
+            break
+        # `pos` always starts a line
+        newline = data.rfind(b"\n", pos, match.start())
+        line_start = pos if newline < 0 else newline + 1
+        line_end = data.find(b"\n", match.start(), end)
+        line_end = end if line_end < 0 else line_end
+        lineno += data[pos:line_start].count(b"\n")
+        matches.append((lineno + 1, bytes(data[line_start:line_end])))
+        # One hit per line: continue after it
+        pos = min(line_end + 1, end)
+        lineno += 1 if line_end < end else 0
+        if pos >= end:
+            break
+    return lineno + data[pos:end].count(b"\n") if pos < end else lineno
+
+def search_log(path, pattern, flags=0, limit=None):
+    """
+    Matching lines of one log as (path, cmd, [(line number, line bytes)]).
+    `pattern` is a bytes regex; at most `limit` lines are returned (all when None).
+    """
+    from .logstore import codec_for, read_chunks
+    regex = re.compile(pattern, flags)
+    limit = limit or sys.maxsize
+    matches = []
+    try:
+        if codec_for(path) is None:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        _scan(data, regex, limit, matches)
+        else:
+            lineno, pending = 0, b""
+            for chunk in read_chunks(path):
+                data = pending + chunk
+                cut = data.rfind(b"\n") + 1
+                # Only whole lines are searched; the partial last one waits for the next chunk
+                lineno = _scan(data, regex, limit, matches, lineno, 0, cut)
+                pending = data[cut:]
+                if len(matches) >= limit:
+                    break
+            if pending and len(matches) < limit:
+                _scan(pending, regex, limit, matches, lineno)
+    except (OSError, RuntimeError, EOFError, ValueError):
+        return path, None, []
+    return path, (_header_cmd(path) if matches else None), matches
+
+def _search_task(job):
+    return search_log(*job)
+
+# --- Searching many ---
+
+def search(logs, pattern, flags=0, limit=None, jobs=None):
+    """
+    Search `logs` (from find_logs) and yield (log, cmd, matches) for logs with a match, in the
+    order given. Large sets are spread over `jobs` processes (default: one per core).
+    """
+    jobs = jobs or os.cpu_count() or 1
+    tasks = [(log['path'], pattern, flags, limit) for log in logs]
+    by_path = {log['path']: log for log in logs}
+    if jobs == 1 or len(logs) < 2 or sum(log['size'] for log in logs) < _PARALLEL_BYTES:
+        results = map(_search_task, tasks)
+        for path, cmd, matches in results:
+            if matches:
+                yield by_path[path], cmd, matches
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    # Biggest logs first so the pool does not end waiting on one; results come back in log order
+    order = sorted(range(len(tasks)), key=lambda k: -logs[k]['size'])
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        futures = {k: executor.submit(_search_task, tasks[k]) for k in order}
+        for k in range(len(tasks)):
+            path, cmd, matches = futures[k].result()
+            if matches:
+                yield by_path[path], cmd, matches
+
+def run_args(cmd):
+    """'script.py --args' from a `Cmd:` header (the interpreter dropped, the script by name)."""
+    if not cmd:
+        return ""
+    parts = cmd.split(" ", 2)
+    if len(parts) < 2:
+        return cmd
+    return " ".join([os.path.basename(parts[1])] + parts[2:])
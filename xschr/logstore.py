@@ -0,0 +1,309 @@
+"""
+xschr.logstore
+
+run log storage: optional frame-compressed logs (gzip, or zstd when `zstandard` is
+installed), per-run size caps with head/tail retention, and a seekable frame index.
+
+A compressed log is a concatenation of independent frames (gzip members / zstd
+frames), so `zcat`/`zstdcat` read it as usual. Next to it, `<log>.idx` holds one
+fixed-size record per frame:
+
+    compressed offset, compressed length, first line number, newline count
+
+which lets `xschr logs tail` / `xschr logs show --range` decompress only the frames
+they need.
+"""
+
+import os
+import gzip
+import struct
+import bisect
+import itertools
+
+CODECS = ('gzip', 'zstd')
+SUFFIXES = {None: "", 'gzip': ".gz", 'zstd': ".zst"}
+INDEX_SUFFIX = ".idx"
+
+FRAME_BYTES = 1 << 20
+
+_INDEX_MAGIC = b"XSCHRIX1"
+_INDEX_RECORD = struct.Struct("<QQQQ")
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("log_compress: zstd needs the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+def _compressor(codec):
+    if codec == 'gzip':
+        return lambda data: gzip.compress(data, compresslevel=6, mtime=0)
+    return _zstd().ZstdCompressor(level=3).compress
+
+def _decompressor(codec):
+    if codec == 'gzip':
+        return gzip.decompress
+    return _zstd().ZstdDecompressor().decompress
+
+def codec_for(path):
+    """Infer the codec from a log's file name."""
+    if path.endswith(".gz"):
+        return 'gzip'
+    if path.endswith(".zst"):
+        return 'zstd'
+    return None
+
+def log_filename(stem, codec=None):
+    """File name of a run log: <stem>.log, .log.gz or .log.zst."""
+    return f"{stem}.log{SUFFIXES[codec]}"
+
+def find_log(path):
+    """Resolve a log path given with or without its .log / compression suffix."""
+    for stem in (path, path + ".log"):
+        for suffix in ("",) + tuple(SUFFIXES[c] for c in CODECS):
+            if os.path.isfile(stem + suffix):
+                return stem + suffix
+    raise FileNotFoundError(f"No log found at {path}")
+
+class _TailRing:
+    """Fixed-size circular spill file holding the most recent `capacity` bytes."""
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.total = 0
+        self._pos = 0
+        self._f = open(path, 'w+b')
+
+    def write(self, data):
+        self.total += len(data)
+        data = data[-self.capacity:]
+        while data:
+            piece = data[:self.capacity - self._pos]
+            self._f.seek(self._pos)
+            self._f.write(piece)
+            self._pos = (self._pos + len(piece)) % self.capacity
+            data = data[len(piece):]
+
+    @property
+    def dropped(self):
+        return max(0, self.total - self.capacity)
+
+    def drain(self, chunk_size=FRAME_BYTES):
+        """Yield the retained bytes oldest-first."""
+        self._f.flush()
+        if self.total >= self.capacity:
+            spans = [(self._pos, self.capacity), (0, self._pos)]
+        else:
+            spans = [(0, self._pos)]
+        for start, end in spans:
+            self._f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = self._f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def close(self):
+        """Delete the spill file."""
+        self._f.close()
+        os.remove(self.path)
+
+class LogWriter:
+    """
+    Binary log sink with optional frame compression and a size cap.
+
+    With `max_bytes`, the first half of the cap is written as it arrives and the
+    most recent half is kept in an on-disk ring; on close the ring is appended after
+    a truncation marker, so memory use stays flat however much a run prints.
+    """
+    def __init__(self, path, codec=None, max_bytes=None, frame_bytes=FRAME_BYTES):
+        self.path = path
+        self.codec = codec
+        self._compress = _compressor(codec) if codec else None
+        self._frame_bytes = frame_bytes
+        self._frame = []
+        self._frame_len = 0
+        self._lines = 0
+        self._f = open(path, 'wb', buffering=0 if codec else FRAME_BYTES)
+        self._index = None
+        if codec:
+            self._index = open(path + INDEX_SUFFIX, 'wb')
+            self._index.write(_INDEX_MAGIC)
+
+        self._head_left = max_bytes - max_bytes // 2 if max_bytes else None
+        self._tail = _TailRing(f"{path}.tail", max_bytes // 2) if max_bytes and max_bytes // 2 else None
+
+    def write(self, data):
+        if self._head_left is None:
+            self._sink(data)
+            return
+        if self._head_left > 0:
+            head, data = data[:self._head_left], data[self._head_left:]
+            self._head_left -= len(head)
+            self._sink(head)
+        if data and self._tail is not None:
+            self._tail.write(data)
+
+    def _sink(self, data):
+        if not self._compress:
+            self._f.write(data)
+            return
+        self._frame.append(data)
+        self._frame_len += len(data)
+        if self._frame_len >= self._frame_bytes:
+            self._end_frame()
+
+    def _end_frame(self):
+        if not self._frame_len:
+            return
+        raw = b"".join(self._frame)
+        blob = self._compress(raw)
+        offset = self._f.tell()
+        self._f.write(blob)
+        newlines = raw.count(b"\n")
+        self._index.write(_INDEX_RECORD.pack(offset, len(blob), self._lines, newlines))
+        self._index.flush()
+        self._lines += newlines
+        self._frame, self._frame_len = [], 0
+
+    def flush(self):
+        """Make everything written so far readable (closes the current frame)."""
+        if self._compress:
+            self._end_frame()
+        else:
+            self._f.flush()
+
+    def close(self):
+        if self._tail is not None:
+            if self._tail.dropped:
+                self._sink(f"\n[xschr: {self._tail.dropped} bytes truncated]\n".encode())
+            for chunk in self._tail.drain():
+                self._sink(chunk)
+            self._tail.close()
+        self.flush()
+        self._f.close()
+        if self._index is not None:
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_log(path, codec=None, max_bytes=None):
+    """
+    Open a run log for writing. A plain, uncapped log is an ordinary buffered file,
+    which lets a run write into it directly.
+    """
+    if codec is None and not max_bytes:
+        return open(path, 'wb', buffering=FRAME_BYTES)
+    return LogWriter(path, codec=codec, max_bytes=max_bytes)
+
+# --- Reading ---
+
+def read_index(path):
+    """List of (offset, length, first_line, newlines) per frame, or None if there is no usable index."""
+    try:
+        with open(path + INDEX_SUFFIX, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(_INDEX_MAGIC):
+        return None
+    body = data[len(_INDEX_MAGIC):]
+    body = body[:len(body) - len(body) % _INDEX_RECORD.size]
+    return list(_INDEX_RECORD.iter_unpack(body))
+
+def _split_lines(chunks):
+    """Re-split a stream of byte chunks into lines (keeping newlines)."""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+def read_chunks(path):
+    """Yield the decompressed content of a log in large chunks."""
+    return _stream_chunks(path, codec_for(path))
+
+def _stream_chunks(path, codec):
+    """Sequentially decompress a whole log (fallback when there is no index)."""
+    if codec == 'gzip':
+        opener = gzip.open(path, 'rb')
+    elif codec == 'zstd':
+        opener = _zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    else:
+        opener = open(path, 'rb')
+    with opener as f:
+        for chunk in iter(lambda: f.read(FRAME_BYTES), b""):
+            yield chunk
+
+def _indexed_chunks(path, codec, frames, start_frame):
+    decompress = _decompressor(codec)
+    with open(path, 'rb') as f:
+        for offset, length, _, _ in frames[start_frame:]:
+            f.seek(offset)
+            yield decompress(f.read(length))
+
+def iter_lines(path, start=0, end=None):
+    """
+    Yield lines [start, end) of a log (0-based, bytes with newlines).
+    Compressed logs with an index only decompress frames from the one containing `start`.
+    """
+    codec = codec_for(path)
+    frames = read_index(path) if codec else None
+
+    if frames:
+        firsts = [first for _, _, first, _ in frames]
+        # Last frame that began strictly before line `start`: skipping that many newline-terminated
+        # pieces from its beginning lands on line `start` whether or not the frame begins mid-line
+        i = max(0, bisect.bisect_left(firsts, start) - 1)
+        lines = _split_lines(_indexed_chunks(path, codec, frames, i))
+        skip = start - firsts[i]
+    else:
+        lines = _split_lines(_stream_chunks(path, codec))
+        skip = start
+
+    stop = None if end is None else skip + max(0, end - start)
+    yield from itertools.islice(lines, skip, stop)
+
+def count_lines(path):
+    """Number of lines in a log (cheap for indexed logs)."""
+    codec = codec_for(path)
+    frames = read_index(path) if codec else None
+    if not frames:
+        return sum(1 for _ in iter_lines(path))
+
+    _, _, first, newlines = frames[-1]
+    last = b"".join(_indexed_chunks(path, codec, frames, len(frames) - 1))
+    # A final line without a newline still counts
+    return first + newlines + (1 if last and not last.endswith(b"\n") else 0)
+
+def tail_lines(path, n):
+    """Last `n` lines of a log."""
+    if codec_for(path) is None:
+        return _tail_plain(path, n)
+    total = count_lines(path)
+    return list(iter_lines(path, max(0, total - n)))
+
+def _tail_plain(path, n, block=1 << 16):
+    """Read an uncompressed log backwards until `n` lines are found."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = list(_split_lines([data]))
+    return lines[-n:] if n else []
@@ -0,0 +1,209 @@
+"""
+xschr.metrics
+
+metric extraction from run output and the per-run columnar results store.
+
+Values come from `metrics:` regexes with named groups, e.g.
+
+    metrics:
+      - 'Epoch (?P<epoch>\\d+)/\\d+ - Loss: (?P<loss>\\S+)'
+
+and from lines following the `XSCHR_METRIC key=value [key=value ...]` protocol.
+
+Each metric of a run is appended to <run_dir>/metrics/<run_key>/<name>.f64, a flat
+array of little-endian float64 (np.fromfile / np.memmap(dtype='<f8') read it as is).
+A summary per metric (n, final, min, max, mean) goes into the run's record in
+runs.jsonl, which is all `xschr results` needs to rank a sweep.
+"""
+
+import os
+import re
+import sys
+import mmap
+from array import array
+
+METRICS_DIRNAME = "metrics"
+SERIES_SUFFIX = ".f64"
+STATS = ('final', 'best', 'mean')
+
+_PROTOCOL = re.compile(rb"^XSCHR_METRIC[ \t]+(.*)$", re.M)
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+# Values buffered per metric before they are appended to the column file
+_FLUSH_VALUES = 4096
+
+def compile_patterns(patterns):
+    """Compile `metrics:` regexes for bytes input. Raises ValueError on bad patterns."""
+    compiled = []
+    for pattern in patterns:
+        if not isinstance(pattern, str):
+            raise ValueError(f"metrics patterns must be strings (got {pattern!r}).")
+        try:
+            regex = re.compile(pattern.encode(), re.M)
+        except re.error as e:
+            raise ValueError(f"invalid metrics pattern {pattern!r}: {e}")
+        if not regex.groupindex:
+            raise ValueError(f"metrics pattern {pattern!r} needs named groups, e.g. (?P<loss>\\S+).")
+        compiled.append(regex)
+    return compiled
+
+def series_dir(run_dir, run_key):
+    return os.path.join(run_dir, METRICS_DIRNAME, run_key)
+
+class MetricExtractor:
+    """
+    Incremental parser fed raw output chunks. Only complete lines are matched, and the
+    regexes run over a whole chunk at once rather than line by line.
+    `listener`, if given, is called with {name: value} for every matched line; once it
+    returns True, `stop_requested` is set (see xschr.early_stop).
+    """
+    def __init__(self, patterns, out_dir, listener=None):
+        self.patterns = patterns
+        self.out_dir = out_dir
+        self.listener = listener
+        self.stop_requested = False
+        self.last = {}       # name -> latest value, for the live dashboard
+        self._pending = b""
+        self._buffers = {}   # name -> array('d') not yet on disk
+        self._summary = {}   # name -> [n, final, min, max, sum]
+
+    def feed(self, chunk):
+        data = self._pending + chunk
+        cut = data.rfind(b"\n") + 1
+        self._pending = data[cut:]
+        if cut:
+            self._scan(data[:cut])
+
+    def _scan(self, data):
+        for regex in self.patterns:
+            for match in regex.finditer(data):
+                self._line((name, value) for name, value in match.groupdict().items() if value is not None)
+        if b"XSCHR_METRIC" in data:
+            for match in _PROTOCOL.finditer(data):
+                pairs = (pair.partition(b"=") for pair in match.group(1).split())
+                self._line((name.decode(errors='replace'), value) for name, sep, value in pairs if sep and name)
+
+    def _line(self, pairs):
+        values = {}
+        for name, raw in pairs:
+            try:
+                values[_SAFE_NAME.sub("_", name)] = float(raw)
+            except ValueError:
+                continue
+        for name, value in values.items():
+            self._add(name, value)
+        self.last.update(values)
+        if values and self.listener is not None and not self.stop_requested:
+            self.stop_requested = bool(self.listener(values))
+
+    def _add(self, name, value):
+        buf = self._buffers.get(name)
+        if buf is None:
+            buf = self._buffers[name] = array('d')
+        buf.append(value)
+
+        stats = self._summary.get(name)
+        if stats is None:
+            self._summary[name] = [1, value, value, value, value]
+        else:
+            stats[0] += 1
+            stats[1] = value
+            stats[2] = min(stats[2], value)
+            stats[3] = max(stats[3], value)
+            stats[4] += value
+
+        if len(buf) >= _FLUSH_VALUES:
+            self._flush(name)
+
+    def _flush(self, name):
+        buf = self._buffers[name]
+        if not buf:
+            return
+        if sys.byteorder != 'little':
+            buf.byteswap()
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, name + SERIES_SUFFIX), 'ab') as f:
+            buf.tofile(f)
+        self._buffers[name] = array('d')
+
+    def close(self):
+        """Parse any unterminated last line, write out all buffers and return the summary."""
+        if self._pending:
+            self._scan(self._pending + b"\n")
+            self._pending = b""
+        for name in list(self._buffers):
+            self._flush(name)
+        return {
+            name: {'n': n, 'final': final, 'min': lo, 'max': hi, 'mean': total / n}
+            for name, (n, final, lo, hi, total) in self._summary.items()
+        }
+
+def load_series(path):
+    """Memory-map a .f64 column file and return its values as a read-only sequence of floats."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 8:
+            return array('d')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    view = view[:len(view) - len(view) % 8]
+    if sys.byteorder != 'little':
+        values = array('d', view.tobytes())
+        values.byteswap()
+        return values
+    return view.cast('d')
+
+def stat_value(summary, stat, maximize=False):
+    """One number from a metric summary: final, best (min, or max with `maximize`) or mean."""
+    if summary is None:
+        return None
+    if stat == 'best':
+        return summary['max'] if maximize else summary['min']
+    return summary[stat]
+
+def load_results(run_dirs):
+    """Latest record per run (from runs.jsonl) across `run_dirs`, keeping only runs that reported metrics."""
+    import json
+    from .accounting import RUNS_FILENAME
+
+    latest = {}
+    for run_dir in run_dirs:
+        path = os.path.join(run_dir, RUNS_FILENAME)
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line of an interrupted session
+                    continue
+                if record.get('metrics'):
+                    latest[(run_dir, record['run'])] = record
+    return list(latest.values())
+
+def rank(records, metric, stat='final', maximize=False):
+    """Sort records by one metric statistic, best first; runs without the metric go last."""
+    def key(record):
+        value = stat_value(record['metrics'].get(metric), stat, maximize)
+        if value is None or value != value:
+            return (1, 0.0)
+        return (0, -value if maximize else value)
+    return sorted(records, key=key)
+
+def print_results_table(records, metrics, stat='final', maximize=False, limit=20):
+    """Print one row per run with `stat` of each metric in `metrics`."""
+    if not records:
+        print("No runs with metrics found.")
+        return
+    shown = records[:limit] if limit else records
+    width = max(3, max(len(r['run']) for r in shown))
+    cols = [max(10, len(m)) for m in metrics]
+
+    print(f"\n[Results] {len(records)} run(s), {stat}{' (max)' if maximize and stat == 'best' else ''}")
+    print("  " + "#".rjust(4) + "  " + "Run".ljust(width) + "".join(f"  {m:>{w}}" for m, w in zip(metrics, cols)) + "  Args")
+    for i, r in enumerate(shown, 1):
+        cells = ""
+        for m, w in zip(metrics, cols):
+            value = stat_value(r['metrics'].get(m), stat, maximize)
+            cells += f"  {format(value, '.6g') if value is not None else '-':>{w}}"
+        print(f"  {i:>4}  {r['run'].ljust(width)}{cells}  {' '.join(r.get('args') or [])}")
+    if len(records) > len(shown):
+        print(f"  ... {len(records) - len(shown)} more run(s) (use --top 0 to list all)")
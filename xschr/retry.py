@@ -0,0 +1,144 @@
+"""
+xschr.retry
+
+automatic retries of runs that fail for reasons worth another attempt.
+
+    retry: 3                       # shorthand: up to 3 attempts, on out-of-memory errors
+
+    retry:
+      attempts: 3                  # attempts in total, the first one included
+      backoff: 30s                 # wait before the second attempt ...
+      factor: 2                    # ... multiplied by this for every later one
+      exit_codes: [75, -9]         # retry these exit codes
+      patterns: ["NCCL error"]     # and runs whose log ends with a match (regexes)
+      oom: true                    # out-of-memory errors (CUDA and host), with re-placement
+      timeout: false               # runs stopped by timeout / idle_timeout
+
+Patterns are matched against the last lines of the run's log. An out-of-memory retry
+is placed so it has more room: a run holding a share of a card waits for a whole one
+(so the runs it shared with are gone), and a declared `gpu_mem` grows by `oom_growth`,
+which admits it only onto a device with that much to spare. Every attempt writes its
+own log (<run>_attempt<N>.log from the second one on).
+"""
+
+import re
+from fractions import Fraction
+
+from .watchdog import parse_duration
+
+# Messages of frameworks that ran out of (device or host) memory
+OOM_PATTERNS = (
+    r"CUDA out of memory",
+    r"OutOfMemoryError",
+    r"CUBLAS_STATUS_ALLOC_FAILED",
+    r"CUDNN_STATUS_ALLOC_FAILED",
+    r"RESOURCE_EXHAUSTED: Out of memory",
+    r"\bMemoryError\b",
+)
+
+# Log lines searched for patterns, counted from the end
+TAIL_LINES = 200
+
+_DEFAULTS = {'attempts': 3, 'backoff': 10.0, 'factor': 2.0, 'exit_codes': [], 'patterns': [],
+             'oom': True, 'timeout': False, 'oom_growth': 1.5}
+
+def parse_retry(spec):
+    """Normalize a `retry:` value into RetryPolicy keyword arguments. Raises ValueError."""
+    if isinstance(spec, int) and not isinstance(spec, bool):
+        spec = {'attempts': spec}
+    if not isinstance(spec, dict):
+        raise ValueError("'retry' must be a number of attempts or a mapping.")
+    unknown = set(spec) - set(_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown retry option(s): {', '.join(sorted(unknown))}.")
+
+    opts = {**_DEFAULTS, **spec}
+    attempts = opts['attempts']
+    if isinstance(attempts, bool) or not isinstance(attempts, int) or attempts < 1:
+        raise ValueError(f"retry 'attempts' must be a whole number >= 1 (got {attempts!r}).")
+    opts['backoff'] = 0.0 if opts['backoff'] in (0, '0') else parse_duration(opts['backoff'], 'retry backoff')
+    for key, low in (('factor', 1), ('oom_growth', 1)):
+        value = opts[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < low:
+            raise ValueError(f"retry '{key}' must be a number >= {low} (got {value!r}).")
+    codes = opts['exit_codes']
+    if not isinstance(codes, list) or any(isinstance(c, bool) or not isinstance(c, int) for c in codes):
+        raise ValueError(f"retry 'exit_codes' must be a list of exit codes (got {codes!r}).")
+    patterns = opts['patterns']
+    if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+        raise ValueError("retry 'patterns' must be a list of regexes.")
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"retry pattern {pattern!r}: {e}")
+    for key in ('oom', 'timeout'):
+        if not isinstance(opts[key], bool):
+            raise ValueError(f"retry '{key}' must be true or false.")
+    return opts
+
+def describe(opts):
+    """One-line summary for the plan output."""
+    causes = (["out of memory"] if opts['oom'] else []) + (["timeouts"] if opts['timeout'] else []) + \
+             ([f"exit codes {', '.join(map(str, opts['exit_codes']))}"] if opts['exit_codes'] else []) + \
+             ([f"{len(opts['patterns'])} log pattern(s)"] if opts['patterns'] else [])
+    backoff = f", backoff {opts['backoff']:g}s x{opts['factor']:g}" if opts['backoff'] else ""
+    return f"up to {opts['attempts']} attempts on {', '.join(causes) or 'nothing'}{backoff}"
+
+class RetryPolicy:
+    """Decides whether a failed attempt gets another one, and when."""
+    def __init__(self, attempts=3, backoff=10.0, factor=2.0, exit_codes=(), patterns=(), oom=True,
+                 timeout=False, oom_growth=1.5):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.exit_codes = set(exit_codes)
+        self.patterns = [re.compile(p) for p in patterns]
+        self.oom = [re.compile(p) for p in OOM_PATTERNS] if oom else []
+        self.timeout = timeout
+        self.oom_growth = oom_growth
+
+    def classify(self, status, exit_code, log_path):
+        """
+        Why a failed attempt should be retried: ('oom' | 'timeout' | 'exit_code' | 'pattern', reason),
+        or None if it should not.
+        """
+        if status == 'timeout':
+            return ('timeout', "timed out") if self.timeout else None
+        if exit_code in self.exit_codes:
+            return 'exit_code', f"exit code {exit_code}"
+        if not self.oom and not self.patterns:
+            return None
+        lines = _log_tail(log_path)
+        for kind, patterns in (('oom', self.oom), ('pattern', self.patterns)):
+            for line in reversed(lines):
+                for pattern in patterns:
+                    if pattern.search(line):
+                        return kind, line.strip()[:120]
+        return None
+
+    def delay(self, attempt):
+        """Seconds to wait before `attempt` (2 for the first retry)."""
+        return self.backoff * self.factor ** (attempt - 2)
+
+    def oom_placement(self, amount, mem_mb, largest_mb=None):
+        """
+        GPU request (amount, mem_mb) for the attempt after an out-of-memory failure:
+        a whole card instead of a share, and `oom_growth` times the declared memory,
+        capped at the largest device (`largest_mb`).
+        """
+        if amount is not None and amount < 1:
+            amount = Fraction(1)
+        if mem_mb is not None:
+            mem_mb = int(mem_mb * self.oom_growth + 0.5)
+            if largest_mb is not None:
+                mem_mb = min(mem_mb, largest_mb)
+        return amount, mem_mb
+
+def _log_tail(log_path):
+    from .logstore import tail_lines
+    try:
+        return [line.decode(errors='replace') for line in tail_lines(log_path, TAIL_LINES)]
+    except (OSError, RuntimeError, EOFError):
+        # Unreadable or truncated (compressed) log: nothing to match
+        return []
@@ -0,0 +1,187 @@
+"""
+xschr.staging
+
+per-experiment dataset staging: declared input files are copied once into RAM-backed
+storage (/dev/shm) or local scratch before the experiment's first run, and removed when
+its last run is done.
+
+    stage: [data/train.npy, data/tokens/]    # shorthand: files or directories, relative to the config
+
+    stage:
+      files: [data/train.npy, data/tokens/]
+      to: shm                    # shm (/dev/shm, the default) | scratch ($TMPDIR) | a directory
+      env: XSCHR_STAGE_DIR       # variable holding the staged directory in each run
+
+Runs find the copies under $XSCHR_STAGE_DIR by their base names. A file in /dev/shm is
+already in memory, so `np.memmap(path, mode='r')` maps the same pages into every run
+instead of each run reading the dataset cold. The copies are read-only.
+
+The staged directory is reference-counted: the dispatcher holds it while the
+experiment's runs are queued and every run holds it while it executes. If /dev/shm has
+no room for the files, scratch is used instead. Directories left behind by a crashed
+session are swept the next time something is staged.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+STAGE_ENV = "XSCHR_STAGE_DIR"
+
+SHM_DIR = "/dev/shm"
+
+_PREFIX = "xschr-stage-"
+
+def parse_stage(spec):
+    """Normalize a `stage:` value into {'files', 'to', 'env'}. Raises ValueError."""
+    if isinstance(spec, (str, list)):
+        spec = {'files': spec}
+    if not isinstance(spec, dict):
+        raise ValueError("'stage' must be a list of files or a mapping with 'files'.")
+    unknown = set(spec) - {'files', 'to', 'env'}
+    if unknown:
+        raise ValueError(f"unknown stage option(s): {', '.join(sorted(unknown))}.")
+    files = spec.get('files')
+    if isinstance(files, str):
+        files = [files]
+    if not files or not isinstance(files, list) or not all(isinstance(f, str) and f for f in files):
+        raise ValueError("stage 'files' must be a non-empty list of paths.")
+    names = [os.path.basename(os.path.normpath(f)) for f in files]
+    if len(set(names)) != len(names):
+        raise ValueError("staged files must have distinct base names.")
+    to = spec.get('to', 'shm')
+    if not isinstance(to, str) or not (to in ('shm', 'scratch') or os.path.isabs(os.path.expanduser(to))):
+        raise ValueError(f"stage 'to' must be shm, scratch or an absolute directory (got {to!r}).")
+    env = spec.get('env', STAGE_ENV)
+    if not isinstance(env, str) or not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", env):
+        raise ValueError(f"stage 'env' must be an environment variable name (got {env!r}).")
+    return {'files': files, 'to': to, 'env': env}
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _roots(to):
+    """Candidate directories to stage under, best first."""
+    scratch = tempfile.gettempdir()
+    if to == 'shm':
+        return [SHM_DIR, scratch] if os.path.isdir(SHM_DIR) else [scratch]
+    if to == 'scratch':
+        return [scratch]
+    return [os.path.expanduser(to)]
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def sweep_stale(root):
+    """Remove staged directories under `root` whose session is gone."""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        match = re.match(rf"{_PREFIX}(\d+)-", name)
+        if match and not _alive(int(match.group(1))):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+def _read_only(path):
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            os.chmod(os.path.join(root, name), 0o444)
+
+class StageArea:
+    """
+    The staged copy of one experiment's inputs.
+    acquire() stages on first use and returns the directory; the last release() removes it.
+    """
+    def __init__(self, name, files, to='shm', env=STAGE_ENV, base_dir=None):
+        self.name = name
+        self.sources = [os.path.normpath(os.path.join(base_dir or "", os.path.expanduser(f))) for f in files]
+        self.to = to
+        self.env = env
+        self.path = None
+        self.size = 0
+        self._refs = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a reference, staging the files first if nobody holds one. Raises OSError."""
+        with self._lock:
+            if self.path is None:
+                self.path = self._stage()
+            self._refs += 1
+            return self.path
+
+    def release(self):
+        """Drop a reference; the last one removes the staged directory."""
+        with self._lock:
+            if self._refs == 0:
+                return
+            self._refs -= 1
+            if self._refs == 0 and self.path is not None:
+                _remove(self.path)
+                self.path = None
+
+    def close(self):
+        """Remove the staged directory whatever still holds it (the session is over)."""
+        with self._lock:
+            self._refs = 0
+            if self.path is not None:
+                _remove(self.path)
+                self.path = None
+
+    def _stage(self):
+        for source in self.sources:
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Staged input not found: {source}")
+        self.size = sum(_size(s) for s in self.sources)
+
+        root = None
+        for candidate in _roots(self.to):
+            try:
+                free = shutil.disk_usage(candidate).free
+            except OSError:
+                continue
+            # Leave some room: a full /dev/shm starves everything else using shared memory
+            if free >= self.size * 1.1 + (64 << 20):
+                root = candidate
+                break
+        if root is None:
+            raise OSError(f"No room to stage {self.size / (1 << 20):.0f} MB under {', '.join(_roots(self.to))}")
+
+        sweep_stale(root)
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", self.name)
+        path = os.path.join(root, f"{_PREFIX}{os.getpid()}-{safe_name}")
+        partial = path + ".partial"
+        _remove(partial)
+        os.makedirs(partial)
+        try:
+            for source in self.sources:
+                target = os.path.join(partial, os.path.basename(source))
+                # copyfile uses sendfile() where it can, so the data never passes through Python
+                if os.path.isdir(source):
+                    shutil.copytree(source, target, copy_function=shutil.copyfile)
+                else:
+                    shutil.copyfile(source, target)
+            _read_only(partial)
+            _remove(path)
+            os.rename(partial, path)
+        except BaseException:
+            _remove(partial)
+            raise
+        return path
+
+def _remove(path):
+    if not os.path.exists(path):
+        return
+    # Read-only files in a writable directory can still be unlinked
+    shutil.rmtree(path, ignore_errors=True)
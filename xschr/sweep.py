@@ -0,0 +1,189 @@
+"""
+xschr.sweep
+
+lazy parameter-sweep expansion (grid, zip, random) for `sweep:` blocks.
+
+    sweep:
+      method: grid                 # grid | zip | random
+      params:
+        lr: [0.1, 0.01]            # explicit values
+        epochs: {range: [5, 20, 5]}
+        wd: {logspace: [1e-5, 1e-2, 4]}
+
+    sweep:
+      method: random
+      samples: 100
+      seed: 0
+      params:
+        lr: {log_uniform: [1e-4, 1e-1]}
+        dropout: {uniform: [0.0, 0.5]}
+        layers: {int: [2, 8]}
+        optimizer: [adam, sgd]     # uniform choice
+"""
+
+import math
+import itertools
+
+METHODS = ('grid', 'zip', 'random')
+
+# Value generators allowed in grid/zip sweeps and in random sweeps respectively
+_SEQUENCE_KINDS = ('range', 'linspace', 'logspace')
+_DISTRIBUTION_KINDS = ('uniform', 'log_uniform', 'int')
+
+class _Values:
+    """Re-iterable, lazily generated value list with a known length."""
+    def __init__(self, length, at):
+        self.length = length
+        self._at = at
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return (self._at(i) for i in range(self.length))
+
+def _single_key(value, kinds, name):
+    if not isinstance(value, dict) or len(value) != 1 or next(iter(value)) not in kinds:
+        raise ValueError(f"sweep param '{name}' must be a list, a scalar or one of {{{', '.join(kinds)}}}.")
+    kind, bounds = next(iter(value.items()))
+    if not isinstance(bounds, list):
+        raise ValueError(f"sweep param '{name}': '{kind}' expects a list of numbers.")
+    return kind, [_number(b, kind, name) for b in bounds]
+
+def _number(value, kind, name):
+    # PyYAML reads `1e-4` (no dot) as a string, so accept numeric strings too
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"sweep param '{name}': '{kind}' expects a list of numbers (got {value!r}).")
+
+def _sequence(value, name):
+    """Turn a grid/zip param value into a sized, re-iterable sequence."""
+    if isinstance(value, list):
+        if not value:
+            raise ValueError(f"sweep param '{name}' has no values.")
+        return value
+    if not isinstance(value, dict):
+        return [value]
+
+    kind, bounds = _single_key(value, _SEQUENCE_KINDS, name)
+    if kind == 'range':
+        if len(bounds) not in (2, 3):
+            raise ValueError(f"sweep param '{name}': range expects [start, stop] or [start, stop, step].")
+        start, stop = bounds[0], bounds[1]
+        step = bounds[2] if len(bounds) == 3 else 1
+        if step == 0:
+            raise ValueError(f"sweep param '{name}': range step cannot be 0.")
+        length = max(0, math.ceil((stop - start) / step))
+        as_int = all(isinstance(b, int) for b in bounds)
+        return _Values(length, (lambda i: start + i * step) if as_int else (lambda i: round(start + i * step, 12)))
+
+    if len(bounds) != 3 or bounds[2] < 1 or int(bounds[2]) != bounds[2]:
+        raise ValueError(f"sweep param '{name}': {kind} expects [start, stop, count].")
+    lo, hi, n = bounds[0], bounds[1], int(bounds[2])
+    if kind == 'linspace':
+        step = (hi - lo) / (n - 1) if n > 1 else 0
+        return _Values(n, lambda i: lo + i * step)
+    if lo <= 0 or hi <= 0:
+        raise ValueError(f"sweep param '{name}': logspace bounds must be positive.")
+    ratio = (hi / lo) ** (1 / (n - 1)) if n > 1 else 1
+    return _Values(n, lambda i: lo * ratio ** i)
+
+def _sampler(value, name):
+    """Turn a random-sweep param value into a function of a random.Random."""
+    if isinstance(value, list):
+        if not value:
+            raise ValueError(f"sweep param '{name}' has no values.")
+        return lambda rng: rng.choice(value)
+    if not isinstance(value, dict):
+        return lambda rng: value
+
+    kind, bounds = _single_key(value, _DISTRIBUTION_KINDS, name)
+    if len(bounds) != 2 or bounds[0] > bounds[1]:
+        raise ValueError(f"sweep param '{name}': {kind} expects [low, high] with low <= high.")
+    lo, hi = bounds
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(lo, hi)
+    if kind == 'int':
+        return lambda rng: rng.randint(int(lo), int(hi))
+    if lo <= 0:
+        raise ValueError(f"sweep param '{name}': log_uniform bounds must be positive.")
+    log_lo, log_hi = math.log(lo), math.log(hi)
+    return lambda rng: math.exp(rng.uniform(log_lo, log_hi))
+
+def _params(spec):
+    params = spec.get('params')
+    if not isinstance(params, dict) or not params:
+        raise ValueError("sweep needs a non-empty 'params' mapping.")
+    return list(params.items())
+
+def validate(spec):
+    """Raise ValueError if a sweep block is malformed."""
+    if not isinstance(spec, dict):
+        raise ValueError("'sweep' must be a mapping.")
+    method = spec.get('method', 'grid')
+    if method not in METHODS:
+        raise ValueError(f"Unknown sweep method '{method}'. Use one of: {', '.join(METHODS)}.")
+
+    if method == 'random':
+        samples = spec.get('samples')
+        if not isinstance(samples, int) or isinstance(samples, bool) or samples < 1:
+            raise ValueError("random sweep needs a positive integer 'samples'.")
+        for name, value in _params(spec):
+            _sampler(value, name)
+        return
+
+    lengths = {name: len(_sequence(value, name)) for name, value in _params(spec)}
+    if method == 'zip' and len(set(lengths.values())) > 1:
+        raise ValueError(f"zip sweep params must all have the same length (got {lengths}).")
+
+def count(spec):
+    """Number of runs a sweep expands to, computed without expanding it."""
+    method = spec.get('method', 'grid')
+    if method == 'random':
+        return spec['samples']
+    lengths = [len(_sequence(value, name)) for name, value in _params(spec)]
+    if method == 'zip':
+        return lengths[0]
+    return math.prod(lengths)
+
+def format_value(value):
+    """Render a swept value as a command-line token."""
+    if isinstance(value, float):
+        return format(value, '.6g')
+    return str(value)
+
+def to_args(assignment):
+    """[(name, value), ...] -> ['--name', 'value', ...]. True is a bare flag, False is omitted."""
+    out = []
+    for name, value in assignment:
+        flag = name if name.startswith('-') else f"--{name}"
+        if value is True:
+            out.append(flag)
+        elif value is False or value is None:
+            continue
+        else:
+            out.extend([flag, format_value(value)])
+    return out
+
+def iter_arg_lists(spec):
+    """Yield one argument list per sweep point, lazily and deterministically."""
+    method = spec.get('method', 'grid')
+    params = _params(spec)
+    names = [name for name, _ in params]
+
+    if method == 'random':
+        # Seeded so --resume and the result cache see the same sequence every time
+        import random
+        rng = random.Random(spec.get('seed', 0))
+        samplers = [_sampler(value, name) for name, value in params]
+        for _ in range(spec['samples']):
+            yield to_args(zip(names, (sample(rng) for sample in samplers)))
+        return
+
+    sequences = [_sequence(value, name) for name, value in params]
+    combos = zip(*sequences) if method == 'zip' else itertools.product(*sequences)
+    for values in combos:
+        yield to_args(zip(names, values))
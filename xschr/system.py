@@ -1,15 +1,70 @@
-import platform
-from .cuda_devices import detect_nvidia_gpus
+import os
+import json
+import time
+from .config import user_cache_dir
 
-def print_system_status():
+# Hardware rarely changes; re-probing the CUDA driver costs hundreds of ms
+HW_CACHE_TTL = 300
+
+def _hw_cache_path():
+    # Keyed by host so a shared (NFS) home directory doesn't mix machines, and by the
+    # devices CUDA is allowed to show, which decide what detection finds
+    host = os.uname().nodename if hasattr(os, 'uname') else os.environ.get('COMPUTERNAME', 'local')
+    visible = os.environ.get('CUDA_VISIBLE_DEVICES')
+    if visible is None:
+        return user_cache_dir(f"hardware-{host}.json")
+    import hashlib
+    return user_cache_dir(f"hardware-{host}-{hashlib.sha1(visible.encode()).hexdigest()[:10]}.json")
+
+def _probe_hardware():
+    """Query the platform and CUDA driver directly (slow path)."""
+    import platform
+    from .cuda_devices import detect_nvidia_gpus
+
+    return {
+        'platform': f"{platform.system()} {platform.machine()}",
+        'cpu_count': os.cpu_count() or 1,
+        'gpus': detect_nvidia_gpus(),
+        'detected': time.time(),
+    }
+
+def get_hardware_inventory(refresh=False, ttl=HW_CACHE_TTL):
+    """
+    Return {'platform', 'cpu_count', 'gpus', 'detected'}, served from an on-disk cache
+    younger than `ttl` seconds unless `refresh` is set.
+    """
+    path = _hw_cache_path()
+    if not refresh:
+        try:
+            with open(path) as f:
+                inventory = json.load(f)
+            if time.time() - inventory['detected'] < ttl:
+                return inventory
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    inventory = _probe_hardware()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(inventory, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return inventory
+
+def print_system_status(refresh=False):
     """Print current hardware status."""
-    print("  • Platform:      " + platform.system() + " " + platform.machine())
-    
-    gpus = detect_nvidia_gpus()
-    
+    inventory = get_hardware_inventory(refresh=refresh)
+    print("  • Platform:      " + inventory['platform'])
+
+    gpus = inventory['gpus']
+
     if gpus:
         print(f"  • Accelerator:   Detected {len(gpus)} NVIDIA GPU(s):")
         for gpu in gpus:
-            print(f"    - [{gpu['id']}] {gpu['name']}")
+            memory = f" ({gpu['total_mb'] / 1024:.0f} GB)" if gpu.get('total_mb') else ""
+            print(f"    - [{gpu['id']}] {gpu['name']}{memory}")
     else:
         print("  • Accelerator:   None (Running on CPU)")
@@ -0,0 +1,194 @@
+"""
+xschr.trace
+
+scheduler timeline: structured events with monotonic timestamps, exported as a
+Chrome/Perfetto trace (open trace.json in ui.perfetto.dev or chrome://tracing).
+
+Events of a run, in order:
+
+    queued -> leased -> spawned -> first_output -> exited -> log_closed -> finished
+
+plus session-level ones (config_loaded, session_started, session_ended) and 'cached'
+for runs restored from the result cache. In the exported trace, each worker slot is a
+track: a run's span covers lease to log close, split into 'startup' (spawn to first
+output) and 'running' (to exit). The dispatcher track shows how long each run waited
+for a slot, so idle slots and dispatch gaps are easy to spot.
+
+Python hooks see every event live:
+
+    tracer = Tracer()
+    tracer.subscribe(lambda event: print(event['name'], event.get('run')))
+    run_sequence(..., settings=SessionSettings(tracer=tracer))
+"""
+
+import json
+import os
+import threading
+import time
+
+TRACE_FILE = "trace.json"
+
+
+class Tracer:
+    """Collects scheduler events (thread-safe) and hands each one to the subscribed hooks."""
+
+    def __init__(self, hooks=()):
+        self.events = []
+        self._hooks = list(hooks)
+        self._lock = threading.Lock()
+
+    def subscribe(self, hook):
+        """Call `hook(event)` for every event from now on; event is a dict with 'name' and 'ts'."""
+        self._hooks.append(hook)
+
+    def event(self, name, run=None, slot=None, duration=None, **args):
+        """
+        Record an event now. `slot` is the worker slot (None: the dispatcher),
+        `duration` (seconds) makes it a span that ends now.
+        """
+        event = {"name": name, "ts": time.monotonic()}
+        if run is not None:
+            event["run"] = run
+        if slot is not None:
+            event["slot"] = slot
+        if duration is not None:
+            event["duration"] = duration
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception:
+                pass  # a broken hook must not take the queue down
+
+    def export(self, path):
+        """Write the Chrome trace to `path`; returns the path."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(to_chrome(self.events), f)
+        os.replace(tmp, path)
+        return path
+
+
+def _us(seconds):
+    return round(seconds * 1e6, 1)
+
+
+def to_chrome(events):
+    """Convert recorded events to the Chrome Trace Event format."""
+    pid = os.getpid()
+    with_ts = sorted(events, key=lambda e: e["ts"])
+    origin = min((e["ts"] - e.get("duration", 0) for e in with_ts), default=0.0)
+    out = [
+        {"ph": "M", "pid": pid, "name": "process_name", "args": {"name": "xschr"}},
+        {
+            "ph": "M",
+            "pid": pid,
+            "tid": 0,
+            "name": "thread_name",
+            "args": {"name": "dispatcher"},
+        },
+    ]
+    slots = set()
+    runs = {}
+
+    for e in with_ts:
+        tid = e["slot"] + 1 if "slot" in e else 0
+        if "slot" in e:
+            slots.add(e["slot"])
+        args = dict(e.get("args", {}))
+        if "run" in e:
+            args["run"] = e["run"]
+            runs.setdefault(e["run"], {})[e["name"]] = e
+        if "duration" in e:
+            out.append(
+                {
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "name": e["name"],
+                    "cat": "scheduler",
+                    "ts": _us(e["ts"] - e["duration"] - origin),
+                    "dur": _us(e["duration"]),
+                    "args": args,
+                }
+            )
+        else:
+            out.append(
+                {
+                    "ph": "i",
+                    "s": "t",
+                    "pid": pid,
+                    "tid": tid,
+                    "name": e["name"],
+                    "cat": "scheduler",
+                    "ts": _us(e["ts"] - origin),
+                    "args": args,
+                }
+            )
+
+    # Spans derived from each run's milestones
+    def span(name, tid, start, end, args, cat="run"):
+        if start is not None and end is not None and end["ts"] >= start["ts"]:
+            out.append(
+                {
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "name": name,
+                    "cat": cat,
+                    "ts": _us(start["ts"] - origin),
+                    "dur": _us(end["ts"] - start["ts"]),
+                    "args": args,
+                }
+            )
+
+    for run, milestones in runs.items():
+        leased = milestones.get("leased")
+        finished = milestones.get("finished", {})
+        args = {"run": run, **finished.get("args", {})}
+        span(
+            "waiting for slot",
+            0,
+            milestones.get("queued"),
+            leased,
+            args,
+            cat="dispatch",
+        )
+        if leased is None:
+            continue
+        tid = leased["slot"] + 1
+        end = milestones.get("log_closed") or milestones.get("finished")
+        span(run, tid, leased, end, args)
+        first = milestones.get("first_output")
+        span(
+            "startup",
+            tid,
+            milestones.get("spawned"),
+            first or milestones.get("exited"),
+            args,
+        )
+        span("running", tid, first, milestones.get("exited"), args)
+
+    for slot in sorted(slots):
+        out.append(
+            {
+                "ph": "M",
+                "pid": pid,
+                "tid": slot + 1,
+                "name": "thread_name",
+                "args": {"name": f"slot {slot + 1}"},
+            }
+        )
+        out.append(
+            {
+                "ph": "M",
+                "pid": pid,
+                "tid": slot + 1,
+                "name": "thread_sort_index",
+                "args": {"sort_index": slot + 1},
+            }
+        )
+    return {"traceEvents": out, "displayTimeUnit": "ms"}
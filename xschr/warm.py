@@ -0,0 +1,283 @@
+"""
+xschr.warm
+
+warm-start template process: pre-imports heavy modules once, then forks a child per run.
+
+This file is executed directly by the experiment's `python_cmd` (which may be a
+different interpreter or venv without xschr installed), so it must only use the
+standard library.
+
+Per run, the scheduler connects to the template's Unix socket and passes the run's
+output fd with SCM_RIGHTS. The template forks a short-lived supervisor, which forks
+the run itself, reports its pid, waits for it and reports its exit code:
+
+    template --fork--> supervisor --fork--> run (runpy, sys.argv = [script, *args])
+"""
+
+import os
+import sys
+import json
+import signal
+import socket
+
+_READY = b"xschr-warm-ready\n"
+_MAX_REQUEST = 1 << 20
+
+def is_supported():
+    """Warm start needs fork() and fd passing over Unix sockets."""
+    return hasattr(os, 'fork') and hasattr(socket, 'send_fds') and hasattr(socket, 'AF_UNIX')
+
+# --- Template side (runs inside python_cmd) ---
+
+def _recv_request(conn):
+    data, fds, _, _ = socket.recv_fds(conn, _MAX_REQUEST, 1)
+    while data and not data.endswith(b"\n"):
+        more = conn.recv(_MAX_REQUEST)
+        if not more:
+            break
+        data += more
+    return json.loads(data), fds
+
+def _send(conn, **message):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+def _reseed():
+    """Forked children share the template's RNG state; give each run fresh entropy like a cold start."""
+    import random
+    random.seed()
+    numpy = sys.modules.get('numpy')
+    if numpy is not None:
+        numpy.random.seed()
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.seed()
+
+def _run_script(request, out_fd):
+    """Body of the forked run: become the script and never return."""
+    code = 1
+    try:
+        os.setsid()
+        os.dup2(out_fd, 1)
+        os.dup2(out_fd, 2)
+        os.close(out_fd)
+
+        # The template ignores SIGINT; the script should see the usual KeyboardInterrupt
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+
+        script = request['argv'][0]
+        sys.argv = list(request['argv'])
+        sys.path[0] = os.path.dirname(os.path.abspath(script))
+        if os.environ.get('PYTHONUNBUFFERED'):
+            sys.stdout.reconfigure(write_through=True)
+            sys.stderr.reconfigure(write_through=True)
+        _reseed()
+
+        import runpy
+        try:
+            runpy.run_path(script, run_name='__main__')
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+def _supervise(conn, request, out_fd):
+    """Forked per request: start the run, report its pid, then its exit code."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        _run_script(request, out_fd)
+    os.close(out_fd)
+    _send(conn, pid=pid)
+    _, status = os.waitpid(pid, 0)
+    _send(conn, exit_code=os.waitstatus_to_exitcode(status))
+    os._exit(0)
+
+def serve(socket_path, modules):
+    """Template main loop: import `modules`, signal readiness, then fork per request."""
+    for name in modules:
+        try:
+            __import__(name)
+        except Exception as e:
+            print(f"[xschr.warm] could not preload {name}: {e}", file=sys.stderr)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+
+    # Supervisors are reaped automatically; each one waits for its own run
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    sys.stdout.buffer.write(_READY)
+    sys.stdout.flush()
+
+    while True:
+        conn, _ = server.accept()
+        try:
+            request, fds = _recv_request(conn)
+        except (OSError, ValueError):
+            conn.close()
+            continue
+        if not fds:
+            conn.close()
+            continue
+
+        if os.fork() == 0:
+            server.close()
+            _supervise(conn, request, fds[0])
+        conn.close()
+        for fd in fds:
+            os.close(fd)
+
+# --- Scheduler side ---
+
+class WarmProcess:
+    """Popen-like handle for a run forked by a template (pid, stdout, poll, wait, terminate, kill)."""
+    def __init__(self, conn, stdout=None):
+        self._conn = conn
+        self._buf = b""
+        self.stdout = stdout
+        self.returncode = None
+        reply = self._read(timeout=None)
+        if not reply or 'pid' not in reply:
+            raise RuntimeError("warm template did not start the run")
+        self.pid = reply['pid']
+
+    def _read(self, timeout):
+        """
+        Next JSON reply from the supervisor. Returns None if nothing arrived within
+        `timeout` seconds (None blocks), or {} if the supervisor hung up.
+        """
+        import select
+        while b"\n" not in self._buf:
+            if timeout is not None and not select.select([self._conn], [], [], timeout)[0]:
+                return None
+            chunk = self._conn.recv(4096)
+            if not chunk:
+                return {}
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def poll(self):
+        if self.returncode is None:
+            self._finish(self._read(timeout=0))
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            self._finish(self._read(timeout=timeout))
+            if self.returncode is None:
+                import subprocess
+                raise subprocess.TimeoutExpired(self.pid, timeout)
+        return self.returncode
+
+    def _finish(self, reply):
+        if reply is None:
+            return
+        # An empty reply means the supervisor died without reporting (template killed)
+        self.returncode = reply.get('exit_code', -signal.SIGKILL)
+        self._conn.close()
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class WarmTemplate:
+    """
+    A persistent `python_cmd` process with `modules` already imported.
+    `spawn` has the same shape as subprocess.Popen for the engine's purposes.
+    """
+    def __init__(self, python_cmd, modules=(), start_timeout=120):
+        import tempfile
+        import subprocess
+
+        self.python_cmd = python_cmd
+        self.modules = tuple(modules)
+        self._dir = tempfile.mkdtemp(prefix="xschr-warm-")
+        self.socket_path = os.path.join(self._dir, "template.sock")
+        self._process = subprocess.Popen(
+            [python_cmd, os.path.abspath(__file__), self.socket_path, *self.modules],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+        )
+
+        # Wait for the preload to finish so the first run doesn't pay for it
+        import selectors
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._process.stdout, selectors.EVENT_READ)
+            ready = sel.select(timeout=start_timeout) and self._process.stdout.readline() == _READY
+        if not ready:
+            self.close()
+            raise RuntimeError(f"warm template for {python_cmd} failed to start")
+
+    def spawn(self, cmd, env, stdout):
+        """
+        Fork a run of `cmd` ([python_cmd, script, *args]) with `env`.
+        `stdout` is subprocess.PIPE or a file object that receives output directly.
+        """
+        import subprocess
+
+        if stdout == subprocess.PIPE:
+            read_fd, write_fd = os.pipe()
+            out_fd, reader = write_fd, os.fdopen(read_fd, 'rb', 0)
+        else:
+            out_fd, reader = stdout.fileno(), None
+
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.socket_path)
+            request = {'argv': list(cmd[1:]), 'env': dict(env), 'cwd': os.getcwd()}
+            socket.send_fds(conn, [json.dumps(request).encode() + b"\n"], [out_fd])
+            return WarmProcess(conn, reader)
+        except Exception:
+            conn.close()
+            if reader is not None:
+                reader.close()
+            raise
+        finally:
+            if reader is not None:
+                os.close(write_fd)
+
+    def close(self):
+        """Stop the template; runs already forked keep going."""
+        import shutil
+        if self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+        self._process.stdout.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    # Running as a script puts the xschr package dir first on sys.path; keep it from shadowing imports
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    serve(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,171 @@
+"""
+xschr.watchdog
+
+per-run time limits: `timeout` (total seconds) and `idle_timeout` (seconds without any
+output). Runs start in their own session, so an expired run is stopped as a whole
+process group (dataloader workers included): SIGTERM first, SIGKILL after `grace`
+seconds if anything is still around.
+"""
+
+import os
+import re
+import time
+import signal
+import threading
+
+DEFAULT_GRACE = 10.0
+
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(value, what='timeout'):
+    """Seconds from a number or a string such as '90s', '30m' or '2h'."""
+    match = None
+    if isinstance(value, str):
+        match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([smh]?)\s*", value)
+    if isinstance(value, bool) or not (isinstance(value, (int, float)) or match):
+        raise ValueError(f"'{what}' must be seconds or a duration such as 90s, 30m or 2h (got {value!r}).")
+    seconds = float(match.group(1)) * _UNITS[match.group(2)] if match else float(value)
+    if seconds <= 0:
+        raise ValueError(f"'{what}' must be positive (got {value!r}).")
+    return seconds
+
+def own_group(process):
+    """The run's process group id if it leads its own group (started in a new session), else None."""
+    pid = getattr(process, 'pid', None)
+    if pid is None:
+        # A run on another host (agents._RemoteRun): no group to signal from here
+        return None
+    try:
+        return pid if hasattr(os, 'getpgid') and os.getpgid(pid) == pid else None
+    except OSError:
+        return None
+
+def signal_group(process, sig, pgid=None):
+    """
+    Send `sig` to the run's process group `pgid` (see own_group), or just the run without one.
+    The group outlives its leader, so descendants are reached even after the run itself exited.
+    """
+    if pgid is not None:
+        try:
+            os.killpg(pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        return
+    try:
+        process.send_signal(sig)
+    except (ProcessLookupError, OSError):
+        pass
+
+def _group_alive(process, pgid):
+    if pgid is None:
+        return process.returncode is None
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def stop_group(process, pgid=None, grace=DEFAULT_GRACE, wait=False):
+    """
+    Stop a run the way the watchdog does: SIGTERM to its group, SIGKILL to whatever is left
+    after `grace` seconds. The escalation runs in the background, unless `wait` (nothing else
+    will reap the run, e.g. the session is being interrupted): then it runs here, and another
+    Ctrl+C kills straight away.
+    A run without a pid (executing on an agent, see xschr.agents) is asked to terminate(); its
+    agent stops the group on its side.
+    """
+    if getattr(process, 'pid', None) is None:
+        process.terminate()
+        return
+    kill = getattr(signal, 'SIGKILL', signal.SIGTERM)
+    signal_group(process, signal.SIGTERM, pgid)
+
+    def escalate():
+        deadline = time.monotonic() + grace
+        try:
+            while time.monotonic() < deadline:
+                if wait:
+                    process.poll()
+                if not _group_alive(process, pgid):
+                    return
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            signal_group(process, kill, pgid)
+            raise
+        signal_group(process, kill, pgid)
+
+    if wait:
+        escalate()
+    else:
+        threading.Thread(target=escalate, daemon=True).start()
+
+class Watch:
+    """Deadlines of one run. The output pump calls touch(); `reason` is set once it expired."""
+    def __init__(self, process, timeout, idle_timeout):
+        self.process = process
+        self.pgid = own_group(process)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.started = self.last_output = time.monotonic()
+        self.reason = None
+        self.killed_at = None
+        # Set when even SIGKILL did not close the output (a descendant escaped the group)
+        self.abandoned = threading.Event()
+
+    def touch(self):
+        self.last_output = time.monotonic()
+
+    def _expired(self, now):
+        if self.timeout is not None and now - self.started > self.timeout:
+            return f"exceeded timeout of {self.timeout:g}s"
+        if self.idle_timeout is not None and now - self.last_output > self.idle_timeout:
+            return f"no output for {self.idle_timeout:g}s (idle_timeout)"
+        return None
+
+class Watchdog:
+    """One background thread enforcing the deadlines of every watched run."""
+    def __init__(self, grace=DEFAULT_GRACE, poll=0.5):
+        self.grace = grace
+        self.poll = poll
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, process, timeout=None, idle_timeout=None):
+        watch = Watch(process, timeout, idle_timeout)
+        with self._lock:
+            self._watches.add(watch)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        return watch
+
+    def unwatch(self, watch):
+        with self._lock:
+            self._watches.discard(watch)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.poll)
+            with self._lock:
+                watches = list(self._watches)
+            if not watches:
+                with self._lock:
+                    if not self._watches:
+                        self._thread = None
+                        return
+                continue
+            now = time.monotonic()
+            for watch in watches:
+                if watch.killed_at is None:
+                    reason = watch._expired(now)
+                    if reason is not None:
+                        watch.reason = reason
+                        watch.killed_at = now
+                        signal_group(watch.process, signal.SIGTERM, watch.pgid)
+                elif now - watch.killed_at > self.grace and not watch.abandoned.is_set():
+                    signal_group(watch.process, getattr(signal, 'SIGKILL', signal.SIGTERM), watch.pgid)
+                    if now - watch.killed_at > self.grace + 5:
+                        watch.abandoned.set()